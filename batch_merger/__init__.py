@@ -0,0 +1 @@
+"""Helpers shared by the MKVToolNix Batch Merger GUI."""
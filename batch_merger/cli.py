@@ -0,0 +1,364 @@
+import argparse
+import contextlib
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+
+from batch_merger import tracing
+from batch_merger.identify import IdentifyCache, mkvmerge_executable
+from batch_merger.jobqueue import DEFAULT_LEASE_SECONDS, JobQueue, QueueWorker, process_tag
+from batch_merger.metrics import BatchMetrics, MetricsServer, TextfileWriter
+from batch_merger.pairing import PAIRING_MODES
+from batch_merger.scheduling import FREE_SPACE_MARGIN, parse_device_limits
+from batch_merger.staging import DEFAULT_STAGING
+from batch_merger.settings import get_identify_cache_path, read_preset, read_settings, update_settings
+
+
+class JsonLineReporter:
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def default_mkvtoolnix_path():
+    saved = read_settings().get("mkvtoolnix_path")
+    if saved:
+        return saved
+    found = shutil.which("mkvmerge")
+    return os.path.dirname(found) if found else ""
+
+
+def add_metrics_arguments(p):
+    p.add_argument("--metrics-port", type=int, default=None,
+                   help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics while the batch runs")
+    p.add_argument("--metrics-textfile", default=None, metavar="FILE.prom",
+                   help="Rewrite this Prometheus textfile (node_exporter textfile collector) every 15 seconds")
+
+
+def start_metrics(args, reporter, cache):
+    """Returns the on_event callback to give the engine and the exporters to stop afterwards."""
+    if args.metrics_port is None and not args.metrics_textfile:
+        return reporter, []
+    metrics = BatchMetrics(cache_stats=cache.stats if cache is not None else None)
+    exporters = []
+    if args.metrics_port is not None:
+        exporters.append(MetricsServer(metrics, args.metrics_port).start())
+    if args.metrics_textfile:
+        exporters.append(TextfileWriter(metrics, args.metrics_textfile).start())
+
+    def on_event(event):
+        metrics(event)
+        reporter(event)
+    return on_event, exporters
+
+
+def stop_metrics(exporters):
+    for exporter in exporters:
+        exporter.stop()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pymkv_merger_app.py",
+        description="Headless batch merging with MKVToolNix. Progress is written to stdout as JSON lines."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--mkvtoolnix", default=None,
+                       help="MKVToolNix installation folder (default: saved GUI setting or mkvmerge on PATH)")
+        p.add_argument("--folder1", required=True, help="Input Folder 1")
+        p.add_argument("--folder2", required=True, help="Input Folder 2")
+        p.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 4), help="Concurrent jobs")
+        p.add_argument("--no-cache", action="store_true", help="Do not use the identification cache")
+        p.add_argument("--pair-by", choices=PAIRING_MODES, default="name",
+                       help="How files are paired: identical name, normalized stem (ignoring [tags] and separators), "
+                            "season/episode number, or --pattern")
+        p.add_argument("--pattern", default="",
+                       help="Regex whose capture groups (or whole match) form the pairing key, searched in the "
+                            "relative path")
+        p.add_argument("--pattern2", default="", help="Different --pattern for folder 2")
+        p.add_argument("--recursive", action="store_true", help="Include subfolders; outputs keep folder 1's layout")
+        p.add_argument("--extensions", default="", metavar=".mkv,.mka",
+                       help="Only consider files with these extensions")
+        p.add_argument("--no-header-reader", action="store_true",
+                       help="Identify every file with mkvmerge -J instead of reading Matroska headers directly")
+        p.add_argument("--trace", default=None, metavar="TRACE.json",
+                       help="Write timed spans (identify, header reads, command building, mux, queue waits) as a "
+                            "Chrome trace for chrome://tracing or ui.perfetto.dev, and print p50/p95/max per stage")
+
+    merge = subparsers.add_parser("merge", help="Merge every matching file pair")
+    add_common(merge)
+    merge.add_argument("--out", required=True, help="Output folder")
+    merge.add_argument("--preset", required=True, help="Preset JSON written by 'Save Preset'")
+    merge.add_argument("--no-resume", action="store_true",
+                       help="Remux every file even if the output folder's journal shows it already completed")
+    merge.add_argument("--continue-on-error", action="store_true",
+                       help="Keep merging the remaining files after a file fails")
+    merge.add_argument("--retries", type=int, default=0, help="Retry a failed file this many times")
+    merge.add_argument("--device-limits", default="", metavar="KIND=N,...",
+                       help="Concurrent jobs per device kind, e.g. rotational=2,ssd=8,network=4 "
+                            "(defaults: rotational=2, ssd=8, network=4, unknown=unlimited)")
+    merge.add_argument("--no-device-limits", action="store_true",
+                       help="Only apply --jobs, regardless of where the files live")
+    merge.add_argument("--auto-jobs", action="store_true",
+                       help="Tune the number of concurrent muxes from measured throughput, using --jobs as the ceiling")
+    merge.add_argument("--save-tuning", action="store_true",
+                       help="Store the tuned job count and the measured merge rate in the GUI's settings file, "
+                            "where later runs and the GUI start from them (by default they are only read)")
+    merge.add_argument("--order", choices=("size", "name"), default="size",
+                       help="Start the largest jobs first (size) or keep alphabetical order (name)")
+    merge.add_argument("--mismatch", choices=("all", "exclude", "cancel", "park"), default="exclude",
+                       help="What to do with pairs whose durations differ: skip them (exclude, the default), "
+                            "merge them (all, no check), stop before merging (cancel), or check while merging "
+                            "and leave mismatched pairs unmerged for review (park)")
+    merge.add_argument("--no-space-check", action="store_true",
+                       help="Start jobs even when the output volume looks too full for them (by default a job "
+                            "waits until its estimated output fits, keeping 512 MB free)")
+    merge.add_argument("--fail-if-no-space", action="store_true",
+                       help="Fail jobs whose output does not fit even with nothing else running, instead of "
+                            "waiting for space to be freed")
+    merge.add_argument("--verify", action="store_true",
+                       help="Check each output's headers (tracks, languages, flags, duration) before it replaces "
+                            "the final file; checks run alongside the next muxes")
+    merge.add_argument("--scratch", default="", metavar="DIR",
+                       help="Copy each pair's sources to this local folder ahead of its mux and write the output "
+                            "there, moving it to --out afterwards (for sources on network shares)")
+    merge.add_argument("--scratch-budget", type=float, default=DEFAULT_STAGING["budget_bytes"] / 1e9, metavar="GB",
+                       help="Space --scratch may use for staged sources and outputs")
+    merge.add_argument("--prefetch", type=int, default=DEFAULT_STAGING["prefetch"], metavar="N",
+                       help="Jobs whose sources are copied to --scratch ahead of the running ones")
+
+    add_metrics_arguments(merge)
+
+    plan = subparsers.add_parser("plan", help="Show the job order and predicted busiest-worker load without merging")
+    add_common(plan)
+    plan.add_argument("--preset", default=None, help="Preset JSON; without one, whole files are counted")
+    plan.add_argument("--order", choices=("size", "name"), default="size", help="Job order to evaluate")
+
+    analyze = subparsers.add_parser("analyze", help="Report pairs with mismatched durations")
+    add_common(analyze)
+
+    export = subparsers.add_parser("export", help="Write a .sh/.bat script, or a folder of mkvmerge option files "
+                                                  "with parallel runners")
+    add_common(export)
+    export.add_argument("--out", required=True, help="Output folder used in the generated commands")
+    export.add_argument("--preset", required=True, help="Preset JSON written by 'Save Preset'")
+    target = export.add_mutually_exclusive_group(required=True)
+    target.add_argument("--script", help="Script path; a .bat extension writes a Windows batch file")
+    target.add_argument("--job-folder",
+                        help="Folder for one @option file per pair plus run.sh (xargs -P), a Makefile (make -j) and "
+                             "run.ps1/run.bat (PowerShell jobs); reruns skip outputs newer than their inputs")
+
+    enqueue = subparsers.add_parser("enqueue", help="Write the batch as a job queue in a shared folder for 'worker'")
+    add_common(enqueue)
+    enqueue.add_argument("--out", required=True, help="Output folder, as seen by every worker")
+    enqueue.add_argument("--preset", required=True, help="Preset JSON written by 'Save Preset'")
+    enqueue.add_argument("--queue", required=True, help="Empty folder on storage every worker can reach")
+    enqueue.add_argument("--order", choices=("size", "name"), default="size", help="Order in which jobs are claimed")
+    enqueue.add_argument("--max-attempts", type=int, default=2,
+                         help="Times a failing file is tried, across all workers, before it is given up")
+
+    worker = subparsers.add_parser("worker", help="Merge jobs from a shared queue until none are left")
+    worker.add_argument("--queue", required=True, help="Queue folder written by 'enqueue'")
+    worker.add_argument("--mkvtoolnix", default=None,
+                        help="MKVToolNix installation folder on this host (default: saved GUI setting or PATH)")
+    worker.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 4), help="Concurrent jobs in this worker")
+    worker.add_argument("--lease-seconds", type=float, default=DEFAULT_LEASE_SECONDS,
+                        help="A job whose worker stopped renewing its lease this long ago is handed to another worker")
+    worker.add_argument("--no-wait", action="store_true",
+                        help="Exit once nothing is claimable instead of waiting for other workers' leases")
+    worker.add_argument("--no-cache", action="store_true", help="Do not use the identification cache")
+    worker.add_argument("--no-header-reader", action="store_true",
+                        help="Identify every file with mkvmerge -J instead of reading Matroska headers directly")
+    worker.add_argument("--trace", default=None, metavar="TRACE.json", help="Write a Chrome trace of this worker")
+    worker.add_argument("--verify", action="store_true", help="Check each output's headers before accepting it")
+    add_metrics_arguments(worker)
+
+    queue_status = subparsers.add_parser("queue-status", help="Count done, failed, running and pending queue jobs")
+    queue_status.add_argument("--queue", required=True, help="Queue folder written by 'enqueue'")
+    return parser
+
+
+def run_worker(args, reporter, mkvtoolnix_path):
+    try:
+        job_queue = JobQueue(args.queue, lease_seconds=args.lease_seconds)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        return 2
+    from batch_merger.engine import BatchEngine
+    batch = job_queue.batch
+    cache = None if args.no_cache else IdentifyCache(get_identify_cache_path())
+    try:
+        on_event, exporters = start_metrics(args, reporter, cache)
+    except OSError as e:
+        print(f"[ERROR] Could not start metrics: {e}")
+        return 2
+    # The queue's done/failed records replace the output folder's journal, which is not safe to share
+    engine = BatchEngine(mkvtoolnix_path, batch["folder1"], batch["folder2"], batch["output_folder"],
+                         batch["settings"], max_workers=args.jobs, identify_cache=cache, on_event=on_event,
+                         resume=False, header_reader=not args.no_header_reader, verify=args.verify)
+    engine.temp_tag = process_tag()
+    worker = QueueWorker(job_queue, engine, slots=args.jobs, poll_seconds=min(5.0, args.lease_seconds / 3),
+                         wait=not args.no_wait)
+    try:
+        result = worker.run()
+    except KeyboardInterrupt:
+        engine.cancel_event.set()
+        return 130
+    finally:
+        stop_metrics(exporters)
+        if cache is not None:
+            cache.close()
+    status = job_queue.status()
+    print(f"[INFO] Worker finished: {result['merged']} merged, {result['failed']} failed, "
+          f"{result['lost']} lost to other workers")
+    reporter({"event": "worker_complete", **result, "queue": status})
+    return 0 if not result["failed"] else 1
+
+
+def run(args, reporter):
+    if args.command == "queue-status":
+        try:
+            status = JobQueue(args.queue).status()
+        except FileNotFoundError as e:
+            print(f"[ERROR] {e}")
+            return 2
+        reporter({"event": "queue_status", **status})
+        return 0
+
+    mkvtoolnix_path = args.mkvtoolnix or default_mkvtoolnix_path()
+    if not os.path.exists(mkvmerge_executable(mkvtoolnix_path)):
+        print(f"[ERROR] mkvmerge not found at: {mkvtoolnix_path}")
+        return 2
+    if args.command == "worker":
+        return run_worker(args, reporter, mkvtoolnix_path)
+
+    # Loaded here rather than at the top, so --help and queue-status skip the engine's imports
+    from batch_merger.engine import BatchEngine
+    settings = read_preset(args.preset) if getattr(args, "preset", None) else {}
+    device_limits = None
+    if args.command == "merge" and not args.no_device_limits:
+        try:
+            device_limits = parse_device_limits(args.device_limits)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            return 2
+    cache = None if args.no_cache else IdentifyCache(get_identify_cache_path())
+    on_event, exporters = reporter, []
+    if args.command == "merge":
+        try:
+            on_event, exporters = start_metrics(args, reporter, cache)
+        except OSError as e:
+            print(f"[ERROR] Could not start metrics: {e}")
+            return 2
+    engine = BatchEngine(mkvtoolnix_path, args.folder1, args.folder2, getattr(args, "out", ""), settings,
+                         max_workers=args.jobs, identify_cache=cache, on_event=on_event,
+                         resume=not getattr(args, "no_resume", False),
+                         continue_on_error=getattr(args, "continue_on_error", False),
+                         retries=getattr(args, "retries", 0), device_limits=device_limits,
+                         autotune=getattr(args, "auto_jobs", False),
+                         autotune_start=read_settings().get("autotune_level"),
+                         order=getattr(args, "order", "size"), job_rate=read_settings().get("merge_job_rate"),
+                         header_reader=not args.no_header_reader, verify=getattr(args, "verify", False),
+                         free_space_margin=None if getattr(args, "no_space_check", False) else FREE_SPACE_MARGIN,
+                         fail_if_no_space=getattr(args, "fail_if_no_space", False),
+                         staging={"folder": getattr(args, "scratch", ""),
+                                  "budget_bytes": int(getattr(args, "scratch_budget", 0) * 1e9),
+                                  "prefetch": getattr(args, "prefetch", DEFAULT_STAGING["prefetch"])},
+                         pairing={"mode": args.pair_by, "pattern": args.pattern, "pattern2": args.pattern2,
+                                  "recursive": args.recursive, "extensions": args.extensions})
+    try:
+        matching_files = engine.find_matching_files()
+    except FileNotFoundError as e:
+        print(f"[ERROR] Folder not found: {e.filename}")
+        return 2
+    except (ValueError, re.error) as e:
+        print(f"[ERROR] Invalid pairing options: {e}")
+        return 2
+    if not matching_files:
+        print("[INFO] No matching files found")
+        return 0
+
+    try:
+        if args.command == "analyze":
+            engine.analyze_durations(matching_files)
+            return 0
+
+        if args.command == "plan":
+            engine.plan(matching_files)
+            return 0
+
+        if args.command == "export":
+            if args.job_folder:
+                return 0 if engine.export_job_folder(matching_files, args.job_folder)["success"] else 1
+            return 0 if engine.export_script(matching_files, args.script)["success"] else 1
+
+        if args.command == "enqueue":
+            return 0 if engine.enqueue(matching_files, args.queue, max_attempts=args.max_attempts)["success"] else 1
+
+        if args.mismatch not in ("all", "park"):
+            mismatched = engine.analyze_durations(matching_files)
+            if mismatched and args.mismatch == "cancel":
+                print(f"[ERROR] {len(mismatched)} file(s) have mismatched durations, nothing merged")
+                return 1
+            mismatched_names = {item[0] for item in mismatched}
+            matching_files = [f for f in matching_files if f not in mismatched_names]
+            if not matching_files:
+                print("[INFO] No files left to process after exclusion.")
+                return 0
+
+        os.makedirs(args.out, exist_ok=True)
+        result = engine.merge(matching_files, pipeline=args.mismatch == "park")
+        for entry in result.get("parked", []):
+            reason = "durations differ" if entry["reason"] == "duration" else "no track selection for its layout"
+            print(f"[INFO] Not merged, {reason}: {entry['file']}")
+        # The settings file belongs to the GUI, so scripted runs leave it alone unless asked
+        if args.save_tuning and result.get("concurrency", {}).get("curve"):
+            update_settings(autotune_level=result["concurrency"]["level"], autotune_curve=result["concurrency"]["curve"])
+        if args.save_tuning and result.get("job_rate"):
+            update_settings(merge_job_rate=result["job_rate"])
+        return 0 if result["success"] else 1
+    except KeyboardInterrupt:
+        engine.cancel_event.set()
+        return 130
+    finally:
+        stop_metrics(exporters)
+        if cache is not None:
+            cache.close()
+
+
+def write_trace(tracer, path):
+    try:
+        tracer.write(path)
+    except OSError as e:
+        print(f"[ERROR] Could not write trace {path}: {e}")
+        return
+    print(f"[INFO] Trace written to {path}\n{tracer.format_summary()}")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # stdout carries the JSON progress stream, so route the engine's log prints to stderr
+    reporter = JsonLineReporter(sys.stdout)
+    tracer = tracing.enable() if getattr(args, "trace", None) else None
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            return run(args, reporter)
+        finally:
+            if tracer is not None:
+                tracing.disable()
+                write_trace(tracer, args.trace)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
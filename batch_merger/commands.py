@@ -0,0 +1,161 @@
+import collections
+import re
+import shlex
+import subprocess
+
+# "#GUI#progress 42%" in --gui-mode (never translated), "Progress: 42%" otherwise
+PROGRESS_RE = re.compile(r"(?:#GUI#progress|Progress:)\s*(\d+)%")
+
+TRACK_SELECTION_FLAGS = (
+    ("video", "--video-tracks", "--no-video"),
+    ("audio", "--audio-tracks", "--no-audio"),
+    ("subtitles", "--subtitle-tracks", "--no-subtitles"),
+)
+
+
+def track_settings_for(settings, file_index):
+    # Presets loaded from JSON have string keys, in-memory snapshots have int keys
+    tracks = settings.get("tracks", {})
+    return tracks.get(file_index) or tracks.get(str(file_index)) or []
+
+
+def selected_tracks(selections, info):
+    available = {t.get("id"): t for t in (info or {}).get("tracks", [])}
+    chosen = []
+    for selection in selections:
+        if not selection.get("include"):
+            continue
+        track = available.get(selection.get("track_id"))
+        if track is not None:
+            chosen.append((selection, track))
+    return chosen
+
+
+def build_file_options(chosen, include_chapters, include_tags, include_attachments):
+    args = []
+    for selection, track in chosen:
+        tid = track["id"]
+        if selection.get("language"):
+            args += ["--language", f"{tid}:{selection['language']}"]
+        args += ["--track-name", f"{tid}:{selection.get('name') or ''}"]
+        args += ["--default-track-flag", f"{tid}:{1 if selection.get('default') else 0}"]
+        args += ["--forced-display-flag", f"{tid}:{1 if selection.get('forced') else 0}"]
+
+    for track_type, keep_flag, drop_flag in TRACK_SELECTION_FLAGS:
+        ids = [str(track["id"]) for _, track in chosen if track.get("type") == track_type]
+        if ids:
+            args += [keep_flag, ",".join(ids)]
+        else:
+            args.append(drop_flag)
+
+    if not include_chapters:
+        args.append("--no-chapters")
+    if not include_tags:
+        args.append("--no-global-tags")
+    if not include_attachments:
+        args.append("--no-attachments")
+    return args
+
+
+def build_merge_command(mkvmerge_path, output_path, sources, settings):
+    """Turn a track-selection snapshot and one identification document per source into an mkvmerge argv.
+
+    ``sources`` is ``[(path, identify_json), ...]`` in File 1, File 2 order and ``settings`` uses the
+    preset layout written by ``save_preset``.
+    """
+    props = settings.get("global_properties", {})
+    cmd = [mkvmerge_path, "-o", output_path]
+    if props.get("title"):
+        cmd += ["--title", props["title"]]
+
+    for file_index, (path, info) in enumerate(sources, start=1):
+        selections = track_settings_for(settings, file_index)
+        if info is None and any(s.get("include") for s in selections):
+            raise ValueError(f"No identification data for {path}")
+        chosen = selected_tracks(selections, info)
+        if not chosen:
+            continue
+        cmd += build_file_options(
+            chosen,
+            props.get(f"include_chapters_file{file_index}", False),
+            props.get(f"include_global_tags_file{file_index}", False),
+            props.get(f"include_attachments_file{file_index}", False),
+        )
+        cmd.append(path)
+    return cmd
+
+
+def iter_output_lines(stream):
+    # mkvmerge rewrites its progress line with \r, so split on both line endings
+    buffer = b""
+    while True:
+        chunk = stream.read1(4096) if hasattr(stream, "read1") else stream.read(4096)
+        if not chunk:
+            break
+        buffer += chunk
+        parts = re.split(rb"[\r\n]", buffer)
+        buffer = parts.pop()
+        for part in parts:
+            if part:
+                yield part.decode("utf-8", errors="replace")
+    if buffer:
+        yield buffer.decode("utf-8", errors="replace")
+
+
+def run_merge_command(cmd, on_progress=None):
+    """Run one mux; with ``on_progress`` mkvmerge runs in --gui-mode and each new percentage is reported."""
+    if on_progress is None:
+        process = subprocess.run(cmd, capture_output=True, text=True)
+        returncode = process.returncode
+        output_lines = ((process.stdout or "") + (process.stderr or "")).splitlines()
+    else:
+        run_cmd = [cmd[0], "--gui-mode"] + list(cmd[1:])
+        tail = collections.deque(maxlen=50)
+        last_percent = None
+        process = subprocess.Popen(run_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        try:
+            for line in iter_output_lines(process.stdout):
+                match = PROGRESS_RE.search(line)
+                if match:
+                    percent = int(match.group(1))
+                    if percent != last_percent:
+                        last_percent = percent
+                        on_progress(percent)
+                elif line.startswith("#GUI#error"):
+                    message = line[len("#GUI#error"):].strip()
+                    tail.append(message if message.startswith("Error") else f"Error: {message}")
+                else:
+                    tail.append(line)
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        output_lines = list(tail)
+
+    # mkvmerge exits with 1 for warnings (output is complete) and 2 for errors
+    if returncode not in (0, 1):
+        errors = [line for line in output_lines if line.startswith("Error")]
+        detail = errors[-1] if errors else "\n".join(output_lines).strip()[-500:]
+        raise RuntimeError(f"mkvmerge exited with status {returncode}: {detail}")
+    return returncode
+
+
+def format_script_command(cmd, is_bat):
+    continuation = " ^\n  " if is_bat else " \\\n  "
+    formatted_args = []
+    for arg in cmd:
+        arg_str = str(arg)
+        if is_bat:
+            quoted = f'"{arg_str}"' if " " in arg_str or not arg_str else arg_str
+        else:
+            quoted = shlex.quote(arg_str)
+        formatted_args.append(quoted)
+
+    if not formatted_args:
+        return ""
+    readable_cmd = formatted_args[0]
+    for arg in formatted_args[1:]:
+        if arg.startswith('"-') or arg.startswith("'-") or arg.startswith("-"):
+            readable_cmd += continuation + arg
+        else:
+            readable_cmd += " " + arg
+    return readable_cmd
@@ -0,0 +1,439 @@
+import mmap
+import struct
+
+# Element IDs (with their length markers, as they appear in the file)
+EBML_HEADER = 0x1A45DFA3
+EBML_MAX_ID_LENGTH = 0x42F2
+EBML_MAX_SIZE_LENGTH = 0x42F3
+DOC_TYPE = 0x4282
+DOC_TYPE_READ_VERSION = 0x4285
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMESTAMP_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TITLE = 0x7BA9
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+TRACK_UID = 0x73C5
+TRACK_TYPE = 0x83
+FLAG_ENABLED = 0xB9
+FLAG_DEFAULT = 0x88
+FLAG_FORCED = 0x55AA
+NAME = 0x536E
+LANGUAGE = 0x22B59C
+LANGUAGE_BCP47 = 0x22B59D
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+AUDIO = 0xE1
+SAMPLING_FREQUENCY = 0xB5
+CHANNELS = 0x9F
+CLUSTER = 0x1F43B675
+CHAPTERS = 0x1043A770
+EDITION_ENTRY = 0x45B9
+CHAPTER_ATOM = 0xB6
+TAGS = 0x1254C367
+TAG = 0x7373
+TARGETS = 0x63C0
+TAG_TRACK_UID = 0x63C5
+SIMPLE_TAG = 0x67C8
+TAG_NAME = 0x45A3
+TAG_STRING = 0x4487
+ATTACHMENTS = 0x1941A469
+ATTACHED_FILE = 0x61A7
+FILE_DESCRIPTION = 0x467E
+FILE_NAME = 0x466E
+FILE_MIME_TYPE = 0x4660
+FILE_DATA = 0x465C
+FILE_UID = 0x46AE
+
+TRACK_TYPES = {1: "video", 2: "audio", 17: "subtitles", 18: "buttons"}
+
+# mkvmerge's display names for the common CodecIDs; anything else is shown as the raw CodecID
+CODEC_NAMES = {
+    "V_MPEG4/ISO/AVC": "AVC/H.264/MPEG-4p10",
+    "V_MPEGH/ISO/HEVC": "HEVC/H.265/MPEG-H",
+    "V_AV1": "AV1",
+    "V_VP8": "VP8",
+    "V_VP9": "VP9",
+    "V_MPEG2": "MPEG-1/2",
+    "V_MS/VFW/FOURCC": "VfW",
+    "A_AAC": "AAC",
+    "A_AC3": "AC-3",
+    "A_EAC3": "E-AC-3",
+    "A_DTS": "DTS",
+    "A_TRUEHD": "TrueHD",
+    "A_FLAC": "FLAC",
+    "A_OPUS": "Opus",
+    "A_VORBIS": "Vorbis",
+    "A_MPEG/L2": "MP2",
+    "A_MPEG/L3": "MP3",
+    "A_PCM/INT/LIT": "PCM",
+    "S_TEXT/UTF8": "SubRip/SRT",
+    "S_TEXT/ASS": "SubStationAlpha",
+    "S_TEXT/SSA": "SubStationAlpha",
+    "S_TEXT/WEBVTT": "WebVTT",
+    "S_HDMV/PGS": "HDMV PGS",
+    "S_VOBSUB": "VobSub",
+}
+
+
+class UnsupportedFile(ValueError):
+    """Raised for anything the header reader does not handle; callers fall back to ``mkvmerge -J``."""
+
+
+def _read_id(buf, pos):
+    first = buf[pos]
+    length = 9 - first.bit_length()
+    if first == 0 or length > 4:
+        raise UnsupportedFile(f"invalid element ID at offset {pos}")
+    return int.from_bytes(buf[pos:pos + length], "big"), length
+
+
+def _read_size(buf, pos):
+    first = buf[pos]
+    length = 9 - first.bit_length()
+    if first == 0:
+        raise UnsupportedFile(f"invalid element size at offset {pos}")
+    value = first & ((1 << (8 - length)) - 1)
+    for byte in buf[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    unknown = value == (1 << (7 * length)) - 1
+    return value, length, unknown
+
+
+def _children(buf, start, end):
+    """Yields (id, data_start, data_end) for the elements in [start, end); data_end is None for unknown sizes."""
+    pos = start
+    while pos < end:
+        element_id, id_length = _read_id(buf, pos)
+        size, size_length, unknown = _read_size(buf, pos + id_length)
+        data = pos + id_length + size_length
+        if unknown:
+            yield element_id, data, None
+            return
+        if data + size > end:
+            raise UnsupportedFile(f"element {element_id:X} at offset {pos} runs past its parent")
+        yield element_id, data, data + size
+        pos = data + size
+
+
+def _uint(buf, start, end):
+    return int.from_bytes(buf[start:end], "big")
+
+
+def _float(buf, start, end):
+    if end - start == 0:
+        return 0.0
+    if end - start not in (4, 8):
+        raise UnsupportedFile(f"invalid float size at offset {start}")
+    return struct.unpack(">f" if end - start == 4 else ">d", buf[start:end])[0]
+
+
+def _string(buf, start, end):
+    return bytes(buf[start:end]).rstrip(b"\x00").decode("utf-8", "replace")
+
+
+def _known_children(buf, start, end):
+    for element_id, data, data_end in _children(buf, start, end):
+        if data_end is None:
+            raise UnsupportedFile(f"unknown-size element {element_id:X}")
+        yield element_id, data, data_end
+
+
+def _parse_ebml_header(buf, start, end):
+    doc_type = None
+    for element_id, data, data_end in _known_children(buf, start, end):
+        if element_id == DOC_TYPE:
+            doc_type = _string(buf, data, data_end)
+        elif element_id == DOC_TYPE_READ_VERSION and _uint(buf, data, data_end) > 4:
+            raise UnsupportedFile("newer Matroska version")
+        elif element_id == EBML_MAX_ID_LENGTH and _uint(buf, data, data_end) > 4:
+            raise UnsupportedFile("unsupported EBMLMaxIDLength")
+        elif element_id == EBML_MAX_SIZE_LENGTH and _uint(buf, data, data_end) > 8:
+            raise UnsupportedFile("unsupported EBMLMaxSizeLength")
+    if doc_type not in ("matroska", "webm"):
+        raise UnsupportedFile(f"not a Matroska file (DocType {doc_type!r})")
+
+
+def _locate_level1(buf, segment_start, segment_end):
+    """Offsets of the level-1 elements that matter, from the segment head and the SeekHead(s).
+
+    Scanning stops at the first Cluster; elements written after the media data (typically Tags,
+    sometimes Chapters) are only reachable through the SeekHead, which keeps reads to a few KB.
+    """
+    found = {}
+    seek_heads = []
+    for element_id, data, data_end in _children(buf, segment_start, segment_end):
+        if element_id == CLUSTER:
+            break
+        if data_end is None:
+            raise UnsupportedFile(f"unknown-size element {element_id:X}")
+        found.setdefault(element_id, set()).add((data, data_end))
+        if element_id == SEEK_HEAD:
+            seek_heads.append((data, data_end))
+
+    visited = set()
+    while seek_heads:
+        data, data_end = seek_heads.pop()
+        if data in visited:
+            continue
+        visited.add(data)
+        for element_id, seek, seek_end in _known_children(buf, data, data_end):
+            if element_id != SEEK:
+                continue
+            target_id = position = None
+            for child_id, child, child_end in _known_children(buf, seek, seek_end):
+                if child_id == SEEK_ID:
+                    target_id = _uint(buf, child, child_end)
+                elif child_id == SEEK_POSITION:
+                    position = _uint(buf, child, child_end)
+            if target_id not in (INFO, TRACKS, CHAPTERS, TAGS, ATTACHMENTS, SEEK_HEAD) or position is None:
+                continue
+            offset = segment_start + position
+            if offset >= segment_end:
+                raise UnsupportedFile("SeekHead entry points past the end of the file")
+            element_id_at, id_length = _read_id(buf, offset)
+            if element_id_at != target_id:
+                raise UnsupportedFile(f"SeekHead entry for {target_id:X} does not match the file")
+            size, size_length, unknown = _read_size(buf, offset + id_length)
+            if unknown:
+                raise UnsupportedFile(f"unknown-size element {target_id:X}")
+            start = offset + id_length + size_length
+            if start + size > segment_end:
+                raise UnsupportedFile(f"element {target_id:X} runs past the end of the file")
+            found.setdefault(target_id, set()).add((start, start + size))
+            if target_id == SEEK_HEAD:
+                seek_heads.append((start, start + size))
+    return found
+
+
+def _parse_info(buf, start, end):
+    scale, duration, title = 1000000, None, None
+    for element_id, data, data_end in _known_children(buf, start, end):
+        if element_id == TIMESTAMP_SCALE:
+            scale = _uint(buf, data, data_end)
+        elif element_id == DURATION:
+            duration = _float(buf, data, data_end)
+        elif element_id == TITLE:
+            title = _string(buf, data, data_end)
+    return scale, duration, title
+
+
+def _parse_track(buf, start, end, track_id):
+    values = {"enabled": 1, "default": 1, "forced": 0, "language": "eng"}
+    properties = {}
+    for element_id, data, data_end in _known_children(buf, start, end):
+        if element_id == TRACK_NUMBER:
+            values["number"] = _uint(buf, data, data_end)
+        elif element_id == TRACK_UID:
+            values["uid"] = _uint(buf, data, data_end)
+        elif element_id == TRACK_TYPE:
+            values["type"] = _uint(buf, data, data_end)
+        elif element_id == FLAG_ENABLED:
+            values["enabled"] = _uint(buf, data, data_end)
+        elif element_id == FLAG_DEFAULT:
+            values["default"] = _uint(buf, data, data_end)
+        elif element_id == FLAG_FORCED:
+            values["forced"] = _uint(buf, data, data_end)
+        elif element_id == NAME:
+            properties["track_name"] = _string(buf, data, data_end)
+        elif element_id == LANGUAGE:
+            values["language"] = _string(buf, data, data_end)
+        elif element_id == LANGUAGE_BCP47:
+            properties["language_ietf"] = _string(buf, data, data_end)
+        elif element_id == CODEC_ID:
+            values["codec_id"] = _string(buf, data, data_end)
+        elif element_id == VIDEO:
+            width = height = None
+            for child_id, child, child_end in _known_children(buf, data, data_end):
+                if child_id == PIXEL_WIDTH:
+                    width = _uint(buf, child, child_end)
+                elif child_id == PIXEL_HEIGHT:
+                    height = _uint(buf, child, child_end)
+            if width and height:
+                properties["pixel_dimensions"] = f"{width}x{height}"
+        elif element_id == AUDIO:
+            properties["audio_sampling_frequency"] = 8000
+            properties["audio_channels"] = 1
+            for child_id, child, child_end in _known_children(buf, data, data_end):
+                if child_id == SAMPLING_FREQUENCY:
+                    properties["audio_sampling_frequency"] = int(_float(buf, child, child_end))
+                elif child_id == CHANNELS:
+                    properties["audio_channels"] = _uint(buf, child, child_end)
+
+    track_type = TRACK_TYPES.get(values.get("type"))
+    if track_type is None or "codec_id" not in values or "number" not in values:
+        raise UnsupportedFile(f"track entry {track_id} has an unsupported type or is incomplete")
+    properties.update({
+        "number": values["number"],
+        "uid": values.get("uid"),
+        "codec_id": values["codec_id"],
+        "language": values["language"],
+        "enabled_track": bool(values["enabled"]),
+        "default_track": bool(values["default"]),
+        "forced_track": bool(values["forced"]),
+    })
+    return {
+        "id": track_id,
+        "type": track_type,
+        "codec": CODEC_NAMES.get(values["codec_id"], values["codec_id"]),
+        "properties": properties,
+    }
+
+
+def _count_chapters(buf, start, end):
+    count = 0
+    for element_id, data, data_end in _known_children(buf, start, end):
+        if element_id == EDITION_ENTRY:
+            count += sum(1 for child_id, _, _ in _known_children(buf, data, data_end) if child_id == CHAPTER_ATOM)
+    return count
+
+
+def _parse_tags(buf, start, end):
+    """Returns (global tag count, {track UID: [(name, value), ...]}) for one Tags element."""
+    global_count = 0
+    track_tags = {}
+    for element_id, data, data_end in _known_children(buf, start, end):
+        if element_id != TAG:
+            continue
+        track_uids = []
+        simple = []
+        for child_id, child, child_end in _known_children(buf, data, data_end):
+            if child_id == TARGETS:
+                track_uids = [_uint(buf, s, e) for cid, s, e in _known_children(buf, child, child_end)
+                              if cid == TAG_TRACK_UID]
+            elif child_id == SIMPLE_TAG:
+                name = value = None
+                for sub_id, sub, sub_end in _known_children(buf, child, child_end):
+                    if sub_id == TAG_NAME:
+                        name = _string(buf, sub, sub_end)
+                    elif sub_id == TAG_STRING:
+                        value = _string(buf, sub, sub_end)
+                if name:
+                    simple.append((name, value))
+        track_uids = [uid for uid in track_uids if uid]
+        if not track_uids:
+            global_count += 1
+        for uid in track_uids:
+            track_tags.setdefault(uid, []).extend(simple)
+    return global_count, track_tags
+
+
+def _parse_attachments(buf, start, end, first_id):
+    attachments = []
+    for element_id, data, data_end in _known_children(buf, start, end):
+        if element_id != ATTACHED_FILE:
+            continue
+        entry = {"id": first_id + len(attachments), "file_name": "", "content_type": "", "description": "", "size": 0,
+                 "properties": {}}
+        for child_id, child, child_end in _known_children(buf, data, data_end):
+            if child_id == FILE_NAME:
+                entry["file_name"] = _string(buf, child, child_end)
+            elif child_id == FILE_MIME_TYPE:
+                entry["content_type"] = _string(buf, child, child_end)
+            elif child_id == FILE_DESCRIPTION:
+                entry["description"] = _string(buf, child, child_end)
+            elif child_id == FILE_DATA:
+                # Only the size is needed; the payload itself is never touched
+                entry["size"] = child_end - child
+            elif child_id == FILE_UID:
+                entry["properties"]["uid"] = _uint(buf, child, child_end)
+        attachments.append(entry)
+    return attachments
+
+
+def parse_header(buf):
+    """Builds the subset of ``mkvmerge -J`` output the app uses from an in-memory Matroska file."""
+    element_id, id_length = _read_id(buf, 0)
+    if element_id != EBML_HEADER:
+        raise UnsupportedFile("no EBML header")
+    size, size_length, unknown = _read_size(buf, id_length)
+    if unknown:
+        raise UnsupportedFile("unknown-size EBML header")
+    header_end = id_length + size_length + size
+    _parse_ebml_header(buf, id_length + size_length, header_end)
+
+    segment = None
+    for element_id, data, data_end in _children(buf, header_end, len(buf)):
+        if element_id == SEGMENT:
+            segment = (data, len(buf) if data_end is None else data_end)
+            break
+    if segment is None:
+        raise UnsupportedFile("no Segment element")
+
+    found = _locate_level1(buf, *segment)
+    if len(found.get(INFO, ())) != 1 or len(found.get(TRACKS, ())) != 1:
+        raise UnsupportedFile("missing or repeated Info/Tracks element")
+
+    scale, duration, title = _parse_info(buf, *next(iter(found[INFO])))
+    if duration is None:
+        # mkvmerge derives the duration from the last cluster; leave that to it
+        raise UnsupportedFile("segment has no Duration element")
+
+    tracks = []
+    tracks_start, tracks_end = next(iter(found[TRACKS]))
+    for element_id, data, data_end in _known_children(buf, tracks_start, tracks_end):
+        if element_id == TRACK_ENTRY:
+            # mkvmerge numbers tracks in the order of their TrackEntry elements
+            tracks.append(_parse_track(buf, data, data_end, len(tracks)))
+    if not tracks:
+        raise UnsupportedFile("no tracks")
+
+    global_tags = 0
+    tags_by_uid = {}
+    for start, end in sorted(found.get(TAGS, ())):
+        count, track_tags = _parse_tags(buf, start, end)
+        global_tags += count
+        for uid, simple in track_tags.items():
+            tags_by_uid.setdefault(uid, []).extend(simple)
+    track_tags = []
+    for track in tracks:
+        simple = tags_by_uid.get(track["properties"]["uid"])
+        if not simple:
+            continue
+        for name, value in simple:
+            track["properties"][f"tag_{name.lower()}"] = value
+        track_tags.append({"num_entries": len(simple), "track_id": track["id"]})
+
+    attachments = []
+    for start, end in sorted(found.get(ATTACHMENTS, ())):
+        attachments += _parse_attachments(buf, start, end, len(attachments) + 1)
+    chapters = sum(_count_chapters(buf, start, end) for start, end in found.get(CHAPTERS, ()))
+
+    properties = {"duration": int(round(duration * scale))}
+    if title:
+        properties["title"] = title
+    return {
+        "container": {"recognized": True, "supported": True, "type": "Matroska", "properties": properties},
+        "tracks": tracks,
+        "attachments": attachments,
+        "chapters": [{"num_entries": chapters}] if chapters else [],
+        "global_tags": [{"num_entries": global_tags}] if global_tags else [],
+        "track_tags": track_tags,
+    }
+
+
+def read_header(filepath):
+    """``mkvmerge -J``-style identification of a Matroska file, read straight from its headers.
+
+    The file is memory-mapped, so only the pages holding the EBML header, SeekHead, Info, Tracks,
+    Tags, Chapters and Attachments elements are read. Raises ``UnsupportedFile`` for anything
+    outside what this reader understands.
+    """
+    with open(filepath, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise UnsupportedFile("empty file")
+        with mapped:
+            try:
+                return parse_header(mapped)
+            except (IndexError, struct.error) as e:
+                raise UnsupportedFile(f"truncated or malformed header: {e}")
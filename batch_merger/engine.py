@@ -0,0 +1,882 @@
+import concurrent.futures
+import contextlib
+import datetime
+import collections
+import os
+import queue
+import shutil
+import stat
+import threading
+import time
+import traceback
+
+from batch_merger import tracing
+from batch_merger.commands import (build_merge_command, format_script_command, run_merge_command, selected_tracks,
+                                   track_settings_for)
+from batch_merger.ebml import UnsupportedFile, read_header
+from batch_merger.identify import mkvmerge_executable, run_identify
+from batch_merger.jobqueue import JobQueue
+from batch_merger.journal import JobJournal, command_digest, file_fingerprint
+from batch_merger.layouts import layout_fingerprint, layout_tracks
+from batch_merger.optionfiles import option_file_id, write_job_folder
+from batch_merger.pairing import pair_files
+from batch_merger.progress import BatchProgress
+from batch_merger.scheduling import (FREE_SPACE_MARGIN, ConcurrencyAutotuner, DeviceLimiter, FreeSpaceGate,
+                                     JobScheduler, StorageTopology, longest_first_key, order_longest_first,
+                                     predict_makespan)
+from batch_merger.staging import DEFAULT_STAGING, ScratchStager
+from batch_merger.verify import VERIFY_WORKERS, VerificationError, check_output, expected_output
+
+DURATION_TOLERANCE_NS = 100000000
+ERROR_LOG_FILENAME = "mkv_merger_error_log.txt"
+EXPORT_MAX_WORKERS = 32
+
+
+def find_matching_files(folder1, folder2):
+    return [name for name, _, _ in pair_files(folder1, folder2)["pairs"]]
+
+
+def summarize_merge(result, max_listed=5):
+    merged, skipped, total = result["merged"], result["skipped"], result["total"]
+    failed = result["failed"]
+    if result["cancelled"]:
+        lines = [f"Merge cancelled. {merged} of {total} files merged."]
+    elif result["stopped_early"]:
+        lines = [f"Stopped after an error. {merged} of {total} files merged."]
+    elif not failed and not result.get("parked"):
+        lines = ["All files merged successfully!"]
+    elif not failed:
+        lines = [f"{merged} of {total} files merged."]
+    else:
+        lines = [f"{merged} of {total} files merged, {len(failed)} failed."]
+    if skipped:
+        lines.append(f"{skipped} already complete from a previous run.")
+    parked = result.get("parked") or []
+    by_duration = sum(1 for entry in parked if entry["reason"] == "duration")
+    if by_duration:
+        lines.append(f"{by_duration} with mismatched durations held back for review.")
+    if len(parked) > by_duration:
+        lines.append(f"{len(parked) - by_duration} held back: no track selection for their stream layout.")
+    if result["retried"]:
+        lines.append(f"{result['retried']} retr{'y' if result['retried'] == 1 else 'ies'} performed.")
+    for entry in failed[:max_listed]:
+        lines.append(f"Error merging {entry['file']}: {entry['error']}")
+    if len(failed) > max_listed:
+        lines.append(f"... and {len(failed) - max_listed} more.")
+    if failed:
+        lines.append(f"Details in {ERROR_LOG_FILENAME}")
+    return "\n".join(lines)
+
+
+class BatchEngine:
+    """Tk-free batch logic shared by the GUI and the command-line entry point.
+
+    Progress is reported through ``on_event`` as plain dictionaries with an ``event`` key,
+    so the CLI can print them as JSON lines and the GUI can forward them to Tk.
+    """
+
+    def __init__(self, mkvtoolnix_path, folder1, folder2, output_folder, settings,
+                 max_workers=4, identify_cache=None, on_event=None, cancel_event=None, resume=True,
+                 continue_on_error=False, retries=0, retry_delay=5.0, device_limits=None,
+                 autotune=False, autotune_start=None, order="size", job_rate=None, header_reader=True,
+                 pairing=None, pairs=None, verify=False, free_space_margin=FREE_SPACE_MARGIN, staging=None,
+                 fail_if_no_space=False):
+        self.mkvtoolnix_path = mkvtoolnix_path
+        self.mkvmerge_path = mkvmerge_executable(mkvtoolnix_path)
+        self.folder1 = folder1
+        self.folder2 = folder2
+        self.output_folder = output_folder
+        self.settings = settings or {}
+        self.max_workers = max(1, int(max_workers))
+        self.identify_cache = identify_cache
+        self.on_event = on_event
+        self.cancel_event = cancel_event or threading.Event()
+        self.resume = resume
+        self.continue_on_error = continue_on_error
+        self.retries = max(0, int(retries))
+        self.retry_delay = retry_delay
+        # None disables per-device limits; otherwise a {kind: limit} dict (see scheduling.DEFAULT_DEVICE_LIMITS)
+        self.device_limits = device_limits
+        # With autotune, max_workers is the ceiling and the in-flight level is hill-climbed from autotune_start
+        self.autotune = autotune
+        self.autotune_start = autotune_start
+        # "size" runs the most expensive jobs first, "name" keeps the alphabetical order
+        self.order = order
+        # Bytes/second one job managed in a previous batch, used to turn the plan into a time estimate
+        self.job_rate = job_rate
+        # Read-only checks parse Matroska headers directly instead of spawning mkvmerge -J
+        self.header_reader = header_reader
+        self.header_stats = {"direct": 0, "fallback": 0}
+        self._stats_lock = threading.Lock()
+        # Pairing options (see pairing.DEFAULT_PAIRING); pairs maps an output name to its two sources
+        self.pairing = pairing
+        self.pairs = pairs or {}
+        self.pairing_report = None
+        # Filled by analyze_durations: [{"fingerprint", "files", "sample"}], largest group first
+        self.layout_clusters = []
+        self.progress = None
+        # Added to partial output names so workers on different hosts never write the same temp file
+        self.temp_tag = None
+        # Check each output's headers against the track selection before it replaces the final file
+        self.verify = verify
+        # Bytes kept free on the output volume; jobs wait until they fit. None turns the check off
+        self.free_space_margin = free_space_margin
+        # Fail jobs that do not fit even with nothing else running, instead of waiting for space to be freed
+        self.fail_if_no_space = fail_if_no_space
+        # Local scratch staging of sources and outputs (see staging.DEFAULT_STAGING); off without a folder
+        self.staging = dict(DEFAULT_STAGING, **(staging or {}))
+
+    def emit(self, event, **fields):
+        if self.on_event is None:
+            return
+        payload = {"event": event, "time": round(time.time(), 3)}
+        payload.update(fields)
+        try:
+            self.on_event(payload)
+        except Exception:
+            traceback.print_exc()
+
+    def identify(self, filepath):
+        with tracing.span("identify", file=os.path.basename(filepath)):
+            if self.identify_cache is not None:
+                return self.identify_cache.identify(self.mkvmerge_path, filepath)
+            return run_identify(self.mkvmerge_path, filepath)
+
+    def identify_quiet(self, filepath):
+        try:
+            return self.identify(filepath)
+        except Exception as e:
+            print(f"[ERROR] Exception while parsing mkvmerge JSON for {filepath}: {e}")
+            return None
+
+    def read_header(self, filepath, fallback=True):
+        """Identification for duration checks and cost estimates; commands are always built from mkvmerge -J."""
+        if self.header_reader:
+            try:
+                with tracing.span("header_read", file=os.path.basename(filepath)):
+                    data = read_header(filepath)
+                with self._stats_lock:
+                    self.header_stats["direct"] += 1
+                return data
+            except (UnsupportedFile, OSError) as e:
+                with self._stats_lock:
+                    self.header_stats["fallback"] += 1
+                if fallback:
+                    print(f"[INFO] Using mkvmerge for {os.path.basename(filepath)}: {e}")
+        return self.identify_quiet(filepath) if fallback else None
+
+    def find_matching_files(self):
+        report = pair_files(self.folder1, self.folder2, self.pairing)
+        self.pairs = {name: (src1, src2) for name, src1, src2 in report["pairs"]}
+        self.pairing_report = report
+        unmatched = {key: report[key] for key in ("unmatched1", "unmatched2", "duplicates1", "duplicates2")}
+        if any(unmatched.values()):
+            print(f"[INFO] Paired {len(report['pairs'])} files; unmatched: {len(report['unmatched1'])} in folder 1, "
+                  f"{len(report['unmatched2'])} in folder 2; duplicate keys: "
+                  f"{len(report['duplicates1']) + len(report['duplicates2'])}")
+        self.emit("pairing", paired=len(report["pairs"]), **unmatched)
+        return sorted(self.pairs)
+
+    def source_paths(self, filename):
+        output = os.path.join(self.output_folder, *filename.split("/"))
+        if filename in self.pairs:
+            return self.pairs[filename] + (output,)
+        return (os.path.join(self.folder1, filename),
+                os.path.join(self.folder2, filename),
+                output)
+
+    def make_job(self, index, filename):
+        src1, src2, final_output = self.source_paths(filename)
+        return {"index": index, "name": filename, "src1": src1, "src2": src2, "output": final_output}
+
+    def input_size(self, job):
+        if "input_size" not in job:
+            size = 0
+            for path in (job["src1"], job["src2"]):
+                try:
+                    size += os.path.getsize(path)
+                except OSError:
+                    pass
+            job["input_size"] = size
+        return job["input_size"]
+
+    def estimate_cost(self, job):
+        """Bytes mkvmerge has to copy for a job.
+
+        Uses the selected tracks' statistics tags (``tag_number_of_bytes``) when the identification
+        data has them, otherwise the size of every source that contributes at least one track.
+        Headers are read directly; mkvmerge is only asked through the cache, whose results the merge
+        reuses anyway.
+        """
+        if "cost" in job:
+            return job["cost"]
+        try:
+            settings = self.settings_for(job["name"])
+        except ValueError:
+            settings = self.settings
+        cost = 0
+        for file_index, path in ((1, job["src1"]), (2, job["src2"])):
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                size = 0
+            selections = track_settings_for(settings, file_index)
+            info = self.read_header(path, fallback=self.identify_cache is not None) if selections else None
+            if info is None:
+                cost += size
+                continue
+            chosen = selected_tracks(selections, info)
+            track_bytes = [track.get("properties", {}).get("tag_number_of_bytes") for _, track in chosen]
+            if chosen and all(track_bytes):
+                cost += sum(int(b) for b in track_bytes)
+            elif chosen:
+                cost += size
+        job["cost"] = cost
+        return cost
+
+    def plan(self, matching_files, workers=None):
+        jobs = [self.make_job(i, filename) for i, filename in enumerate(matching_files)]
+        for job in jobs:
+            self.estimate_cost(job)
+        ordered = order_longest_first(jobs) if self.order == "size" else jobs
+        workers = workers or self.max_workers
+        makespan = predict_makespan([job["cost"] for job in ordered], workers)
+        plan = {
+            "order": [job["name"] for job in ordered],
+            "costs": [job["cost"] for job in ordered],
+            "workers": workers,
+            "total_bytes": sum(job["cost"] for job in jobs),
+            "makespan_bytes": makespan,
+            "name_order_makespan_bytes": predict_makespan([job["cost"] for job in jobs], workers),
+            "makespan_seconds": round(makespan / self.job_rate, 1) if self.job_rate else None,
+        }
+        self.emit("plan", **plan)
+        return ordered, plan
+
+    def pair_fingerprint(self, filename):
+        path1, path2, _ = self.source_paths(filename)
+        return layout_fingerprint(self.read_header(path1), self.read_header(path2))
+
+    def settings_for(self, filename):
+        """The preset with the track selection for this pair's stream layout."""
+        if not self.settings.get("layouts"):
+            return self.settings
+        fingerprint = self.pair_fingerprint(filename)
+        tracks = layout_tracks(self.settings, fingerprint)
+        if tracks is None:
+            raise ValueError(f"The preset has no track selection for the stream layout of {filename} ({fingerprint})")
+        return dict(self.settings, tracks=tracks)
+
+    def build_command(self, filename, output_path=None):
+        return self._build(filename, output_path)[0]
+
+    def _build(self, filename, output_path=None):
+        # The settings and identification the command came from, for checking the output later
+        with tracing.span("build_command", file=filename):
+            src1, src2, final_output = self.source_paths(filename)
+            settings = self.settings_for(filename)
+            sources = [(src1, self.identify(src1)), (src2, self.identify(src2))]
+            return build_merge_command(self.mkvmerge_path, output_path or final_output, sources, settings), \
+                settings, sources
+
+    def inspect_pair(self, filename):
+        """Returns (mismatch, layout fingerprint); mismatch is (filename, duration1, duration2) or None."""
+        path1, path2, _ = self.source_paths(filename)
+        data1 = self.read_header(path1)
+        data2 = self.read_header(path2)
+        fingerprint = layout_fingerprint(data1, data2)
+
+        if data1 and data2:
+            dur1 = data1.get("container", {}).get("properties", {}).get("duration")
+            dur2 = data2.get("container", {}).get("properties", {}).get("duration")
+
+            if dur1 is not None and dur2 is not None:
+                if abs(dur1 - dur2) > DURATION_TOLERANCE_NS:
+                    return (filename, dur1, dur2), fingerprint
+        return None, fingerprint
+
+    def check_durations(self, filename):
+        return self.inspect_pair(filename)[0]
+
+    def analyze_durations(self, matching_files):
+        mismatched_files = []
+        total_files = len(matching_files)
+        completed_files = 0
+        clusters = {}
+
+        def _inspect(fname, queued):
+            tracing.add_span("queued", queued, file=fname)
+            return self.inspect_pair(fname)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(_inspect, fname, tracing.now()): fname for fname in matching_files}
+            for future in concurrent.futures.as_completed(futures):
+                res, fingerprint = future.result()
+                clusters.setdefault(fingerprint, []).append(futures[future])
+                if res:
+                    mismatched_files.append(res)
+                completed_files += 1
+                self.emit("analyze_progress", file=futures[future], completed=completed_files, total=total_files)
+
+        mismatched_files.sort()
+        self.layout_clusters = sorted(
+            ({"fingerprint": fp, "files": sorted(files), "sample": min(files)} for fp, files in clusters.items()),
+            key=lambda cluster: (-len(cluster["files"]), cluster["sample"]))
+        if len(self.layout_clusters) > 1:
+            print(f"[INFO] {len(self.layout_clusters)} different track layouts: "
+                  + ", ".join(f"{len(c['files'])} like {c['sample']}" for c in self.layout_clusters))
+        self._report_identify_stats()
+        self.emit("analysis_complete", total=total_files,
+                  mismatched=[{"file": f, "duration1": d1, "duration2": d2} for f, d1, d2 in mismatched_files],
+                  layouts=[{"fingerprint": c["fingerprint"], "count": len(c["files"]), "sample": c["sample"]}
+                           for c in self.layout_clusters])
+        return mismatched_files
+
+    def _report_identify_stats(self):
+        if self.header_reader and any(self.header_stats.values()):
+            print(f"[INFO] Header reader: {self.header_stats['direct']} files read directly, "
+                  f"{self.header_stats['fallback']} through mkvmerge")
+        if self.identify_cache is not None:
+            stats = self.identify_cache.stats()
+            print(f"[INFO] Identification cache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['entries']} entries, {stats['evictions']} evicted")
+
+    def temp_output_path(self, final_output):
+        # Hidden sibling in the output folder so the final rename never crosses filesystems
+        folder, name = os.path.split(final_output)
+        stem, ext = os.path.splitext(name)
+        tag = f"-{self.temp_tag}" if self.temp_tag else ""
+        return os.path.join(folder, f".{stem}.partial{tag}{ext}")
+
+    def merge_job(self, job, total_files=1):
+        """Merges a single job dict outside of ``merge`` (queue workers); raises when mkvmerge fails."""
+        self.pairs[job["name"]] = (job["src1"], job["src2"])
+        return self._merge_one(job, total_files, None)
+
+    def _merge_one(self, job, total_files, journal, finalize=True):
+        """Muxes one job; without ``finalize`` it returns "muxed" and ``_finalize`` completes it later."""
+        i, filename = job["index"], job["name"]
+        src1, src2, final_output = job["src1"], job["src2"], job["output"]
+
+        if not os.path.exists(src1) or not os.path.exists(src2):
+            print(f"[ERROR] Source files missing for {filename}")
+            raise FileNotFoundError(f"Source files missing for {filename}")
+
+        temp_output = self.temp_output_path(final_output)
+        os.makedirs(os.path.dirname(temp_output) or ".", exist_ok=True)
+        cmd, settings, sources = self._build(filename, temp_output)
+        if self.verify:
+            job["expected"] = expected_output(sources, settings)
+        fingerprints = {}
+        # The journal digest is taken before any staging rewrite, so it stays the same with or without scratch
+        digest = command_digest(cmd)
+        if journal is not None:
+            if journal.is_complete(filename, src1, src2, final_output, digest):
+                print(f"[INFO] Skipping {filename}: already merged by a previous run")
+                self.emit("job_skipped", file=filename, index=i)
+                return "skipped"
+            fingerprints = {"command": digest, "input1": file_fingerprint(src1), "input2": file_fingerprint(src2)}
+            journal.record(filename, "running", **fingerprints)
+        # job["partial"] stays the output-volume partial, so free-space accounting never counts scratch writes
+        job["partial"], job["fingerprints"] = temp_output, fingerprints
+        staged = job.get("staged")
+        if staged:
+            local = {src1: staged["inputs"][0], src2: staged["inputs"][1], temp_output: staged["output"]}
+            cmd = [local.get(arg, arg) for arg in cmd]
+
+        print(f"[INFO] Starting merge for {filename} (file {i+1}/{total_files})")
+        self.emit("job_start", file=filename, index=i, size=self.input_size(job))
+        progress = self.progress
+        if progress is not None:
+            progress.start(filename, self.input_size(job))
+
+        def _on_progress(percent):
+            snapshot = progress.update(filename, percent)
+            if snapshot is not None:
+                self.emit("job_progress", index=i, **snapshot[0], overall=snapshot[1])
+
+        started = time.monotonic()
+        try:
+            with tracing.span("mux", file=filename, bytes=self.input_size(job)):
+                run_merge_command(cmd, on_progress=_on_progress if progress is not None else None)
+        except Exception as e:
+            print(f"[ERROR] mkvmerge failed for {filename}: {e}")
+            self._discard(job, journal, e)
+            raise
+        job["seconds"] = time.monotonic() - started
+        return self._finalize(job, journal) if finalize else "muxed"
+
+    def _finalize(self, job, journal):
+        """Checks a muxed job's output (with ``verify``), then moves it into place and journals it."""
+        filename, final_output = job["name"], job["output"]
+        temp_output = job["staged"]["output"] if job.get("staged") else job["partial"]
+        try:
+            if self.verify:
+                with tracing.span("verify", file=filename):
+                    problems = check_output(temp_output, job["expected"], self.mkvmerge_path)
+                if problems:
+                    raise VerificationError(f"Output check failed: {'; '.join(problems)}")
+            if job.get("staged"):
+                # Copy off scratch to the usual partial name first, so the final rename stays atomic
+                # (a half-copied partial is discarded as usual; the stager clears scratch)
+                with tracing.span("unstage", file=filename, bytes=os.path.getsize(temp_output)):
+                    shutil.move(temp_output, job["partial"])
+                temp_output = job["partial"]
+            with tracing.span("finalize", file=filename):
+                os.replace(temp_output, final_output)
+                output_fp = file_fingerprint(final_output)
+            job["output_size"] = output_fp[0] if output_fp else 0
+        except Exception as e:
+            print(f"[ERROR] Could not finish {filename}: {e}")
+            self._discard(job, journal, e)
+            raise
+
+        if journal is not None:
+            journal.record(filename, "done", output_size=job["output_size"], **job["fingerprints"])
+        return "merged"
+
+    def _discard(self, job, journal, error):
+        try:
+            if os.path.exists(job["partial"]):
+                os.remove(job["partial"])
+        except OSError:
+            pass
+        if journal is not None:
+            journal.record(job["name"], "failed", error=str(error))
+
+    def _feed_checked_jobs(self, jobs, ready, parked, stop_feed):
+        """Pipeline stage between discovery and muxing: duration-checks jobs and queues the ones that pass.
+
+        At most twice the worker count of checks run ahead of the consumer, ``ready`` is bounded and
+        ``merge`` only takes jobs from it while its own queue is short, so analysis never races far
+        ahead of the muxers. Pairs with mismatched durations, or with a
+        stream layout the preset has no track selection for, are parked for review.
+        """
+        def _put(item):
+            while not stop_feed.is_set():
+                try:
+                    ready.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _handle(job, inspection):
+            mismatch, fingerprint = inspection
+            if mismatch is None and layout_tracks(self.settings, fingerprint) is not None:
+                self.estimate_cost(job)
+                return _put(job)
+            if mismatch is not None:
+                entry = {"file": job["name"], "reason": "duration", "duration1": mismatch[1], "duration2": mismatch[2]}
+                print(f"[INFO] Holding back {job['name']}: durations differ")
+            else:
+                # A layout the preset has no track selection for would fail in build_command anyway
+                entry = {"file": job["name"], "reason": "layout", "fingerprint": fingerprint}
+                print(f"[INFO] Holding back {job['name']}: no track selection for its stream layout")
+            parked.append(entry)
+            overall = self.progress.finish(job["name"], self.input_size(job), processed=False)
+            self.emit("job_parked", overall=overall, **entry)
+            return True
+
+        window = 2 * self.max_workers
+        in_flight = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for job in jobs:
+                if stop_feed.is_set():
+                    break
+                in_flight.append((job, executor.submit(self.inspect_pair, job["name"])))
+                if len(in_flight) >= window and not _handle(in_flight[0][0], in_flight.popleft()[1].result()):
+                    break
+            while in_flight and not stop_feed.is_set():
+                job, future = in_flight.popleft()
+                if not _handle(job, future.result()):
+                    break
+            for _, future in in_flight:
+                future.cancel()
+        _put(None)
+
+    def merge(self, matching_files, pipeline=False):
+        """Merges every pair.
+
+        With ``pipeline``, durations are checked while earlier pairs are already muxing instead of in
+        a separate pass: pairs that pass are queued for muxing right away (largest first among those
+        waiting) and mismatched ones are left unmerged and listed in ``result["parked"]``.
+        """
+        total_files = len(matching_files)
+        error_log_entries = []
+        lock = threading.Lock()
+        result = {"success": True, "cancelled": False, "stopped_early": False, "total": total_files,
+                  "completed": 0, "merged": 0, "skipped": 0, "retried": 0, "failed": [], "message": "", "files": []}
+        self.cancel_event.clear()
+        journal = JobJournal(self.output_folder) if self.resume else None
+        if journal is not None:
+            journal.record_queued(matching_files)
+        tuner = None
+        if self.autotune:
+            tuner = ConcurrencyAutotuner(self.autotune_start or min(4, self.max_workers), maximum=self.max_workers)
+        if pipeline:
+            jobs = [self.make_job(i, filename) for i, filename in enumerate(matching_files)]
+            result["parked"] = []
+        else:
+            jobs, plan = self.plan(matching_files, workers=tuner.level if tuner else self.max_workers)
+            print(f"[INFO] Job order: {'largest first' if self.order == 'size' else 'by name'}, busiest worker "
+                  f"{plan['makespan_bytes'] / 1e9:.1f} GB (by name: {plan['name_order_makespan_bytes'] / 1e9:.1f} GB)")
+        self.progress = progress = BatchProgress(sum(self.input_size(job) for job in jobs))
+        gates = []
+        topology = StorageTopology()
+        if self.device_limits is not None:
+            limiter = DeviceLimiter(topology, self.device_limits)
+            gates.append(limiter)
+            self._report_devices(jobs, limiter)
+        space_gate = None
+        if self.free_space_margin is not None:
+            space_gate = FreeSpaceGate(topology, margin=self.free_space_margin, on_wait=self._report_space_wait)
+            gates.append(space_gate)
+        stager = self._start_stager(journal)
+        if stager is not None:
+            gates.append(stager)
+        if pipeline:
+            scheduler = JobScheduler([], gates, key=longest_first_key if self.order == "size" else None)
+            ready = queue.Queue(maxsize=2 * self.max_workers)
+            stop_feed = threading.Event()
+            feeder = threading.Thread(target=self._feed_checked_jobs, args=(jobs, ready, result["parked"], stop_feed),
+                                      daemon=True)
+            feeder.start()
+        else:
+            scheduler = JobScheduler(jobs, gates)
+        feeding = pipeline
+        self.emit("batch_start", total=total_files, jobs=tuner.level if tuner else self.max_workers,
+                  bytes_total=progress.total_bytes)
+
+        def _process_single_file(job, queued):
+            filename = job["name"]
+            tracing.add_span("queued", queued, file=filename)
+            for attempt in range(self.retries + 1):
+                if self.cancel_event.is_set():
+                    return "cancelled", filename, None
+                try:
+                    finalize = not (self.verify or job.get("staged"))
+                    return self._merge_one(job, total_files, journal, finalize=finalize), filename, None
+                except FileNotFoundError as e:
+                    # Missing sources will not appear on a retry
+                    traceback.print_exc()
+                    return "failed", filename, e
+                except Exception as e:
+                    traceback.print_exc()
+                    if attempt >= self.retries:
+                        return "failed", filename, e
+                    print(f"[INFO] Retrying {filename} ({attempt + 1}/{self.retries}) after error: {e}")
+                    self.emit("job_retry", file=filename, attempt=attempt + 1, retries=self.retries, error=str(e))
+                    with lock:
+                        result["retried"] += 1
+                    self.cancel_event.wait(self.retry_delay * (attempt + 1))
+            return "cancelled", filename, None
+
+        def _account(job, status, filename, err):
+            result["completed"] += 1
+            # Only merged jobs did the work their input size stands for
+            overall = progress.finish(filename, self.input_size(job), processed=status == "merged")
+            if status in ("merged", "skipped"):
+                result[status] += 1
+            elif status == "failed":
+                result["failed"].append({"file": filename, "error": str(err)})
+                error_log_entries.append(f"[{filename}] Error: {err}")
+                print(f"[ERROR] Error merging {filename}: {err}")
+            # One row per finished job for the results view
+            result["files"].append({"file": filename, "status": status, "input_size": self.input_size(job),
+                                    "output_size": job.get("output_size"), "seconds": job.get("seconds"),
+                                    "error": str(err) if err is not None else None})
+            self.emit("job_done", file=filename, completed=result["completed"], total=total_files,
+                      status=status, success=status in ("merged", "skipped"),
+                      error=str(err) if err is not None else None, overall=overall,
+                      seconds=job.get("seconds"), input_size=self.input_size(job), output_size=job.get("output_size"))
+
+        def _finish(job):
+            try:
+                return self._finalize(job, journal), job["name"], None
+            except Exception as e:
+                return "failed", job["name"], e
+
+        # Single dispatcher: jobs are only submitted once a worker is free and every gate admits
+        # them, so a job held back by a busy disk never occupies a thread while it waits. With
+        # verify or staging, muxed outputs are checked and moved off scratch on their own small
+        # pool while the next muxes run. The stager is closed only after both pools have drained.
+        running = {}
+        finishing = {}
+        stopping = False
+        with contextlib.closing(stager) if stager is not None else contextlib.nullcontext(), \
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as finisher:
+            while True:
+                if not stopping and self.cancel_event.is_set():
+                    stopping = True
+                    result["cancelled"] = True
+                    scheduler.clear()
+                target = tuner.level if tuner else self.max_workers
+                # Checked jobs are taken only while few are queued, so the checks stay just ahead of the muxes
+                queue_limit = 2 * target + (stager.prefetch if stager is not None else 0)
+                while feeding and not stopping and len(scheduler) < queue_limit:
+                    try:
+                        job = ready.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is None:
+                        feeding = False
+                    else:
+                        scheduler.add(job)
+                if stager is not None and not stopping:
+                    stager.want(scheduler.pending[:2 * target + stager.prefetch])
+                while not stopping and len(running) < target:
+                    job = scheduler.next_ready()
+                    if job is None:
+                        break
+                    running[executor.submit(_process_single_file, job, tracing.now())] = job
+                if not running and not finishing:
+                    if stopping or (not len(scheduler) and not feeding):
+                        break
+                    if feeding and not len(scheduler):
+                        # Waiting on the duration checks; poll so a cancel is still noticed
+                        try:
+                            job = ready.get(timeout=0.5)
+                        except queue.Empty:
+                            continue
+                        if job is None:
+                            feeding = False
+                        else:
+                            scheduler.add(job)
+                        continue
+                    # Every queued job is held back by a gate with nothing in flight to release it, i.e. the
+                    # output volume is too full even for a job on its own. Such jobs keep waiting (the gate
+                    # re-reads the free space and repeats space_wait) unless failing them was asked for
+                    too_big = [] if space_gate is None or not self.fail_if_no_space else [
+                        job for job in scheduler.pending[:scheduler.lookahead] if not space_gate.fits_when_idle(job)]
+                    if not self.continue_on_error:
+                        # Like any failure, the first one stops the batch
+                        too_big = too_big[:1]
+                    for job in too_big:
+                        scheduler.remove(job)
+                        err = OSError(f"Not enough space on the output volume: needs "
+                                      f"{space_gate.needed(job) / 1e9:.1f} GB plus the "
+                                      f"{self.free_space_margin / 1e9:.1f} GB margin, "
+                                      f"{(space_gate.free_bytes(job) or 0) / 1e9:.1f} GB free")
+                        if journal is not None:
+                            journal.record(job["name"], "failed", error=str(err))
+                        _account(job, "failed", job["name"], err)
+                    if too_big:
+                        if not self.continue_on_error:
+                            stopping = True
+                            result["stopped_early"] = True
+                            scheduler.clear()
+                        continue
+                    self.cancel_event.wait(1.0)
+                    continue
+
+                # While checks are still feeding the queue or sources are being staged, wake up
+                # regularly to pick up new jobs
+                polling = feeding or (stager is not None and len(scheduler))
+                done, _ = concurrent.futures.wait(list(running) + list(finishing), timeout=0.2 if polling else None,
+                                                  return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    if future in finishing:
+                        job = finishing.pop(future)
+                    else:
+                        job = running.pop(future)
+                        scheduler.finish(job)
+                    status, filename, err = future.result()
+                    if status == "muxed":
+                        finishing[finisher.submit(_finish, job)] = job
+                        continue
+                    # Output space and scratch stay reserved until the output is in place
+                    scheduler.done(job)
+                    _account(job, status, filename, err)
+                    if tuner is not None and status == "merged" and tuner.record(job.get("output_size", 0)):
+                        print(f"[INFO] Auto-tune: {tuner.level} concurrent jobs, MB/s by level {tuner.curve_mb_per_s()}")
+                        self.emit("concurrency", level=tuner.level, curve=tuner.curve_mb_per_s())
+
+                    if not stopping and (status == "cancelled" or (status == "failed" and not self.continue_on_error)):
+                        # Jobs already running still finish and are counted; queued ones never start
+                        stopping = True
+                        result["cancelled"] = status == "cancelled"
+                        result["stopped_early"] = status == "failed"
+                        scheduler.clear()
+
+        if pipeline:
+            stop_feed.set()
+            feeder.join()
+            result["parked"].sort(key=lambda entry: entry["file"])
+            self._report_identify_stats()
+            self.emit("analysis_complete", total=total_files,
+                      mismatched=[entry for entry in result["parked"] if entry["reason"] == "duration"])
+
+        timed = [job for job in jobs if job.get("seconds")]
+        if timed:
+            result["job_rate"] = round(sum(job["cost"] for job in timed) / sum(job["seconds"] for job in timed))
+        if tuner is not None:
+            result["concurrency"] = {"level": tuner.best_level(), "curve": tuner.curve_mb_per_s()}
+        result["success"] = not result["failed"]
+        result["message"] = summarize_merge(result)
+
+        if error_log_entries:
+            self.write_error_log(error_log_entries)
+
+        self.emit("batch_complete", **result)
+        return result
+
+    def _start_stager(self, journal):
+        if not self.staging["folder"]:
+            return None
+        # Pairs the journal will skip are not worth copying; the command check comes later, in _merge_one
+        skip = None
+        if journal is not None:
+            skip = lambda job: journal.is_complete(job["name"], job["src1"], job["src2"], job["output"])  # noqa: E731
+        try:
+            return ScratchStager(self.staging["folder"], self.staging["budget_bytes"], self.staging["prefetch"],
+                                 skip=skip).start()
+        except OSError as e:
+            print(f"[ERROR] Could not use scratch folder {self.staging['folder']}, reading sources in place: {e}")
+            return None
+
+    def _report_devices(self, jobs, limiter):
+        devices = {}
+        for job in jobs:
+            for dev in limiter.devices_for(job):
+                devices[dev] = devices.get(dev, 0) + 1
+        for dev, count in devices.items():
+            limit = limiter.limit_for(dev)
+            print(f"[INFO] Device {limiter.topology.describe(dev)}: {count} jobs, "
+                  f"{'no per-device limit' if limit is None else f'at most {limit} at once'}")
+
+    def _report_space_wait(self, job, needed, available):
+        print(f"[INFO] Waiting for space on the output volume: {job['name']} needs {needed / 1e9:.1f} GB, "
+              f"{available / 1e9:.1f} GB available")
+        self.emit("space_wait", file=job["name"], needed=needed, available=available)
+
+    def write_error_log(self, error_log_entries):
+        log_path = os.path.join(self.output_folder, ERROR_LOG_FILENAME)
+        try:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(f"\n--- Errors at {datetime.datetime.now()} ---\n")
+                f.write("\n".join(error_log_entries))
+        except Exception:
+            pass
+
+    def enqueue(self, matching_files, queue_folder, max_attempts=1):
+        """Writes the batch as a shared job queue that ``worker`` processes on any host can drain."""
+        ordered, plan = self.plan(matching_files)
+        batch = {"folder1": self.folder1, "folder2": self.folder2, "output_folder": self.output_folder,
+                 "settings": self.settings}
+        try:
+            JobQueue.create(queue_folder, batch, ordered, max_attempts=max_attempts)
+            result = {"success": True, "message": f"Queued {len(ordered)} jobs in {queue_folder}", "path": queue_folder,
+                      "jobs": len(ordered)}
+        except OSError as e:
+            result = {"success": False, "message": f"Error writing queue: {e}", "path": queue_folder, "jobs": 0}
+        print(f"[{'INFO' if result['success'] else 'ERROR'}] {result['message']}")
+        self.emit("enqueue_complete", **result)
+        return result
+
+    def _build_commands(self, matching_files, output_path=None):
+        """{filename: argv} from the same build_command the merge uses; pairs that fail are logged and left out.
+
+        Building a command is mostly waiting on mkvmerge -J (or the cache), so it runs on a pool.
+        ``output_path`` maps a filename to the path mkvmerge should write instead of the final output.
+        """
+        total_files = len(matching_files)
+        built = {}
+        workers = min(EXPORT_MAX_WORKERS, max(self.max_workers, (os.cpu_count() or 4) * 2))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.build_command, filename, output_path(filename) if output_path else None):
+                       filename for filename in matching_files}
+            for completed, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                filename = futures[future]
+                try:
+                    built[filename] = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Could not generate command for {filename}: {e}")
+                self.emit("export_progress", file=filename, completed=completed, total=total_files)
+        return built
+
+    def export_job_folder(self, matching_files, folder):
+        """Writes one mkvmerge option file per pair plus parallel runners (run.sh, Makefile, run.ps1).
+
+        Jobs are listed largest first, write to a partial file that is renamed on success, and are
+        skipped when their output is newer than both inputs and the option file.
+        """
+        ordered, _ = self.plan(matching_files)
+        built = self._build_commands([job["name"] for job in ordered],
+                                     output_path=lambda name: self.temp_output_path(self.source_paths(name)[2]))
+        jobs = []
+        for job in ordered:
+            if job["name"] in built:
+                jobs.append({"id": option_file_id(job["name"]), "args": built[job["name"]][1:], "output": job["output"],
+                             "partial": self.temp_output_path(job["output"]), "inputs": [job["src1"], job["src2"]]})
+        self._report_identify_stats()
+        try:
+            write_job_folder(folder, self.mkvmerge_path, jobs)
+            failed = len(matching_files) - len(jobs)
+            message = f"Wrote {len(jobs)} jobs to {os.path.basename(folder.rstrip(os.sep)) or folder}"
+            if failed:
+                message += f" ({failed} could not be generated)"
+            result = {"success": not failed, "message": message, "path": folder}
+        except OSError as e:
+            result = {"success": False, "message": f"Error writing job folder: {e}", "path": folder}
+        self.emit("export_complete", **result)
+        return result
+
+    def export_script(self, matching_files, script_path):
+        commands = []
+        is_bat = script_path.lower().endswith(".bat")
+
+        if is_bat:
+            commands.append("@echo off")
+        else:
+            commands += ["#!/bin/bash", "failed=0", "",
+                         "# mkvmerge exits with 1 for warnings (output is complete) and 2 for errors",
+                         "finish() {",
+                         '  if [ "$1" -le 1 ]; then mv -f -- "$2" "$3"; else rm -f -- "$2"; '
+                         'echo "Failed ($1): $3" >&2; failed=1; fi',
+                         "}", ""]
+
+        # Like a merge, each command writes a partial file that only replaces the output once mkvmerge succeeds
+        built = self._build_commands(matching_files,
+                                     output_path=lambda name: self.temp_output_path(self.source_paths(name)[2]))
+        created_folders = set()
+        for filename in matching_files:
+            if filename not in built:
+                continue
+            if is_bat:
+                commands.append(f":: Merging {filename}")
+            else:
+                commands.append(f"# Merging {filename}")
+            folder = os.path.dirname(self.source_paths(filename)[2])
+            if "/" in filename and folder not in created_folders:
+                # Pairs from nested folders keep their layout in the output folder
+                created_folders.add(folder)
+                commands.append(f'if not exist "{folder}" mkdir "{folder}"' if is_bat
+                                else f"mkdir -p {format_script_command([folder], False)}")
+            commands.append(format_script_command(built[filename], is_bat))
+            output = self.source_paths(filename)[2]
+            partial = self.temp_output_path(output)
+            if is_bat:
+                commands += ["if errorlevel 2 (", f'  del "{partial}"', ") else (",
+                             f'  move /y "{partial}" "{output}" > nul', ")"]
+            else:
+                commands.append(f"finish $? {format_script_command([partial, output], False)}")
+            commands.append("")
+        if not is_bat:
+            commands.append('exit "$failed"')
+        self._report_identify_stats()
+
+        try:
+            with open(script_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(commands))
+
+            if not is_bat:
+                st = os.stat(script_path)
+                os.chmod(script_path, st.st_mode | stat.S_IEXEC)
+
+            result = {"success": True, "message": f"Script saved to {os.path.basename(script_path)}", "path": script_path}
+        except Exception as e:
+            result = {"success": False, "message": f"Error saving script: {e}", "path": script_path}
+        self.emit("export_complete", **result)
+        return result
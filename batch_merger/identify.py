@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+CACHE_FILENAME = "mkv_merger_identify_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Same attribute names the track selection UI used to read from pymkv's MKVTrack
+TrackInfo = namedtuple("TrackInfo", [
+    "track_id", "track_type", "track_codec", "language", "track_name", "default_track", "forced_track"
+])
+
+_version_lock = threading.Lock()
+_version_cache = {}
+
+
+def mkvmerge_executable(mkvtoolnix_path):
+    mkvmerge_exe = "mkvmerge.exe" if sys.platform == "win32" else "mkvmerge"
+    return os.path.join(mkvtoolnix_path, mkvmerge_exe)
+
+
+def get_mkvmerge_version(mkvmerge_path):
+    # Keyed on the binary's own stat so an in-place upgrade invalidates cached entries
+    try:
+        st = os.stat(mkvmerge_path)
+    except OSError:
+        return None
+    key = (os.path.abspath(mkvmerge_path), st.st_size, st.st_mtime_ns)
+    with _version_lock:
+        if key in _version_cache:
+            return _version_cache[key]
+    try:
+        process = subprocess.run([mkvmerge_path, "--version"], capture_output=True, text=True, check=True)
+        version = process.stdout.strip().splitlines()[0] if process.stdout.strip() else None
+    except (OSError, subprocess.CalledProcessError):
+        version = None
+    with _version_lock:
+        _version_cache[key] = version
+    return version
+
+
+def run_identify(mkvmerge_path, filepath):
+    process = subprocess.run([mkvmerge_path, "-J", filepath], capture_output=True, text=True, check=True)
+    out = process.stdout
+    if not out:
+        return None
+    return json.loads(out)
+
+
+def tracks_from_identify(data):
+    tracks = []
+    for t in (data or {}).get("tracks", []):
+        props = t.get("properties", {})
+        tracks.append(TrackInfo(
+            track_id=t.get("id"),
+            track_type=t.get("type", ""),
+            track_codec=t.get("codec", "N/A"),
+            language=props.get("language") or "und",
+            track_name=props.get("track_name") or "",
+            default_track=bool(props.get("default_track", False)),
+            forced_track=bool(props.get("forced_track", False)),
+        ))
+    return tracks
+
+
+def container_title(data):
+    return (data or {}).get("container", {}).get("properties", {}).get("title")
+
+
+class IdentifyCache:
+    """Persistent store of ``mkvmerge -J`` results keyed by path, size, mtime_ns and mkvmerge version."""
+
+    def __init__(self, db_path, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS identify ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " version TEXT NOT NULL,"
+                " data BLOB NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS identify_last_used ON identify (last_used)")
+        except sqlite3.Error as e:
+            print(f"[ERROR] Could not open identification cache {db_path}: {e}")
+            self._conn = None
+
+    @property
+    def enabled(self):
+        return self._conn is not None
+
+    def _key(self, filepath):
+        path = os.path.abspath(filepath)
+        st = os.stat(path)
+        return path, st.st_size, st.st_mtime_ns
+
+    def get(self, filepath, version):
+        if not self.enabled or version is None:
+            return None
+        try:
+            path, size, mtime_ns = self._key(filepath)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM identify WHERE path = ? AND size = ? AND mtime_ns = ? AND version = ?",
+                (path, size, mtime_ns, version)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE identify SET last_used = ? WHERE path = ?", (time.time(), path))
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, filepath, version, data):
+        if not self.enabled or version is None or data is None:
+            return
+        try:
+            path, size, mtime_ns = self._key(filepath)
+        except OSError:
+            return
+        blob = zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO identify (path, size, mtime_ns, version, data, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, version, blob, time.time())
+            )
+            self._evict_locked()
+
+    def _evict_locked(self):
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM identify").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Trim to 90% of both limits so a full cache does not evict on every insert
+        target_count = int(self.max_entries * 0.9)
+        target_bytes = int(self.max_bytes * 0.9)
+        removed = 0
+        rows = self._conn.execute("SELECT path, LENGTH(data) FROM identify ORDER BY last_used ASC").fetchall()
+        doomed = []
+        for path, length in rows:
+            if count - removed <= target_count and total <= target_bytes:
+                break
+            doomed.append((path,))
+            removed += 1
+            total -= length
+        self._conn.executemany("DELETE FROM identify WHERE path = ?", doomed)
+        self.evictions += removed
+
+    def identify(self, mkvmerge_path, filepath):
+        version = get_mkvmerge_version(mkvmerge_path)
+        data = self.get(filepath, version)
+        if data is not None:
+            return data
+        if not self.enabled or version is None:
+            with self._lock:
+                self.misses += 1
+        data = run_identify(mkvmerge_path, filepath)
+        self.put(filepath, version, data)
+        return data
+
+    def stats(self):
+        entries, total = 0, 0
+        if self.enabled:
+            with self._lock:
+                entries, total = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM identify"
+                ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def clear(self):
+        if self.enabled:
+            with self._lock:
+                self._conn.execute("DELETE FROM identify")
+
+    def close(self):
+        if self.enabled:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
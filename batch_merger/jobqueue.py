@@ -0,0 +1,312 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+QUEUE_FILENAME = "queue.json"
+DEFAULT_LEASE_SECONDS = 120
+
+
+def _write_json_atomic(path, data):
+    # Write-then-rename, so readers on other hosts never see half a file
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class JobQueue:
+    """A batch laid out as files in a shared folder, claimed by workers through time-limited leases.
+
+    Layout: ``queue.json`` (batch settings), ``jobs/<id>.json`` (one per pair, ids in dispatch
+    order), ``leases/<id>.lease`` (created with O_EXCL by the worker that owns the job; its mtime is
+    the heartbeat), ``done/<id>.json`` and ``failed/<id>.json`` (outcomes). Only atomic create,
+    rename and replace are relied on, which NFS and SMB shares provide, so no lock server is needed.
+    A lease whose heartbeat is older than ``lease_seconds`` is taken over by the next worker; hosts
+    therefore need roughly synchronized clocks (NTP).
+    """
+
+    def __init__(self, root, lease_seconds=DEFAULT_LEASE_SECONDS, clock=time.time):
+        self.root = root
+        self.lease_seconds = lease_seconds
+        self.clock = clock
+        self.batch = _read_json(os.path.join(root, QUEUE_FILENAME))
+        if self.batch is None:
+            raise FileNotFoundError(f"No job queue in {root}")
+        self._known_final = set()
+        # Jobs not yet seen finished, in dispatch order; the job list never changes once queue.json exists
+        self._pending = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, root, batch, jobs, max_attempts=1):
+        for sub in ("jobs", "leases", "done", "failed"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+        if os.path.exists(os.path.join(root, QUEUE_FILENAME)):
+            raise FileExistsError(f"{root} already holds a job queue")
+        width = len(str(max(len(jobs) - 1, 0)))
+        for position, job in enumerate(jobs):
+            _write_json_atomic(os.path.join(root, "jobs", f"{position:0{width}d}.json"), job)
+        # queue.json goes last: workers ignore the folder until the job list is complete
+        _write_json_atomic(os.path.join(root, QUEUE_FILENAME),
+                           dict(batch, max_attempts=max_attempts, total=len(jobs), created=time.time()))
+        return cls(root)
+
+    def _path(self, sub, job_id, ext):
+        return os.path.join(self.root, sub, f"{job_id}{ext}")
+
+    def job_ids(self):
+        return sorted(name[:-5] for name in os.listdir(os.path.join(self.root, "jobs")) if name.endswith(".json"))
+
+    def job(self, job_id):
+        return _read_json(self._path("jobs", job_id, ".json"))
+
+    def attempts(self, job_id):
+        record = _read_json(self._path("failed", job_id, ".json"))
+        return record.get("attempts", 0) if record else 0
+
+    def is_final(self, job_id):
+        if job_id in self._known_final:
+            return True
+        final = (os.path.exists(self._path("done", job_id, ".json"))
+                 or self.attempts(job_id) >= self.batch.get("max_attempts", 1))
+        if final:
+            with self._lock:
+                self._known_final.add(job_id)
+        return final
+
+    def lease_owner(self, job_id):
+        record = _read_json(self._path("leases", job_id, ".lease"))
+        return record.get("owner") if record else None
+
+    def lease_expired(self, job_id):
+        try:
+            return self.clock() - os.stat(self._path("leases", job_id, ".lease")).st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            return True
+
+    def _lease_identity(self, path):
+        # Inode, heartbeat and owner together tell one lease file from a fresh one at the same path
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        record = _read_json(path)
+        return st.st_ino, st.st_mtime_ns, record.get("owner") if record else None
+
+    def _put_back(self, moved_path, lease_path):
+        # link() fails rather than overwriting a lease created in the meantime
+        try:
+            os.link(moved_path, lease_path)
+        except FileExistsError:
+            pass
+        except OSError:
+            # Shares without hard links
+            try:
+                os.rename(moved_path, lease_path)
+            except OSError:
+                pass
+            return
+        try:
+            os.remove(moved_path)
+        except OSError:
+            pass
+
+    def _acquire(self, job_id, owner):
+        lease_path = self._path("leases", job_id, ".lease")
+        for _ in range(2):
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                judged = self._lease_identity(lease_path)
+                if judged is None:
+                    continue
+                if self.clock() - judged[1] / 1e9 <= self.lease_seconds:
+                    return False
+                # Only one of the workers racing for an expired lease wins the rename
+                stale_path = f"{lease_path}.stale-{uuid.uuid4().hex}"
+                try:
+                    os.rename(lease_path, stale_path)
+                except FileNotFoundError:
+                    return False
+                if self._lease_identity(stale_path) != judged:
+                    # Another worker took the lease over (or its owner renewed it) after it was
+                    # judged expired: this moved a live lease, so hand it back and leave the job
+                    self._put_back(stale_path, lease_path)
+                    return False
+                print(f"[INFO] Taking over expired lease of job {job_id}")
+                try:
+                    os.remove(stale_path)
+                except OSError:
+                    pass
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"owner": owner, "claimed": self.clock()}, f)
+            return True
+        return False
+
+    def claim(self, owner):
+        """Leases the first unfinished job nobody else holds; returns its id or None.
+
+        Jobs seen finished drop out of this instance's pending list, so a claim only looks at jobs
+        that were still open last time instead of listing and checking the whole batch again.
+        """
+        with self._lock:
+            if self._pending is None:
+                self._pending = self.job_ids()
+            pending = list(self._pending)
+        claimed = None
+        for job_id in pending:
+            if self.is_final(job_id) or not self._acquire(job_id, owner):
+                continue
+            if self.is_final(job_id):
+                # Finished by another worker between the check and the lease
+                self.release(job_id, owner)
+                continue
+            claimed = job_id
+            break
+        with self._lock:
+            self._pending = [job_id for job_id in self._pending if job_id not in self._known_final]
+        return claimed
+
+    def heartbeat(self, job_id, owner):
+        """Extends the lease; False once another worker has taken it over."""
+        if self.lease_owner(job_id) != owner:
+            return False
+        try:
+            os.utime(self._path("leases", job_id, ".lease"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, job_id, owner):
+        if self.lease_owner(job_id) == owner:
+            try:
+                os.remove(self._path("leases", job_id, ".lease"))
+            except FileNotFoundError:
+                pass
+
+    def complete(self, job_id, owner, success, **fields):
+        record = dict(fields, worker=owner, finished=self.clock())
+        if success:
+            _write_json_atomic(self._path("done", job_id, ".json"), record)
+        else:
+            record["attempts"] = self.attempts(job_id) + 1
+            _write_json_atomic(self._path("failed", job_id, ".json"), record)
+        if success or record["attempts"] >= self.batch.get("max_attempts", 1):
+            with self._lock:
+                self._known_final.add(job_id)
+                if self._pending is not None and job_id in self._pending:
+                    self._pending.remove(job_id)
+        self.release(job_id, owner)
+
+    def status(self):
+        counts = {"total": 0, "done": 0, "failed": 0, "running": 0, "pending": 0}
+        max_attempts = self.batch.get("max_attempts", 1)
+        for job_id in self.job_ids():
+            counts["total"] += 1
+            if os.path.exists(self._path("done", job_id, ".json")):
+                counts["done"] += 1
+            elif self.attempts(job_id) >= max_attempts:
+                counts["failed"] += 1
+            elif os.path.exists(self._path("leases", job_id, ".lease")) and not self.lease_expired(job_id):
+                counts["running"] += 1
+            else:
+                counts["pending"] += 1
+        return counts
+
+
+def process_tag():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def worker_name(slot):
+    return f"{process_tag()}:{slot}"
+
+
+class QueueWorker:
+    """Runs ``slots`` concurrent muxes against a JobQueue until no job is left to claim.
+
+    With ``wait``, a worker whose remaining jobs are all leased by others keeps polling, so it
+    picks up the jobs of a worker that crashed once their leases expire.
+    """
+
+    def __init__(self, queue, engine, slots=1, poll_seconds=5.0, wait=True):
+        self.queue = queue
+        self.engine = engine
+        self.slots = max(1, int(slots))
+        self.poll_seconds = poll_seconds
+        self.wait = wait
+        self.result = {"merged": 0, "failed": 0, "lost": 0}
+        self._lock = threading.Lock()
+
+    def run(self):
+        threads = [threading.Thread(target=self._slot, args=(slot,), daemon=True) for slot in range(self.slots)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.result
+
+    def _slot(self, slot):
+        owner = worker_name(slot)
+        cancel_event = self.engine.cancel_event
+        while not cancel_event.is_set():
+            job_id = self.queue.claim(owner)
+            if job_id is None:
+                status = self.queue.status()
+                if not self.wait or not (status["pending"] or status["running"]):
+                    return
+                cancel_event.wait(self.poll_seconds)
+                continue
+            self._run_job(job_id, owner)
+
+    def _run_job(self, job_id, owner):
+        job = self.queue.job(job_id)
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def _heartbeat():
+            while not stop.wait(self.queue.lease_seconds / 3):
+                if not self.queue.heartbeat(job_id, owner):
+                    print(f"[ERROR] Lost the lease on {job['name']}; another worker took it over")
+                    lost.set()
+                    return
+
+        heartbeat = threading.Thread(target=_heartbeat, daemon=True)
+        heartbeat.start()
+        error = None
+        try:
+            self.engine.merge_job(job, self.queue.batch.get("total", 0))
+        except Exception as e:
+            # _merge_one already logged the mkvmerge error
+            error = e
+        stop.set()
+        heartbeat.join()
+
+        with self._lock:
+            if lost.is_set():
+                self.result["lost"] += 1
+            else:
+                self.result["merged" if error is None else "failed"] += 1
+        if lost.is_set():
+            return
+        self.queue.complete(job_id, owner, error is None, file=job["name"],
+                            error=str(error) if error is not None else None,
+                            output_size=job.get("output_size"))
+        self.engine.emit("job_done", file=job["name"], worker=owner, status="merged" if error is None else "failed",
+                         success=error is None, error=str(error) if error is not None else None,
+                         seconds=job.get("seconds"), input_size=self.engine.input_size(job),
+                         output_size=job.get("output_size"))
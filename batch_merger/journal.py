@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from batch_merger import tracing
+
+JOURNAL_FILENAME = ".mkv_merger_journal.jsonl"
+
+
+def file_fingerprint(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def command_digest(cmd):
+    # Ties a finished output to the exact options it was muxed with, so preset changes force a redo
+    return hashlib.sha1("\0".join(str(arg) for arg in cmd).encode("utf-8")).hexdigest()
+
+
+class JobJournal:
+    """Append-only record of per-file batch state kept in the output folder.
+
+    Each line is one JSON object ``{"file", "state", "time", ...}`` where state is one of
+    queued, running, done or failed; the last line for a file wins. A torn final line from a
+    crash is ignored on load.
+    """
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, JOURNAL_FILENAME)
+        self.entries = {}
+        self.completed = {}
+        self._lock = threading.Lock()
+        self._line_count = 0
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and record.get("file"):
+                        self._merge_record(record)
+                        self._line_count += 1
+        except OSError as e:
+            print(f"[ERROR] Could not read batch journal {self.path}: {e}")
+            return
+        # Reruns keep appending; rewrite once the history dwarfs the live state
+        if self._line_count > 4 * max(len(self.entries), 1000):
+            self.compact()
+
+    def _merge_record(self, record):
+        previous = self.entries.get(record["file"], {})
+        merged = dict(previous)
+        merged.update(record)
+        self.entries[record["file"]] = merged
+        # "queued" leaves the output alone; a run that starts rewriting it voids the old completion
+        if record["state"] == "done":
+            self.completed[record["file"]] = merged
+        elif record["state"] in ("running", "failed"):
+            self.completed.pop(record["file"], None)
+
+    def _append(self, records, sync):
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with tracing.span("journal", sync=sync), self._lock:
+            for record in records:
+                self._merge_record(record)
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(data)
+                    if sync:
+                        f.flush()
+                        os.fsync(f.fileno())
+            except OSError as e:
+                print(f"[ERROR] Could not write batch journal {self.path}: {e}")
+            self._line_count += len(records)
+
+    def record(self, filename, state, **fields):
+        record = {"file": filename, "state": state, "time": round(time.time(), 3)}
+        record.update(fields)
+        # Only terminal states need to survive a power loss; a lost "running" line just means a redo
+        self._append([record], sync=state in ("done", "failed"))
+
+    def record_queued(self, filenames):
+        now = round(time.time(), 3)
+        self._append([{"file": f, "state": "queued", "time": now} for f in filenames], sync=False)
+
+    def is_complete(self, filename, src1, src2, output, digest=None):
+        # Without a digest this is a guess made before the command is built (e.g. whether to stage a job)
+        entry = self.completed.get(filename)
+        if not entry:
+            return False
+        if digest is not None and entry.get("command") != digest:
+            return False
+        if entry.get("input1") != file_fingerprint(src1) or entry.get("input2") != file_fingerprint(src2):
+            return False
+        output_fp = file_fingerprint(output)
+        return output_fp is not None and output_fp[0] == entry.get("output_size")
+
+    def compact(self):
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    for filename, record in self.entries.items():
+                        # Keep the completion of files that were only re-queued since
+                        done = self.completed.get(filename)
+                        if done is not None and done is not record:
+                            f.write(json.dumps(done, ensure_ascii=False) + "\n")
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+                self._line_count = len(self.entries)
+            except OSError as e:
+                print(f"[ERROR] Could not compact batch journal {self.path}: {e}")
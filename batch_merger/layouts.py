@@ -0,0 +1,37 @@
+import hashlib
+import json
+
+
+def track_layout(info):
+    """(id, type, codec, language) per track, in ID order.
+
+    The CodecID is used when present since the header reader and mkvmerge agree on it, while
+    their display names for some codecs differ.
+    """
+    layout = []
+    for track in sorted((info or {}).get("tracks", []), key=lambda t: t.get("id", 0)):
+        props = track.get("properties", {})
+        layout.append((track.get("id"), track.get("type", ""), props.get("codec_id") or track.get("codec", ""),
+                       props.get("language") or "und"))
+    return layout
+
+
+def layout_fingerprint(info1, info2):
+    payload = json.dumps([track_layout(info1), track_layout(info2)], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+
+def describe_layout(info):
+    return ", ".join(f"{tid}:{track_type} {codec} {language}" for tid, track_type, codec, language in track_layout(info))
+
+
+def layout_tracks(settings, fingerprint):
+    """The "tracks" selection a preset holds for a layout, or None when it has none for it.
+
+    Presets without a "layouts" key apply their "tracks" to every file, as they always did.
+    """
+    layouts = settings.get("layouts")
+    if not layouts:
+        return settings.get("tracks", {})
+    entry = layouts.get(fingerprint)
+    return entry.get("tracks") if entry else None
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+JOB_STATES = ("queued", "running", "merged", "skipped", "failed", "parked", "cancelled")
+
+
+class BatchMetrics:
+    """Batch counters in Prometheus form, fed by the engine's events.
+
+    Call it with every event (it has the ``on_event`` signature) and read ``render()``. Counters
+    ending in ``_total`` accumulate over every batch of the process; the per-state job gauges
+    describe the current batch. ``cache_stats`` is an optional callable returning
+    ``IdentifyCache.stats()``.
+    """
+
+    def __init__(self, cache_stats=None, clock=time.time):
+        self.cache_stats = cache_stats
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.batch_total = 0
+        self.states = dict.fromkeys(JOB_STATES, 0)
+        # Files between job_start and job_done, so each job leaves the state it is really in
+        self.running = set()
+        self.finished = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.concurrency = 0
+        self.progress = {}
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self.last_event = None
+
+    def __call__(self, event):
+        kind = event.get("event")
+        with self._lock:
+            self.last_event = self.clock()
+            if kind == "batch_start":
+                self.batch_total = event.get("total", 0)
+                self.states = dict.fromkeys(JOB_STATES, 0)
+                self.states["queued"] = self.batch_total
+                self.running = set()
+                self.concurrency = event.get("jobs", 0)
+                self.progress = {}
+            elif kind == "job_start":
+                # Retries start the same job again
+                if event.get("file") not in self.running:
+                    self.running.add(event.get("file"))
+                    self._move("queued", "running")
+            elif kind == "job_skipped":
+                self._move("queued", "skipped")
+                self.finished["skipped"] = self.finished.get("skipped", 0) + 1
+            elif kind == "job_parked":
+                self._move("queued", "parked")
+            elif kind == "concurrency":
+                self.concurrency = event.get("level", self.concurrency)
+            elif kind == "job_progress":
+                self.progress = event.get("overall") or self.progress
+            elif kind == "job_done":
+                self._job_done(event)
+
+    def _move(self, source, target):
+        if self.states[source] > 0:
+            self.states[source] -= 1
+        self.states[target] += 1
+
+    def _job_done(self, event):
+        status = event.get("status") or ("merged" if event.get("success") else "failed")
+        if status == "skipped":
+            # Already counted by its job_skipped event
+            self.progress = event.get("overall") or self.progress
+            return
+        source = "running" if event.get("file") in self.running else "queued"
+        self.running.discard(event.get("file"))
+        self._move(source, status if status in JOB_STATES else "failed")
+        self.finished[status] = self.finished.get(status, 0) + 1
+        self.progress = event.get("overall") or self.progress
+        if status != "merged":
+            return
+        self.bytes_read += event.get("input_size") or 0
+        self.bytes_written += event.get("output_size") or 0
+        seconds = event.get("seconds")
+        if seconds is not None:
+            self.duration_sum += seconds
+            self.duration_count += 1
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+            else:
+                self.buckets[-1] += 1
+
+    def render(self):
+        with self._lock:
+            lines = [
+                "# HELP mkv_merger_jobs Jobs of the current batch by state.",
+                "# TYPE mkv_merger_jobs gauge",
+            ]
+            lines += [f'mkv_merger_jobs{{state="{state}"}} {count}' for state, count in self.states.items()]
+            lines += [
+                "# HELP mkv_merger_batch_jobs Jobs in the current batch.",
+                "# TYPE mkv_merger_batch_jobs gauge",
+                f"mkv_merger_batch_jobs {self.batch_total}",
+                "# HELP mkv_merger_jobs_finished_total Jobs finished since the process started, by status.",
+                "# TYPE mkv_merger_jobs_finished_total counter",
+            ]
+            lines += [f'mkv_merger_jobs_finished_total{{status="{status}"}} {count}'
+                      for status, count in sorted(self.finished.items())]
+            lines += [
+                "# HELP mkv_merger_read_bytes_total Input bytes of merged jobs.",
+                "# TYPE mkv_merger_read_bytes_total counter",
+                f"mkv_merger_read_bytes_total {self.bytes_read}",
+                "# HELP mkv_merger_written_bytes_total Output bytes of merged jobs.",
+                "# TYPE mkv_merger_written_bytes_total counter",
+                f"mkv_merger_written_bytes_total {self.bytes_written}",
+                "# HELP mkv_merger_concurrency Concurrent muxes allowed right now.",
+                "# TYPE mkv_merger_concurrency gauge",
+                f"mkv_merger_concurrency {self.concurrency}",
+                "# HELP mkv_merger_job_duration_seconds Time mkvmerge took per merged job.",
+                "# TYPE mkv_merger_job_duration_seconds histogram",
+            ]
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, self.buckets):
+                cumulative += count
+                lines.append(f'mkv_merger_job_duration_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines += [
+                f'mkv_merger_job_duration_seconds_bucket{{le="+Inf"}} {self.duration_count}',
+                f"mkv_merger_job_duration_seconds_sum {self.duration_sum:.3f}",
+                f"mkv_merger_job_duration_seconds_count {self.duration_count}",
+            ]
+            if self.progress:
+                lines += [
+                    "# HELP mkv_merger_batch_progress_ratio Input-size weighted progress of the current batch.",
+                    "# TYPE mkv_merger_batch_progress_ratio gauge",
+                    f"mkv_merger_batch_progress_ratio {self.progress.get('percent', 0) / 100.0:.4f}",
+                ]
+                if self.progress.get("eta") is not None:
+                    lines += [
+                        "# HELP mkv_merger_batch_eta_seconds Estimated time until the current batch finishes.",
+                        "# TYPE mkv_merger_batch_eta_seconds gauge",
+                        f"mkv_merger_batch_eta_seconds {self.progress['eta']:.0f}",
+                    ]
+            if self.last_event is not None:
+                lines += [
+                    "# HELP mkv_merger_last_event_timestamp_seconds When the engine last reported anything.",
+                    "# TYPE mkv_merger_last_event_timestamp_seconds gauge",
+                    f"mkv_merger_last_event_timestamp_seconds {self.last_event:.3f}",
+                ]
+        stats = self.cache_stats() if self.cache_stats else None
+        if stats is not None:
+            lines += [
+                "# HELP mkv_merger_identify_cache_requests_total Identification cache lookups by result.",
+                "# TYPE mkv_merger_identify_cache_requests_total counter",
+                f'mkv_merger_identify_cache_requests_total{{result="hit"}} {stats["hits"]}',
+                f'mkv_merger_identify_cache_requests_total{{result="miss"}} {stats["misses"]}',
+                "# HELP mkv_merger_identify_cache_hit_ratio Share of lookups answered from the cache.",
+                "# TYPE mkv_merger_identify_cache_hit_ratio gauge",
+                f"mkv_merger_identify_cache_hit_ratio {stats['hit_rate']:.4f}",
+                "# HELP mkv_merger_identify_cache_entries Files in the identification cache.",
+                "# TYPE mkv_merger_identify_cache_entries gauge",
+                f"mkv_merger_identify_cache_entries {stats['entries']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves ``/metrics`` on localhost from a daemon thread."""
+
+    def __init__(self, metrics, port, host="127.0.0.1"):
+        # http.server pulls in the email and ssl packages; only load it when metrics are served
+        import http.server
+        self.metrics = metrics
+        metrics_ref = metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics_ref.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        print(f"[INFO] Metrics at http://{self.httpd.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TextfileWriter:
+    """Rewrites a Prometheus textfile (for node_exporter's textfile collector) every ``interval`` seconds."""
+
+    def __init__(self, metrics, path, interval=15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        # node_exporter may read at any moment, so the file is replaced atomically
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.metrics.render())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[ERROR] Could not write metrics file {self.path}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
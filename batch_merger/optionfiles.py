@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import re
+import stat
+
+JOBS_SUBFOLDER = "jobs"
+
+RUN_JOB_SH = """#!/bin/bash
+# Usage: run-job.sh JOB_ID
+# Skips the job when its output is newer than both inputs and its option file.
+cd "$(dirname "$0")" || exit 2
+MKVMERGE="${{MKVMERGE:-{mkvmerge}}}"
+job="{jobs}/$1"
+{{ IFS= read -r output; IFS= read -r partial; IFS= read -r input1; IFS= read -r input2; }} < "$job.paths"
+if [ -e "$output" ] && [ "$output" -nt "$input1" ] && [ "$output" -nt "$input2" ] && [ "$output" -nt "$job.json" ]; then
+  echo "Up to date: $output"
+  exit 0
+fi
+mkdir -p "$(dirname "$partial")"
+"$MKVMERGE" @"$job.json" > /dev/null
+status=$?
+# mkvmerge exits with 1 for warnings (output is complete) and 2 for errors
+if [ "$status" -le 1 ]; then
+  mv -f "$partial" "$output" && echo "Merged: $output"
+else
+  rm -f "$partial"
+  echo "Failed ($status): $output" >&2
+  exit "$status"
+fi
+"""
+
+RUN_SH = """#!/bin/bash
+# Usage: run.sh [PARALLEL_JOBS]   (default: number of CPUs; largest jobs are started first)
+cd "$(dirname "$0")" || exit 2
+parallel="${1:-$(getconf _NPROCESSORS_ONLN 2>/dev/null || echo 4)}"
+xargs -P "$parallel" -n 1 bash run-job.sh < jobs.txt
+"""
+
+# Windows PowerShell 5.1 and PowerShell 7 both have Start-Job; each job runs in its own process
+RUN_PS1 = """# Usage: run.ps1 [-Parallel N]   (default: number of CPUs; largest jobs are started first)
+# Skips a job when its output is newer than both inputs and its option file.
+param([int]$Parallel = [Environment]::ProcessorCount)
+$ErrorActionPreference = 'Stop'
+Set-Location -LiteralPath $PSScriptRoot
+$mkvmerge = if ($env:MKVMERGE) {{ $env:MKVMERGE }} else {{ '{mkvmerge}' }}
+
+$runJob = {{
+    param($root, $mkvmerge, $id)
+    Set-Location -LiteralPath $root
+    $job = Join-Path '{jobs}' $id
+    $optionFile = $job + '.json'
+    $output, $partial, $input1, $input2 = Get-Content -LiteralPath ($job + '.paths') -Encoding UTF8
+    if (Test-Path -LiteralPath $output) {{
+        $written = (Get-Item -LiteralPath $output).LastWriteTimeUtc
+        $newer = @($input1, $input2, $optionFile | Where-Object {{
+            -not (Test-Path -LiteralPath $_) -or (Get-Item -LiteralPath $_).LastWriteTimeUtc -ge $written }})
+        if ($newer.Count -eq 0) {{
+            return "Up to date: $output"
+        }}
+    }}
+    $folder = Split-Path -Parent $partial
+    if ($folder) {{ New-Item -ItemType Directory -Force -Path $folder | Out-Null }}
+    & $mkvmerge "@$optionFile" | Out-Null
+    $status = $LASTEXITCODE
+    # mkvmerge exits with 1 for warnings (output is complete) and 2 for errors
+    if ($status -le 1) {{
+        Move-Item -LiteralPath $partial -Destination $output -Force
+        "Merged: $output"
+    }} else {{
+        Remove-Item -LiteralPath $partial -ErrorAction SilentlyContinue
+        "Failed ($status): $output"
+    }}
+}}
+
+$jobs = @()
+$failed = 0
+function Receive-Finished {{
+    foreach ($job in @($jobs | Where-Object {{ $_.State -ne 'Running' -and $_.HasMoreData }})) {{
+        foreach ($line in Receive-Job -Job $job) {{
+            if ($line -like 'Failed*') {{ $script:failed++; Write-Host $line -ForegroundColor Red }} else {{ Write-Host $line }}
+        }}
+    }}
+}}
+
+foreach ($id in Get-Content -LiteralPath 'jobs.txt') {{
+    while (@($jobs | Where-Object {{ $_.State -eq 'Running' }}).Count -ge $Parallel) {{
+        Wait-Job -Job @($jobs | Where-Object {{ $_.State -eq 'Running' }}) -Any | Out-Null
+        Receive-Finished
+    }}
+    $jobs += Start-Job -ScriptBlock $runJob -ArgumentList $PSScriptRoot, $mkvmerge, $id
+}}
+if ($jobs) {{
+    Wait-Job -Job $jobs | Out-Null
+    Receive-Finished
+    Remove-Job -Job $jobs -Force
+}}
+if ($failed) {{ exit 1 }}
+"""
+
+RUN_BAT = """@echo off
+rem Usage: run.bat [PARALLEL_JOBS]   (runs run.ps1, which does the work)
+if "%~1"=="" (
+  powershell -NoProfile -ExecutionPolicy Bypass -File "%~dp0run.ps1"
+) else (
+  powershell -NoProfile -ExecutionPolicy Bypass -File "%~dp0run.ps1" -Parallel %1
+)
+exit /b %errorlevel%
+"""
+
+
+def option_file_id(name):
+    # Stable across exports, so an unchanged pair keeps its option file (and its timestamp)
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.splitext(name)[0]).strip("._")[:60]
+    return f"{slug}-{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _write_if_changed(path, text, executable=False):
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            unchanged = f.read() == text
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+    if executable:
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+def write_job_folder(folder, mkvmerge_path, jobs):
+    """Writes ``jobs`` (dicts with id, args, output, partial, inputs) as mkvmerge option files plus runners.
+
+    Files are only rewritten when their content changes, so the option file's timestamp tells
+    run-job.sh whether the command changed since the output was written.
+    """
+    jobs_folder = os.path.join(folder, JOBS_SUBFOLDER)
+    os.makedirs(jobs_folder, exist_ok=True)
+    current = set()
+    for job in jobs:
+        # mkvmerge reads @file.json as a JSON array of arguments, so no quoting or length limits apply
+        _write_if_changed(os.path.join(jobs_folder, f"{job['id']}.json"),
+                          json.dumps(job["args"], indent=2, ensure_ascii=False) + "\n")
+        _write_if_changed(os.path.join(jobs_folder, f"{job['id']}.paths"),
+                          "\n".join([job["output"], job["partial"]] + list(job["inputs"])) + "\n")
+        current.update((f"{job['id']}.json", f"{job['id']}.paths"))
+    for name in os.listdir(jobs_folder):
+        # Pairs that are no longer part of the batch
+        if name not in current and name.endswith((".json", ".paths")):
+            os.remove(os.path.join(jobs_folder, name))
+
+    ids = [job["id"] for job in jobs]
+    _write_if_changed(os.path.join(folder, "jobs.txt"), "".join(f"{job_id}\n" for job_id in ids))
+    _write_if_changed(os.path.join(folder, "run-job.sh"),
+                      RUN_JOB_SH.format(mkvmerge=mkvmerge_path.replace('"', '\\"'), jobs=JOBS_SUBFOLDER),
+                      executable=True)
+    _write_if_changed(os.path.join(folder, "run.sh"), RUN_SH, executable=True)
+
+    makefile = ["# make -j N [-k] runs N jobs at once, largest first; up-to-date outputs are skipped", "",
+                "all: " + " ".join(f"job-{job_id}" for job_id in ids), ""]
+    for job_id in ids:
+        makefile += [f"job-{job_id}:", f"\t@bash run-job.sh {job_id}", ""]
+    makefile.append(".PHONY: all " + " ".join(f"job-{job_id}" for job_id in ids))
+    _write_if_changed(os.path.join(folder, "Makefile"), "\n".join(makefile) + "\n")
+
+    # cmd.exe cannot compare timestamps, so the Windows runner is PowerShell; run.bat only starts it.
+    # Windows PowerShell reads BOM-less scripts in the ANSI code page, hence the BOM
+    _write_if_changed(os.path.join(folder, "run.ps1"),
+                      "\ufeff" + RUN_PS1.format(mkvmerge=mkvmerge_path.replace("'", "''"), jobs=JOBS_SUBFOLDER))
+    _write_if_changed(os.path.join(folder, "run.bat"), RUN_BAT.replace("\n", "\r\n"))
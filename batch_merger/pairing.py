@@ -0,0 +1,161 @@
+import os
+import re
+
+PAIRING_MODES = ("name", "stem", "episode", "regex")
+DEFAULT_PAIRING = {"mode": "name", "recursive": False, "pattern": "", "pattern2": "", "extensions": ""}
+
+# Tried in order; the first match wins. Files without a season number count as season 1.
+EPISODE_PATTERNS = [
+    re.compile(r"(?<![a-z0-9])s(\d{1,3})[ ._-]?e(\d{1,4})(?!\d)", re.IGNORECASE),
+    re.compile(r"(?<![a-z0-9])(\d{1,2})x(\d{1,4})(?!\d)", re.IGNORECASE),
+    re.compile(r"(?<![a-z0-9])(?:episode|ep|e)[ ._-]?(\d{1,4})(?!\d)", re.IGNORECASE),
+    re.compile(r"(?:^| )- (\d{1,4})(?:v\d)?(?= |\.|\[|\(|$)", re.IGNORECASE),
+]
+SEASON_FOLDER_RE = re.compile(r"(?<![a-z0-9])(?:season|series|s)[ ._-]?(\d{1,3})(?!\d)", re.IGNORECASE)
+# Release tags such as [JPN], (1080p) or {group} that differ between the two sides
+BRACKETED_RE = re.compile(r"\[[^\]]*\]|\([^)]*\)|\{[^}]*\}")
+SEPARATORS_RE = re.compile(r"[\s._-]+")
+
+
+def parse_extensions(text):
+    extensions = []
+    for ext in (text or "").replace(";", ",").split(","):
+        ext = ext.strip().lower()
+        if ext:
+            extensions.append(ext if ext.startswith(".") else f".{ext}")
+    return tuple(extensions)
+
+
+def scan_files(root, recursive=False, extensions=()):
+    """Relative paths (with "/" separators) of the files below ``root``; hidden entries are skipped."""
+    pending = [""]
+    while pending:
+        relative_dir = pending.pop()
+        with os.scandir(os.path.join(root, relative_dir) if relative_dir else root) as entries:
+            for entry in entries:
+                # Hidden names cover the .partial outputs and the journal of earlier runs
+                if entry.name.startswith("."):
+                    continue
+                relative = f"{relative_dir}/{entry.name}" if relative_dir else entry.name
+                if entry.is_dir():
+                    # Symlinked folders are not followed, so a link back up the tree cannot loop
+                    if recursive and not entry.is_symlink():
+                        pending.append(relative)
+                elif not extensions or os.path.splitext(entry.name)[1].lower() in extensions:
+                    yield relative
+
+
+def _normalize_group(value):
+    return int(value) if value is not None and value.isdigit() else (value or "").lower()
+
+
+def episode_key(relative_path):
+    folder, name = os.path.split(relative_path)
+    stem = os.path.splitext(name)[0]
+    for pattern in EPISODE_PATTERNS:
+        match = pattern.search(stem)
+        if not match:
+            continue
+        if len(match.groups()) == 2:
+            return int(match.group(1)), int(match.group(2))
+        season = 1
+        # "Season 2/Show - 05.mkv": take the season from the nearest folder that names one
+        for part in reversed(folder.split("/") if folder else []):
+            folder_match = SEASON_FOLDER_RE.search(part)
+            if folder_match:
+                season = int(folder_match.group(1))
+                break
+        return season, int(match.group(1))
+    return None
+
+
+def stem_key(relative_path):
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    return SEPARATORS_RE.sub(" ", BRACKETED_RE.sub(" ", stem)).strip().lower() or None
+
+
+def regex_key_function(pattern):
+    regex = re.compile(pattern, re.IGNORECASE)
+
+    def key(relative_path):
+        match = regex.search(relative_path)
+        if not match:
+            return None
+        groups = match.groups()
+        return tuple(_normalize_group(g) for g in groups) if groups else match.group(0).lower()
+    return key
+
+
+def key_functions(pairing):
+    """The (folder 1, folder 2) key extractors for a pairing configuration."""
+    mode = pairing.get("mode") or "name"
+    if mode == "name":
+        return (lambda path: path), (lambda path: path)
+    if mode == "stem":
+        return stem_key, stem_key
+    if mode == "episode":
+        return episode_key, episode_key
+    if mode == "regex":
+        if not pairing.get("pattern"):
+            raise ValueError("Regex pairing needs a pattern")
+        key1 = regex_key_function(pairing["pattern"])
+        return key1, regex_key_function(pairing["pattern2"]) if pairing.get("pattern2") else key1
+    raise ValueError(f"Unknown pairing mode '{mode}' (expected one of {', '.join(PAIRING_MODES)})")
+
+
+def _index(paths, key):
+    index, unmatched, duplicates = {}, [], []
+    for path in paths:
+        k = key(path)
+        if k is None:
+            unmatched.append(path)
+        elif k in index:
+            duplicates.append(path)
+        else:
+            index[k] = path
+    return index, unmatched, duplicates
+
+
+def output_name(relative_path, mode):
+    # Exact-name pairing keeps the name untouched, as it always did; other modes always write Matroska
+    if mode == "name":
+        return relative_path
+    stem, ext = os.path.splitext(relative_path)
+    return relative_path if ext.lower() == ".mkv" else f"{stem}.mkv"
+
+
+def pair_files(folder1, folder2, pairing=None):
+    """Pairs the files of two folders through a hash index on extracted keys.
+
+    Returns ``{"pairs": [(name, path1, path2)], "unmatched1": [...], "unmatched2": [...],
+    "duplicates1": [...], "duplicates2": [...]}``. ``name`` is the output path relative to the
+    output folder (folder 1's relative path); unmatched and duplicate entries are relative paths.
+    Files whose key was already taken on the same side are reported as duplicates, never paired.
+    """
+    pairing = dict(DEFAULT_PAIRING, **(pairing or {}))
+    key1, key2 = key_functions(pairing)
+    extensions = parse_extensions(pairing.get("extensions"))
+    recursive = bool(pairing.get("recursive"))
+    mode = pairing.get("mode") or "name"
+
+    index1, unmatched1, duplicates1 = _index(sorted(scan_files(folder1, recursive, extensions)), key1)
+    index2, unmatched2, duplicates2 = _index(sorted(scan_files(folder2, recursive, extensions)), key2)
+
+    pairs, names = [], set()
+    for k, rel1 in index1.items():
+        rel2 = index2.pop(k, None)
+        if rel2 is None:
+            unmatched1.append(rel1)
+            continue
+        name = output_name(rel1, mode)
+        if name in names:
+            duplicates1.append(rel1)
+            unmatched2.append(rel2)
+            continue
+        names.add(name)
+        pairs.append((name, os.path.join(folder1, *rel1.split("/")), os.path.join(folder2, *rel2.split("/"))))
+    unmatched2.extend(index2.values())
+
+    pairs.sort()
+    return {"pairs": pairs, "unmatched1": sorted(unmatched1), "unmatched2": sorted(unmatched2),
+            "duplicates1": sorted(duplicates1), "duplicates2": sorted(duplicates2)}
@@ -0,0 +1,142 @@
+import threading
+import time
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(max(0, seconds))
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+class BatchProgress:
+    """Byte-weighted progress of a merge batch.
+
+    Every job is weighted by the size of its inputs, so four half-finished 20 GB remuxes move the
+    overall figure far more than a finished 200 MB episode. Running jobs report mkvmerge's
+    percentage through ``update``; throughput and ETAs are derived from bytes processed since the
+    job (or the batch) started.
+    """
+
+    def __init__(self, total_bytes, clock=time.monotonic):
+        self.clock = clock
+        self.total_bytes = total_bytes
+        self.finished_bytes = 0
+        self.started = clock()
+        self.active = {}
+        self._lock = threading.Lock()
+
+    def start(self, name, size):
+        with self._lock:
+            self.active[name] = {"size": size, "percent": 0, "started": self.clock()}
+
+    def update(self, name, percent):
+        with self._lock:
+            job = self.active.get(name)
+            if job is None:
+                return None
+            job["percent"] = percent
+            return self._job_snapshot(name, job), self._overall_locked()
+
+    def finish(self, name, size=None, processed=True):
+        # Skipped jobs cost no time, so they leave the denominator instead of counting as progress
+        with self._lock:
+            job = self.active.pop(name, None)
+            size = job["size"] if job else (size or 0)
+            if processed:
+                self.finished_bytes += size
+            else:
+                self.total_bytes = max(0, self.total_bytes - size)
+            return self._overall_locked()
+
+    def _job_snapshot(self, name, job):
+        elapsed = self.clock() - job["started"]
+        done = job["size"] * job["percent"] / 100.0
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (job["size"] - done) / rate if rate > 0 else None
+        return {"file": name, "percent": job["percent"], "rate": rate, "eta": eta}
+
+    def _overall_locked(self):
+        in_flight = sum(j["size"] * j["percent"] / 100.0 for j in self.active.values())
+        done = self.finished_bytes + in_flight
+        elapsed = self.clock() - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total_bytes - done)
+        return {
+            "percent": 100.0 * done / self.total_bytes if self.total_bytes else 0.0,
+            "bytes_done": int(done),
+            "bytes_total": self.total_bytes,
+            "rate": rate,
+            "eta": remaining / rate if rate > 0 else None,
+        }
+
+    def overall(self):
+        with self._lock:
+            return self._overall_locked()
+
+
+class EventAggregate:
+    """Latest state of a batch's engine events, for a UI that redraws on a fixed tick.
+
+    Worker threads call it with every event; ``drain`` hands the UI thread only what changed since
+    the previous drain, so the redraw cost follows the tick rate instead of the number of jobs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changes = {}
+        self._jobs = {}
+        self._jobs_changed = False
+
+    def __call__(self, event):
+        kind = event.get("event")
+        with self._lock:
+            if kind == "batch_start":
+                self._jobs = {}
+                self._jobs_changed = True
+            elif kind == "analyze_progress":
+                self._changes["analyze"] = (event["completed"], event["file"], event["total"])
+            elif kind == "export_progress":
+                self._changes["export"] = event["completed"]
+            elif kind == "job_start":
+                self._jobs[event["file"]] = None
+                self._jobs_changed = True
+            elif kind == "job_progress":
+                if event["file"] in self._jobs:
+                    self._jobs[event["file"]] = event
+                    self._jobs_changed = True
+                self._changes["overall"] = event["overall"]
+            elif kind == "job_done":
+                self._jobs.pop(event["file"], None)
+                self._jobs_changed = True
+                self._changes["merge"] = (event["completed"], event["file"], event["total"])
+                if event.get("overall") is not None:
+                    self._changes["overall"] = event["overall"]
+            elif kind == "job_parked":
+                self._changes["overall"] = event["overall"]
+            elif kind == "concurrency":
+                self._changes["tuning"] = (event["level"], event["curve"])
+            elif kind == "space_wait":
+                self._changes["space"] = (event["file"], event["needed"], event["available"])
+
+    def drain(self):
+        """{"analyze", "export", "merge", "overall", "tuning", "space", "jobs"} subset that changed, or None.
+
+        ``jobs`` maps every running file to its latest job_progress event (None before the first).
+        """
+        with self._lock:
+            if not self._changes and not self._jobs_changed:
+                return None
+            changes, self._changes = self._changes, {}
+            if self._jobs_changed:
+                changes["jobs"] = dict(self._jobs)
+                self._jobs_changed = False
+            return changes
+
+    def clear(self):
+        with self._lock:
+            self._changes = {}
+            self._jobs = {}
+            self._jobs_changed = False
@@ -0,0 +1,50 @@
+def _sort_value(value):
+    # Missing values sort before any real one; text ignores case
+    if value is None:
+        return (0, 0)
+    return (1, value.lower() if isinstance(value, str) else value)
+
+
+class ResultTable:
+    """In-memory rows (dicts) with a sorted and filtered view, for lists too long to hand to a widget.
+
+    ``view`` holds row indices in display order. Filtering matches ``text_key`` case-insensitively;
+    typing more characters only rescans the rows that matched the shorter text.
+    """
+
+    def __init__(self, rows, text_key="file"):
+        self.rows = list(rows)
+        self.text_key = text_key
+        self._texts = [str(row.get(text_key) or "").lower() for row in self.rows]
+        self._order = list(range(len(self.rows)))
+        self.view = self._order
+        self.sort_key = None
+        self.reverse = False
+        self.filter_text = ""
+
+    def __len__(self):
+        return len(self.view)
+
+    def row(self, position):
+        return self.rows[self.view[position]]
+
+    def sort(self, key, reverse=False):
+        rows = self.rows
+        self._order = sorted(range(len(rows)), key=lambda i: _sort_value(rows[i].get(key)), reverse=reverse)
+        self.sort_key, self.reverse = key, reverse
+        self._apply_filter(self._order, self.filter_text)
+
+    def filter(self, text):
+        text = (text or "").strip().lower()
+        if text == self.filter_text:
+            return
+        narrowing = self.filter_text and self.filter_text in text
+        self._apply_filter(self.view if narrowing else self._order, text)
+
+    def _apply_filter(self, candidates, text):
+        self.filter_text = text
+        if not text:
+            self.view = self._order
+        else:
+            texts = self._texts
+            self.view = [i for i in candidates if text in texts[i]]
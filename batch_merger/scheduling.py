@@ -0,0 +1,403 @@
+import bisect
+import heapq
+import os
+import shutil
+import threading
+import time
+
+# Concurrent jobs allowed to touch one device, by detected media type. "unknown" (no /sys
+# information, e.g. on Windows or macOS) is left to the global thread limit.
+DEFAULT_DEVICE_LIMITS = {"rotational": 2, "ssd": 8, "network": 4, "unknown": None}
+
+# Left free on an output volume on top of what running jobs still have to write
+FREE_SPACE_MARGIN = 512 * 1024 * 1024
+# Container overhead (cues, block headers) over the tracks' own bytes
+OUTPUT_SIZE_FACTOR = 1.02
+
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "afs", "ceph", "glusterfs", "fuse.sshfs", "fuse.rclone",
+    "davfs", "fuse.glusterfs", "lustre",
+}
+
+
+def parse_device_limits(text):
+    limits = dict(DEFAULT_DEVICE_LIMITS)
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        kind, _, value = part.partition("=")
+        kind = kind.strip()
+        if kind not in limits:
+            raise ValueError(f"Unknown device kind '{kind}' (expected one of {', '.join(limits)})")
+        value = value.strip().lower()
+        limits[kind] = None if value in ("", "0", "none", "unlimited") else int(value)
+    return limits
+
+
+def longest_first_key(job):
+    # Longest-processing-time first: big files start early instead of running alone at the end
+    return (-job.get("cost", 0), job["index"])
+
+
+def order_longest_first(jobs):
+    return sorted(jobs, key=longest_first_key)
+
+
+def predict_makespan(costs, workers):
+    """Cost finished by the busiest worker when ``costs`` are handed out in order to ``workers``."""
+    loads = [0] * max(1, int(workers))
+    for cost in costs:
+        heapq.heappush(loads, heapq.heappop(loads) + cost)
+    return max(loads)
+
+
+class StorageTopology:
+    """Maps paths to the device they live on and classifies it as rotational, ssd or network."""
+
+    def __init__(self, sys_root="/sys", mountinfo_path="/proc/self/mountinfo"):
+        self.sys_root = sys_root
+        self._kinds = {}
+        self._lock = threading.Lock()
+        self._fstypes = self._read_mountinfo(mountinfo_path)
+
+    def _read_mountinfo(self, mountinfo_path):
+        fstypes = {}
+        try:
+            with open(mountinfo_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    fields = line.split()
+                    if " - " not in line or len(fields) < 3:
+                        continue
+                    fstype = line.split(" - ", 1)[1].split()[0]
+                    fstypes[fields[2]] = fstype
+        except OSError:
+            pass
+        return fstypes
+
+    def existing_path(self, path):
+        # Outputs may not exist yet, so walk up to the nearest existing folder
+        current = os.path.abspath(path)
+        while not os.path.exists(current):
+            parent = os.path.dirname(current)
+            if parent == current:
+                return None
+            current = parent
+        return current
+
+    def device_of(self, path):
+        existing = self.existing_path(path)
+        try:
+            return os.stat(existing).st_dev if existing else None
+        except OSError:
+            return None
+
+    def kind_of(self, dev):
+        if dev is None:
+            return "unknown"
+        with self._lock:
+            if dev in self._kinds:
+                return self._kinds[dev]
+        kind = self._detect_kind(dev)
+        with self._lock:
+            self._kinds[dev] = kind
+        return kind
+
+    def _detect_kind(self, dev):
+        major, minor = os.major(dev), os.minor(dev)
+        if self._fstypes.get(f"{major}:{minor}") in NETWORK_FILESYSTEMS:
+            return "network"
+        sys_path = os.path.join(self.sys_root, "dev", "block", f"{major}:{minor}")
+        if not os.path.exists(sys_path):
+            return "unknown"
+        real = os.path.realpath(sys_path)
+        # Partitions have no queue/ of their own; it lives on the parent disk
+        for candidate in (real, os.path.dirname(real)):
+            flag = os.path.join(candidate, "queue", "rotational")
+            try:
+                with open(flag, "r", encoding="utf-8") as f:
+                    return "rotational" if f.read().strip() == "1" else "ssd"
+            except OSError:
+                continue
+        return "unknown"
+
+    def describe(self, dev):
+        if dev is None:
+            return "unknown device"
+        return f"{os.major(dev)}:{os.minor(dev)} ({self.kind_of(dev)})"
+
+
+class DeviceLimiter:
+    """Admission gate that caps how many running jobs read from or write to each device."""
+
+    def __init__(self, topology, limits=None):
+        self.topology = topology
+        self.limits = dict(DEFAULT_DEVICE_LIMITS if limits is None else limits)
+        self.active = {}
+
+    def devices_for(self, job):
+        if "devices" not in job:
+            devices = {self.topology.device_of(p) for p in (job["src1"], job["src2"], job["output"])}
+            job["devices"] = sorted(d for d in devices if d is not None)
+        return job["devices"]
+
+    def limit_for(self, dev):
+        return self.limits.get(self.topology.kind_of(dev))
+
+    def can_start(self, job):
+        for dev in self.devices_for(job):
+            limit = self.limit_for(dev)
+            if limit is not None and self.active.get(dev, 0) >= limit:
+                return False
+        return True
+
+    def on_start(self, job):
+        for dev in self.devices_for(job):
+            self.active[dev] = self.active.get(dev, 0) + 1
+
+    def on_finish(self, job):
+        for dev in self.devices_for(job):
+            self.active[dev] -= 1
+
+    def on_done(self, job):
+        pass
+
+
+class FreeSpaceGate:
+    """Admission gate that starts a job only when its output volume has room for it.
+
+    A job needs its estimated output size (``cost``, the selected tracks' bytes, times
+    ``OUTPUT_SIZE_FACTOR``). Started jobs on the same volume reserve whatever their partial output
+    (``job["partial"]``, on the output volume) has not written yet until ``on_done``, i.e. until
+    their output is in place rather than when the mux ends, and ``margin`` bytes always stay free.
+    Jobs that do not fit wait until running jobs finish or space is freed; ``on_wait(job, needed,
+    available)`` is called when a volume starts holding jobs back and every ``report_seconds``
+    while it still does. ``fits_when_idle`` tells whether a job could start on an otherwise idle
+    volume right now, for callers that would rather fail such jobs than wait for space to be freed.
+    """
+
+    def __init__(self, topology, margin=FREE_SPACE_MARGIN, on_wait=None, disk_usage=shutil.disk_usage,
+                 refresh_seconds=1.0, report_seconds=30.0, clock=time.monotonic):
+        self.topology = topology
+        self.margin = margin
+        self.on_wait = on_wait
+        self.disk_usage = disk_usage
+        self.refresh_seconds = refresh_seconds
+        self.report_seconds = report_seconds
+        self.clock = clock
+        self.running = {}
+        # Device -> when its wait was last reported
+        self.waiting = {}
+        self._free = {}
+
+    def output_device(self, job):
+        if "output_device" not in job:
+            job["output_device"] = self.topology.device_of(job["output"])
+        return job["output_device"]
+
+    def needed(self, job):
+        return int((job.get("cost") or job.get("input_size") or 0) * OUTPUT_SIZE_FACTOR)
+
+    def free_bytes(self, job):
+        # statvfs is cheap but the dispatcher asks for every queued job, so readings are reused briefly
+        dev = self.output_device(job)
+        cached = self._free.get(dev)
+        if cached is not None and self.clock() - cached[0] < self.refresh_seconds:
+            return cached[1]
+        try:
+            free = self.disk_usage(self.topology.existing_path(job["output"])).free
+        except (OSError, TypeError):
+            free = None
+        self._free[dev] = (self.clock(), free)
+        return free
+
+    def reserved(self, dev):
+        total = 0
+        for job in self.running.get(dev, ()):
+            try:
+                written = os.path.getsize(job["partial"]) if job.get("partial") else 0
+            except OSError:
+                written = 0
+            total += max(0, self.needed(job) - written)
+        return total
+
+    def can_start(self, job):
+        free = self.free_bytes(job)
+        if free is None:
+            return True
+        dev = self.output_device(job)
+        needed = self.needed(job)
+        available = free - self.reserved(dev) - self.margin
+        if needed <= available:
+            return True
+        reported = self.waiting.get(dev)
+        if reported is None or self.clock() - reported >= self.report_seconds:
+            self.waiting[dev] = self.clock()
+            if self.on_wait is not None:
+                self.on_wait(job, needed, max(0, available))
+        return False
+
+    def fits_when_idle(self, job):
+        """Whether the job fits once nothing else is reserved on its volume, judged on a fresh reading."""
+        self._free.pop(self.output_device(job), None)
+        free = self.free_bytes(job)
+        return free is None or self.needed(job) <= free - self.margin
+
+    def on_start(self, job):
+        dev = self.output_device(job)
+        self.waiting.pop(dev, None)
+        self.running.setdefault(dev, []).append(job)
+        # The next check has to see this job's reservation against a fresh reading
+        self._free.pop(dev, None)
+
+    def on_finish(self, job):
+        pass
+
+    def on_done(self, job):
+        dev = self.output_device(job)
+        self.running[dev].remove(job)
+        self._free.pop(dev, None)
+
+
+class JobScheduler:
+    """Hands out queued jobs in order, skipping past jobs that a gate is currently holding back.
+
+    Gates expose ``can_start(job)``, ``on_start(job)``, ``on_finish(job)`` (its mux ended and the
+    worker is free) and ``on_done(job)`` (its output was verified and moved, or it failed). Only
+    the first ``lookahead`` queued jobs are considered, so dispatch stays cheap on very large
+    batches whose head is blocked. The scheduler is driven from the single dispatcher thread in
+    ``BatchEngine.merge``, so gates need no locking.
+    """
+
+    def __init__(self, jobs, gates=(), lookahead=256, key=None):
+        # key keeps the queue sorted as jobs are added, e.g. longest_first_key for a streaming batch
+        self.key = key
+        self.pending = sorted(jobs, key=key) if key is not None else list(jobs)
+        self._keys = [key(job) for job in self.pending] if key is not None else None
+        self.gates = list(gates)
+        self.lookahead = lookahead
+
+    def __len__(self):
+        return len(self.pending)
+
+    def next_ready(self):
+        for idx, job in enumerate(self.pending[:self.lookahead]):
+            if all(gate.can_start(job) for gate in self.gates):
+                del self.pending[idx]
+                if self._keys is not None:
+                    del self._keys[idx]
+                for gate in self.gates:
+                    gate.on_start(job)
+                return job
+        return None
+
+    def add(self, job):
+        if self.key is None:
+            self.pending.append(job)
+            return
+        # Binary insertion keeps adds cheap on very large streaming batches
+        key = self.key(job)
+        idx = bisect.bisect_right(self._keys, key)
+        self._keys.insert(idx, key)
+        self.pending.insert(idx, job)
+
+    def remove(self, job):
+        idx = self.pending.index(job)
+        del self.pending[idx]
+        if self._keys is not None:
+            del self._keys[idx]
+
+    def finish(self, job):
+        for gate in self.gates:
+            gate.on_finish(job)
+
+    def done(self, job):
+        for gate in self.gates:
+            gate.on_done(job)
+
+    def clear(self):
+        dropped = self.pending
+        self.pending = []
+        if self._keys is not None:
+            self._keys = []
+        return dropped
+
+
+class ConcurrencyAutotuner:
+    """Hill-climbs the number of in-flight muxes on measured output throughput.
+
+    Completed jobs report their output size through ``record``. Once a measurement window holds
+    enough jobs and time, its bytes/second are stored for the current level and the level moves
+    one step: up while that keeps paying off, back to the best level once it does not. Levels
+    within ``tolerance`` of the best throughput count as equal and the lowest of them wins, so the
+    tuner stops adding workers when an extra one no longer helps. After ``reprobe_windows`` settled
+    windows the next level is measured again, since the best value drifts with disk load.
+    """
+
+    def __init__(self, initial, minimum=1, maximum=16, min_window_jobs=2, min_window_seconds=10.0,
+                 tolerance=0.05, reprobe_windows=6, clock=time.monotonic):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.level = min(max(int(initial), self.minimum), self.maximum)
+        self.min_window_jobs = min_window_jobs
+        self.min_window_seconds = min_window_seconds
+        self.tolerance = tolerance
+        self.reprobe_windows = reprobe_windows
+        self.clock = clock
+        self.curve = {}
+        self.history = []
+        self._direction = 1
+        self._settled = 0
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_start = self.clock()
+        self._window_bytes = 0
+        self._window_jobs = 0
+
+    def best_level(self):
+        if not self.curve:
+            return self.level
+        peak = max(self.curve.values())
+        return min(level for level, tput in self.curve.items() if tput >= peak * (1 - self.tolerance))
+
+    def record(self, nbytes):
+        """Account one finished job; returns True when the level was re-evaluated."""
+        self._window_bytes += max(0, nbytes or 0)
+        self._window_jobs += 1
+        elapsed = self.clock() - self._window_start
+        if self._window_jobs < max(self.min_window_jobs, self.level) or elapsed < self.min_window_seconds:
+            return False
+        self._observe(self._window_bytes / elapsed)
+        self._reset_window()
+        return True
+
+    def _observe(self, throughput):
+        previous = self.curve.get(self.level)
+        self.curve[self.level] = throughput if previous is None else (previous + throughput) / 2
+        self.history.append((round(self.clock(), 3), self.level, throughput))
+
+        best = self.best_level()
+        if self.level != best:
+            # The step just taken did not help: return to the best level and look the other way next
+            self._direction = 1 if self.level < best else -1
+            self.level = best
+            self._settled = 0
+            return
+
+        for step in (self._direction, -self._direction):
+            candidate = self.level + step
+            if self.minimum <= candidate <= self.maximum and candidate not in self.curve:
+                self._direction = step
+                self.level = candidate
+                self._settled = 0
+                return
+
+        self._settled += 1
+        if self._settled >= self.reprobe_windows and self.level < self.maximum:
+            self.curve.pop(self.level + 1, None)
+            self._direction = 1
+            self.level += 1
+            self._settled = 0
+
+    def curve_mb_per_s(self):
+        return {level: round(tput / 1e6, 1) for level, tput in sorted(self.curve.items())}
@@ -0,0 +1,50 @@
+import json
+import os
+
+from batch_merger.identify import CACHE_FILENAME
+
+SETTINGS_FILENAME = "mkv_merger_settings.json"
+
+
+def get_app_dir():
+    # Settings and the identification cache live next to pymkv_merger_app.py, one level above this package
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_settings_path():
+    return os.path.join(get_app_dir(), SETTINGS_FILENAME)
+
+
+def get_identify_cache_path():
+    return os.path.join(get_app_dir(), CACHE_FILENAME)
+
+
+def read_settings():
+    settings_path = get_settings_path()
+    if not os.path.exists(settings_path):
+        return {}
+    try:
+        with open(settings_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[ERROR] Could not load settings: {e}")
+        return {}
+
+
+def write_settings(settings):
+    try:
+        with open(get_settings_path(), "w", encoding="utf-8") as f:
+            json.dump(settings, f, indent=4)
+    except Exception as e:
+        print(f"[ERROR] Could not save settings: {e}")
+
+
+def update_settings(**values):
+    settings = read_settings()
+    settings.update(values)
+    write_settings(settings)
+
+
+def read_preset(filepath):
+    with open(filepath, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,198 @@
+import os
+import shutil
+import threading
+import time
+
+from batch_merger import tracing
+from batch_merger.scheduling import OUTPUT_SIZE_FACTOR
+
+SESSION_PREFIX = "mkv_merger-scratch-"
+# A running stager touches its session folder this often; folders left alone for STALE_SECONDS are leftovers
+HEARTBEAT_SECONDS = 30
+STALE_SECONDS = 600
+COPY_CHUNK = 8 * 1024 * 1024
+
+DEFAULT_STAGING = {"folder": "", "budget_bytes": 50 * 1000 ** 3, "prefetch": 2}
+
+
+class ScratchStager:
+    """Copies the sources of upcoming jobs to a local scratch folder so mkvmerge reads and writes local disk.
+
+    A background thread stages the jobs passed to ``want`` in order, keeping at most ``prefetch``
+    staged jobs waiting to start and their inputs plus estimated outputs within ``budget_bytes``.
+    As a scheduler gate it holds a job back until its copies are complete; jobs too large for the
+    budget, whose copy failed or that ``skip(job)`` expects to be skipped, run from their original
+    paths. ``on_done`` deletes a job's local files once its output has been moved away. Each batch
+    works in its own session folder, removed by ``close``; folders of crashed sessions are cleaned
+    up by the next ``start``.
+    """
+
+    def __init__(self, folder, budget_bytes=DEFAULT_STAGING["budget_bytes"], prefetch=DEFAULT_STAGING["prefetch"],
+                 skip=None, clock=time.time):
+        self.folder = folder
+        self.skip = skip
+        self.budget_bytes = budget_bytes
+        self.prefetch = max(1, int(prefetch))
+        self.clock = clock
+        self.session = os.path.join(folder, f"{SESSION_PREFIX}{os.getpid()}-{int(clock())}")
+        self.used = 0
+        self.entries = {}
+        self.wanted = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="scratch-prefetch", daemon=True)
+
+    def start(self):
+        self.remove_stale()
+        os.makedirs(os.path.join(self.session, "in"))
+        os.makedirs(os.path.join(self.session, "out"))
+        self._thread.start()
+        print(f"[INFO] Staging sources in {self.session} (budget {self.budget_bytes / 1e9:.1f} GB, "
+              f"{self.prefetch} jobs ahead)")
+        return self
+
+    def remove_stale(self):
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.folder, name)
+            try:
+                stale = name.startswith(SESSION_PREFIX) and self.clock() - os.path.getmtime(path) > STALE_SECONDS
+            except OSError:
+                continue
+            if stale:
+                print(f"[INFO] Removing scratch folder left by an earlier run: {path}")
+                shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        shutil.rmtree(self.session, ignore_errors=True)
+
+    def needed(self, job):
+        return (job.get("input_size") or 0) + int((job.get("cost") or job.get("input_size") or 0) * OUTPUT_SIZE_FACTOR)
+
+    def bypass(self, job):
+        # Jobs that are not worth staging start from their original paths right away
+        if "stage_bypass" not in job:
+            job["stage_bypass"] = self.needed(job) > self.budget_bytes or bool(self.skip and self.skip(job))
+        return job["stage_bypass"]
+
+    def want(self, jobs):
+        """The queued jobs in the order they will be started; the first ones that fit are staged."""
+        with self._lock:
+            self.wanted = list(jobs)
+        self._wake.set()
+
+    def output_path(self, job):
+        return os.path.join(self.session, "out", f"{job['index']}{os.path.splitext(job['output'])[1]}")
+
+    # Gate interface (see JobScheduler)
+
+    def can_start(self, job):
+        with self._lock:
+            entry = self.entries.get(job["index"])
+        if entry is None:
+            return self.bypass(job)
+        return entry["state"] != "copying"
+
+    def on_start(self, job):
+        with self._lock:
+            entry = self.entries.get(job["index"])
+            if entry is not None and entry["state"] == "ready":
+                entry["state"] = "running"
+                job["staged"] = {"inputs": entry["inputs"], "output": self.output_path(job)}
+        self._wake.set()
+
+    def on_finish(self, job):
+        # The output stays on scratch until it has been moved; on_done frees the space
+        pass
+
+    def on_done(self, job):
+        with self._lock:
+            entry = self.entries.pop(job["index"], None)
+            if entry is None:
+                return
+            self.used -= entry["bytes"]
+        for path in list(entry["inputs"]) + [self.output_path(job)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        job.pop("staged", None)
+        self._wake.set()
+
+    def _next_to_stage(self):
+        with self._lock:
+            waiting = sum(1 for entry in self.entries.values() if entry["state"] in ("copying", "ready"))
+            if waiting >= self.prefetch:
+                return None
+            for job in self.wanted:
+                if job["index"] in self.entries or self.bypass(job):
+                    continue
+                needed = self.needed(job)
+                if self.used + needed > self.budget_bytes:
+                    # Wait for space rather than letting smaller jobs overtake this one indefinitely
+                    return None
+                self.used += needed
+                self.entries[job["index"]] = {"state": "copying", "bytes": needed, "inputs": ()}
+                return job
+        return None
+
+    def _run(self):
+        last_touch = 0
+        while not self._stop.is_set():
+            if self.clock() - last_touch >= HEARTBEAT_SECONDS:
+                try:
+                    os.utime(self.session)
+                except OSError:
+                    pass
+                last_touch = self.clock()
+            job = self._next_to_stage()
+            if job is None:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            self._stage(job)
+
+    def _stage(self, job):
+        inputs = []
+        try:
+            with tracing.span("stage", file=job["name"], bytes=job.get("input_size") or 0):
+                for number, source in enumerate((job["src1"], job["src2"]), start=1):
+                    target = os.path.join(self.session, "in", f"{job['index']}-{number}{os.path.splitext(source)[1]}")
+                    inputs.append(target)
+                    self._copy(source, target)
+            state = "ready"
+        except (OSError, InterruptedError) as e:
+            if not self._stop.is_set():
+                print(f"[INFO] Could not stage {job['name']}, it will read the original files: {e}")
+            for path in inputs:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            inputs, state = [], "failed"
+        with self._lock:
+            entry = self.entries.get(job["index"])
+            if entry is not None:
+                entry["inputs"] = tuple(inputs)
+                entry["state"] = state
+                if state == "failed":
+                    self.used -= entry["bytes"]
+                    entry["bytes"] = 0
+
+    def _copy(self, source, target):
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            while True:
+                if self._stop.is_set():
+                    raise InterruptedError("staging stopped")
+                chunk = src.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                dst.write(chunk)
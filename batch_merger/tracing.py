@@ -0,0 +1,122 @@
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+# The GUI traces itself when this names the trace file to write
+TRACE_ENV = "MKV_MERGER_TRACE"
+
+_tracer = None
+
+
+class Tracer:
+    """Collects timed spans and writes them as a Chrome trace-event file (chrome://tracing, ui.perfetto.dev)."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.events = []
+        self.thread_names = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, **args):
+        # Spans measured across threads (queue waits) are added from their two clock readings
+        thread = threading.current_thread()
+        event = {"name": name, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                 "ts": round((start - self.started) * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            self.thread_names.setdefault(thread.ident, thread.name)
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add(name, start, self.clock(), **args)
+
+    def durations(self):
+        by_name = {}
+        with self._lock:
+            for event in self.events:
+                by_name.setdefault(event["name"], []).append(event["dur"] / 1e6)
+        return by_name
+
+    def summary(self):
+        """{stage: {count, total, p50, p95, max}} in seconds."""
+        result = {}
+        for name, values in self.durations().items():
+            values.sort()
+            result[name] = {
+                "count": len(values),
+                "total": sum(values),
+                "p50": _percentile(values, 50),
+                "p95": _percentile(values, 95),
+                "max": values[-1],
+            }
+        return result
+
+    def format_summary(self):
+        rows = sorted(self.summary().items(), key=lambda item: -item[1]["total"])
+        lines = [f"{'stage':<16} {'count':>7} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+        for name, s in rows:
+            lines.append(f"{name:<16} {s['count']:>7} {s['total']:>9.2f} {s['p50'] * 1e3:>9.1f} "
+                         f"{s['p95'] * 1e3:>9.1f} {s['max'] * 1e3:>9.1f}")
+        return "\n".join(lines)
+
+    def write(self, path):
+        with self._lock:
+            events = list(self.events)
+            names = dict(self.thread_names)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                    for tid, name in names.items()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms",
+                       "otherData": {"summary": self.summary()}}, f)
+
+
+def _percentile(sorted_values, percent):
+    # Nearest-rank percentile; enough for a summary table
+    rank = math.ceil(percent / 100.0 * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+
+def enable(clock=time.perf_counter):
+    global _tracer
+    _tracer = Tracer(clock)
+    return _tracer
+
+
+def disable():
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def active():
+    return _tracer
+
+
+def span(name, **args):
+    """A span on the active tracer; a no-op context when tracing is off."""
+    tracer = _tracer
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name, **args)
+
+
+def now():
+    # Start time for a span that ends on another thread; None when tracing is off
+    tracer = _tracer
+    return tracer.clock() if tracer is not None else None
+
+
+def add_span(name, start, **args):
+    tracer = _tracer
+    if tracer is not None and start is not None:
+        tracer.add(name, start, tracer.clock(), **args)
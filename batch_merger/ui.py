@@ -0,0 +1,1405 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+import os
+import re
+import json
+import sys
+import subprocess
+import traceback
+import threading
+from batch_merger import tracing
+from batch_merger.identify import IdentifyCache, mkvmerge_executable, tracks_from_identify, container_title
+from batch_merger.ebml import UnsupportedFile, read_header
+from batch_merger.metrics import BatchMetrics, MetricsServer, TextfileWriter
+from batch_merger.pairing import DEFAULT_PAIRING, PAIRING_MODES
+from batch_merger.progress import EventAggregate, format_eta
+from batch_merger.results import ResultTable
+from batch_merger.scheduling import DEFAULT_DEVICE_LIMITS
+from batch_merger.staging import DEFAULT_STAGING
+from batch_merger.settings import (
+    get_settings_path, get_identify_cache_path, read_settings, write_settings, update_settings
+)
+
+# Worker threads only record progress; the window redraws it at most this often
+UI_POLL_MS = 100
+
+
+class VirtualTable:
+    """A Treeview that only holds the rows in view, backed by a ``ResultTable``.
+
+    ``columns`` is a list of ``(key, heading, width, anchor, format)``; ``format`` turns a value
+    into text (None shows it as is). Clicking a heading sorts by that column, the filter box
+    narrows the rows by file name.
+    """
+
+    def __init__(self, parent, table, columns, height=15):
+        self.table = table
+        self.columns = columns
+        self.first = 0
+        self.visible = height
+        self._filter_job = None
+        self.frame = ttk.Frame(parent)
+
+        filter_row = ttk.Frame(self.frame)
+        filter_row.pack(fill="x", pady=(0, 5))
+        ttk.Label(filter_row, text="Filter:").pack(side="left")
+        self.filter_var = tk.StringVar()
+        ttk.Entry(filter_row, textvariable=self.filter_var, width=40).pack(side="left", padx=5)
+        self.count_label = ttk.Label(filter_row, text="")
+        self.count_label.pack(side="right")
+        self.filter_var.trace_add("write", lambda *_: self._schedule_filter())
+
+        body = ttk.Frame(self.frame)
+        body.pack(fill="both", expand=True)
+        self.tree = ttk.Treeview(body, columns=[c[0] for c in columns], show="headings", height=height)
+        for key, heading, width, anchor, _ in columns:
+            self.tree.heading(key, text=heading, command=lambda k=key: self.sort_by(k))
+            self.tree.column(key, width=width, anchor=anchor)
+        self.scrollbar = ttk.Scrollbar(body, orient="vertical", command=self._on_scrollbar)
+        self.tree.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll(-self.visible))
+        self.tree.bind("<Next>", lambda e: self.scroll(self.visible))
+        self.refresh()
+
+    def refresh(self):
+        total = len(self.table)
+        self.first = max(0, min(self.first, total - self.visible))
+        count = min(self.visible, total - self.first)
+        children = self.tree.get_children()
+        if len(children) > count:
+            self.tree.delete(*children[count:])
+        for k in range(len(children), count):
+            self.tree.insert("", "end", iid=f"row{k}")
+        for k in range(count):
+            row = self.table.row(self.first + k)
+            values = []
+            for key, _, _, _, fmt in self.columns:
+                value = row.get(key)
+                values.append("" if value is None else fmt(value) if fmt else value)
+            self.tree.item(f"row{k}", values=values)
+        if total:
+            self.scrollbar.set(self.first / total, (self.first + count) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self.count_label.config(text=f"{total} of {len(self.table.rows)}")
+
+    def scroll(self, rows):
+        self.first += rows
+        self.refresh()
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.first = int(float(amount) * len(self.table))
+        else:
+            self.first += int(amount) * (self.visible if unit == "pages" else 1)
+        self.refresh()
+
+    def _on_resize(self, event):
+        style = ttk.Style()
+        row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        # One row's worth of height goes to the headings
+        visible = max(1, event.height // row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    def sort_by(self, key):
+        reverse = self.table.sort_key == key and not self.table.reverse
+        self.table.sort(key, reverse=reverse)
+        for column, heading, _, _, _ in self.columns:
+            arrow = (" ▼" if reverse else " ▲") if column == key else ""
+            self.tree.heading(column, text=heading + arrow)
+        self.first = 0
+        self.refresh()
+
+    def _schedule_filter(self):
+        # Waits for a pause in typing so long lists aren't rescanned on every key
+        if self._filter_job is not None:
+            self.tree.after_cancel(self._filter_job)
+        self._filter_job = self.tree.after(150, self._apply_filter)
+
+    def _apply_filter(self):
+        self._filter_job = None
+        self.table.filter(self.filter_var.get())
+        self.first = 0
+        self.refresh()
+
+
+class Pymkv2MergerApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Batch MKV Merger - J0nan")
+        self.root.geometry("750x600")
+
+        self.mkvtoolnix_path = tk.StringVar()
+        if sys.platform == "win32":
+            default_path = r"C:\Program Files\MKVToolNix"
+            if os.path.isdir(default_path) and os.path.exists(os.path.join(default_path, "mkvmerge.exe")):
+                self.mkvtoolnix_path.set(default_path)
+
+        self.folder1_path = tk.StringVar()
+        self.folder2_path = tk.StringVar()
+        self.output_folder_path = tk.StringVar()
+        self.track_selections = {}
+        self.layout_clusters = []
+        self.layout_selections = {}
+
+        self.metadata_title = tk.StringVar()
+        self.max_threads = tk.IntVar(value=min(4, os.cpu_count() or 4))
+        self.resume_batches = tk.BooleanVar(value=True)
+        self.continue_on_error = tk.BooleanVar(value=False)
+        self.retries = tk.IntVar(value=0)
+        self.limit_per_device = tk.BooleanVar(value=True)
+        self.device_limits = dict(DEFAULT_DEVICE_LIMITS)
+        self.autotune_threads = tk.BooleanVar(value=False)
+        self.autotune_level = None
+        self.largest_first = tk.BooleanVar(value=True)
+        self.pipeline_mode = tk.BooleanVar(value=False)
+        self.verify_outputs = tk.BooleanVar(value=False)
+        self.scratch_folder = tk.StringVar(value=DEFAULT_STAGING["folder"])
+        self.scratch_budget_gb = tk.IntVar(value=int(DEFAULT_STAGING["budget_bytes"] / 1e9))
+        self.merge_job_rate = None
+        self.pair_mode = tk.StringVar(value=DEFAULT_PAIRING["mode"])
+        self.pair_recursive = tk.BooleanVar(value=DEFAULT_PAIRING["recursive"])
+        self.pair_pattern = tk.StringVar(value=DEFAULT_PAIRING["pattern"])
+        self.pair_pattern2 = tk.StringVar(value=DEFAULT_PAIRING["pattern2"])
+        self.pair_extensions = tk.StringVar(value=DEFAULT_PAIRING["extensions"])
+        self.current_pairs = {}
+
+        self.load_settings()
+
+        self.include_chapters_file1 = tk.BooleanVar(value=False)
+        self.include_chapters_file2 = tk.BooleanVar(value=False)
+        self.include_global_tags_file1 = tk.BooleanVar(value=False)
+        self.include_global_tags_file2 = tk.BooleanVar(value=False)
+        self.include_attachments_file1 = tk.BooleanVar(value=False)
+        self.include_attachments_file2 = tk.BooleanVar(value=False)
+
+        self.file_jsons = {1: None, 2: None}
+        self.sample_paths = {1: None, 2: None}
+        self.identify_cache = IdentifyCache(self.get_identify_cache_path())
+
+        main_frame = ttk.Frame(root, padding="10")
+        main_frame.pack(fill="both", expand=True)
+
+        self.create_path_selection_widgets(main_frame)
+        self.create_batch_options_widgets(main_frame)
+        self.create_pairing_widgets(main_frame)
+        ttk.Button(main_frame, text="Analyze Files & Select Tracks", command=self.setup_track_selection).pack(pady=12)
+
+        self.progress_window = None
+        self.merge_progressbar = None
+        self.merge_progress_label = None
+        self.merge_tuning_label = None
+        self.merge_eta_label = None
+        self.merge_jobs_frame = None
+        self.merge_job_rows = {}
+        self.accept_button = None
+
+        self.start_merge_button = None
+        self.export_script_button = None
+        self.merge_thread = None
+        self.check_thread = None
+        self.export_thread = None
+        self.cancel_button = None
+        self._current_matching_files = None
+        self.cancel_event = threading.Event()
+        self.metrics = BatchMetrics(cache_stats=self.identify_cache.stats)
+        self._start_metrics_exporters()
+        self.ui_events = EventAggregate()
+        self.root.after(UI_POLL_MS, self._poll_ui)
+
+    def _start_metrics_exporters(self):
+        # Opt-in through "metrics_port" and/or "metrics_textfile" in the settings file
+        settings = read_settings()
+        try:
+            if settings.get("metrics_port"):
+                MetricsServer(self.metrics, int(settings["metrics_port"])).start()
+            if settings.get("metrics_textfile"):
+                TextfileWriter(self.metrics, settings["metrics_textfile"]).start()
+        except (OSError, ValueError) as e:
+            print(f"[ERROR] Could not start metrics: {e}")
+
+    def get_settings_path(self):
+        return get_settings_path()
+
+    def get_identify_cache_path(self):
+        return get_identify_cache_path()
+
+    def load_settings(self):
+        settings_path = self.get_settings_path()
+        if os.path.exists(settings_path):
+            try:
+                settings = read_settings()
+
+                if settings.get("mkvtoolnix_path"):
+                    self.mkvtoolnix_path.set(settings["mkvtoolnix_path"])
+                
+                if settings.get("folder1_path"): self.folder1_path.set(settings["folder1_path"])
+                if settings.get("folder2_path"): self.folder2_path.set(settings["folder2_path"])
+                if settings.get("output_folder_path"): self.output_folder_path.set(settings["output_folder_path"])
+                if settings.get("max_threads"): self.max_threads.set(settings["max_threads"])
+                if "resume_batches" in settings: self.resume_batches.set(settings["resume_batches"])
+                if "continue_on_error" in settings: self.continue_on_error.set(settings["continue_on_error"])
+                if "retries" in settings: self.retries.set(settings["retries"])
+                if "limit_per_device" in settings: self.limit_per_device.set(settings["limit_per_device"])
+                if settings.get("device_limits"): self.device_limits.update(settings["device_limits"])
+                if "autotune_threads" in settings: self.autotune_threads.set(settings["autotune_threads"])
+                if settings.get("autotune_level"): self.autotune_level = settings["autotune_level"]
+                if "largest_first" in settings: self.largest_first.set(settings["largest_first"])
+                if "pipeline_mode" in settings: self.pipeline_mode.set(settings["pipeline_mode"])
+                if "verify_outputs" in settings: self.verify_outputs.set(settings["verify_outputs"])
+                if settings.get("scratch_folder"): self.scratch_folder.set(settings["scratch_folder"])
+                if settings.get("scratch_budget_gb"): self.scratch_budget_gb.set(settings["scratch_budget_gb"])
+                if settings.get("merge_job_rate"): self.merge_job_rate = settings["merge_job_rate"]
+                pairing = dict(DEFAULT_PAIRING, **settings.get("pairing", {}))
+                self.pair_mode.set(pairing["mode"])
+                self.pair_recursive.set(pairing["recursive"])
+                self.pair_pattern.set(pairing["pattern"])
+                self.pair_pattern2.set(pairing["pattern2"])
+                self.pair_extensions.set(pairing["extensions"])
+            except Exception as e:
+                print(f"[ERROR] Could not load settings: {e}")
+
+    def save_settings(self):
+        # Keep keys written by the headless engine (e.g. tuning results) intact
+        settings = read_settings()
+        settings.update({
+            "mkvtoolnix_path": self.mkvtoolnix_path.get(),
+            "folder1_path": self.folder1_path.get(),
+            "folder2_path": self.folder2_path.get(),
+            "output_folder_path": self.output_folder_path.get(),
+            "max_threads": self.max_threads.get(),
+            "resume_batches": self.resume_batches.get(),
+            "continue_on_error": self.continue_on_error.get(),
+            "retries": self.retries.get(),
+            "limit_per_device": self.limit_per_device.get(),
+            "device_limits": self.device_limits,
+            "autotune_threads": self.autotune_threads.get(),
+            "largest_first": self.largest_first.get(),
+            "pipeline_mode": self.pipeline_mode.get(),
+            "verify_outputs": self.verify_outputs.get(),
+            "scratch_folder": self.scratch_folder.get(),
+            "scratch_budget_gb": self.scratch_budget_gb.get(),
+            "pairing": self.pairing_options()
+        })
+        write_settings(settings)
+
+    def create_path_selection_widgets(self, parent):
+        path_frame = ttk.LabelFrame(parent, text="File and Folder Paths")
+        path_frame.pack(fill="x", expand=True, padx=5, pady=5)
+
+        ttk.Label(path_frame, text="MKVToolNix Path:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        ttk.Entry(path_frame, textvariable=self.mkvtoolnix_path, width=68).grid(row=0, column=1, padx=5, pady=5)
+        ttk.Button(path_frame, text="Browse...", command=self.browse_mkvtoolnix).grid(row=0, column=2, padx=5, pady=5)
+
+        ttk.Label(path_frame, text="Input Folder 1:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
+        ttk.Entry(path_frame, textvariable=self.folder1_path, width=68).grid(row=1, column=1, padx=5, pady=5)
+        ttk.Button(path_frame, text="Browse...", command=lambda: self.browse_folder(self.folder1_path)).grid(row=1, column=2, padx=5, pady=5)
+
+        ttk.Label(path_frame, text="Input Folder 2:").grid(row=2, column=0, sticky="w", padx=5, pady=5)
+        ttk.Entry(path_frame, textvariable=self.folder2_path, width=68).grid(row=2, column=1, padx=5, pady=5)
+        ttk.Button(path_frame, text="Browse...", command=lambda: self.browse_folder(self.folder2_path)).grid(row=2, column=2, padx=5, pady=5)
+
+        ttk.Label(path_frame, text="Output Folder:").grid(row=3, column=0, sticky="w", padx=5, pady=5)
+        ttk.Entry(path_frame, textvariable=self.output_folder_path, width=68).grid(row=3, column=1, padx=5, pady=5)
+        ttk.Button(path_frame, text="Browse...", command=lambda: self.browse_folder(self.output_folder_path)).grid(row=3, column=2, padx=5, pady=5)
+
+    def create_batch_options_widgets(self, parent):
+        options_frame = ttk.LabelFrame(parent, text="Batch Options")
+        options_frame.pack(fill="x", expand=True, padx=5, pady=5)
+
+        ttk.Label(options_frame, text="Max Threads:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        thread_spinbox = ttk.Spinbox(options_frame, from_=1, to=32, textvariable=self.max_threads, width=5)
+        thread_spinbox.grid(row=0, column=1, sticky="w", padx=5, pady=5)
+
+        ttk.Checkbutton(options_frame, text="Auto-tune (Max Threads is the ceiling)",
+                        variable=self.autotune_threads).grid(row=2, column=0, columnspan=2, sticky="w", padx=5, pady=5)
+
+        ttk.Checkbutton(options_frame, text="Skip files already merged by an interrupted run",
+                        variable=self.resume_batches).grid(row=0, column=2, columnspan=2, sticky="w", padx=15, pady=5)
+
+        ttk.Label(options_frame, text="Retries:").grid(row=1, column=0, sticky="w", padx=5, pady=5)
+        retries_spinbox = ttk.Spinbox(options_frame, from_=0, to=5, textvariable=self.retries, width=5)
+        retries_spinbox.grid(row=1, column=1, sticky="w", padx=5, pady=5)
+
+        ttk.Checkbutton(options_frame, text="Continue with the remaining files when one fails",
+                        variable=self.continue_on_error).grid(row=1, column=2, columnspan=2, sticky="w", padx=15, pady=5)
+
+        limits_text = ", ".join(f"{kind} {limit}" for kind, limit in self.device_limits.items() if limit)
+        ttk.Checkbutton(options_frame, text=f"Limit concurrent jobs per disk ({limits_text})",
+                        variable=self.limit_per_device).grid(row=2, column=2, columnspan=2, sticky="w", padx=15, pady=5)
+
+        ttk.Checkbutton(options_frame, text="Start the largest files first",
+                        variable=self.largest_first).grid(row=3, column=0, columnspan=2, sticky="w", padx=5, pady=5)
+
+        ttk.Checkbutton(options_frame, text="Check durations while merging (review mismatches at the end)",
+                        variable=self.pipeline_mode).grid(row=3, column=2, columnspan=2, sticky="w", padx=15, pady=5)
+
+        ttk.Checkbutton(options_frame, text="Verify each output's tracks and duration",
+                        variable=self.verify_outputs).grid(row=4, column=0, columnspan=2, sticky="w", padx=5, pady=5)
+
+        scratch_frame = ttk.Frame(options_frame)
+        scratch_frame.grid(row=5, column=0, columnspan=4, sticky="w", padx=5, pady=5)
+        ttk.Label(scratch_frame, text="Local scratch folder (optional):").pack(side="left")
+        ttk.Entry(scratch_frame, textvariable=self.scratch_folder, width=36).pack(side="left", padx=5)
+        ttk.Button(scratch_frame, text="Browse...",
+                   command=lambda: self.browse_folder(self.scratch_folder)).pack(side="left")
+        ttk.Label(scratch_frame, text="Budget (GB):").pack(side="left", padx=(15, 5))
+        ttk.Spinbox(scratch_frame, from_=1, to=10000, textvariable=self.scratch_budget_gb, width=6).pack(side="left")
+
+    def create_pairing_widgets(self, parent):
+        pairing_frame = ttk.LabelFrame(parent, text="File Pairing")
+        pairing_frame.pack(fill="x", expand=True, padx=5, pady=5)
+
+        ttk.Label(pairing_frame, text="Pair files by:").grid(row=0, column=0, sticky="w", padx=5, pady=5)
+        ttk.Combobox(pairing_frame, textvariable=self.pair_mode, values=PAIRING_MODES, state="readonly",
+                     width=10).grid(row=0, column=1, sticky="w", padx=5, pady=5)
+        ttk.Label(pairing_frame, text="Extensions:").grid(row=0, column=2, sticky="w", padx=5, pady=5)
+        ttk.Entry(pairing_frame, textvariable=self.pair_extensions, width=18).grid(row=0, column=3, sticky="w", padx=5, pady=5)
+        ttk.Checkbutton(pairing_frame, text="Include subfolders",
+                        variable=self.pair_recursive).grid(row=0, column=4, sticky="w", padx=15, pady=5)
+
+        ttk.Label(pairing_frame, text="Regex (folder 1):").grid(row=1, column=0, sticky="w", padx=5, pady=5)
+        ttk.Entry(pairing_frame, textvariable=self.pair_pattern, width=28).grid(row=1, column=1, columnspan=2, sticky="w", padx=5, pady=5)
+        ttk.Label(pairing_frame, text="Regex (folder 2):").grid(row=1, column=3, sticky="w", padx=5, pady=5)
+        ttk.Entry(pairing_frame, textvariable=self.pair_pattern2, width=28).grid(row=1, column=4, sticky="w", padx=5, pady=5)
+
+    def pairing_options(self):
+        return {
+            "mode": self.pair_mode.get(),
+            "recursive": self.pair_recursive.get(),
+            "pattern": self.pair_pattern.get(),
+            "pattern2": self.pair_pattern2.get(),
+            "extensions": self.pair_extensions.get(),
+        }
+
+    def browse_mkvtoolnix(self):
+        path = filedialog.askdirectory(title="Select MKVToolNix Installation Folder")
+        if path:
+            self.mkvtoolnix_path.set(path)
+            print(f"[INFO] mkvmerge path set to: {mkvmerge_executable(path)}")
+            self.save_settings()
+
+    def browse_folder(self, path_var):
+        path = filedialog.askdirectory()
+        if path:
+            path_var.set(path)
+            print(f"[INFO] Folder path set to: {path}")
+            self.save_settings()
+
+    def validate_paths(self):
+        if not self.mkvtoolnix_path.get() or not os.path.isdir(self.mkvtoolnix_path.get()):
+            messagebox.showerror("Error", "MKVToolNix path is not set or invalid.")
+            print(f"[ERROR] MKVToolNix path is not set or invalid")
+            return False
+        mkvmerge_exe = "mkvmerge.exe" if sys.platform == "win32" else "mkvmerge"
+        if not os.path.exists(os.path.join(self.mkvtoolnix_path.get(), mkvmerge_exe)):
+            messagebox.showerror("Error", f"mkvmerge not found at: {self.mkvtoolnix_path.get()}")
+            print(f"[ERROR] mkvmerge not found at: {self.mkvtoolnix_path.get()}")
+            return False
+        if not self.folder1_path.get() or not self.folder2_path.get() or not self.output_folder_path.get():
+            messagebox.showerror("Error", "All input and output folders must be selected.")
+            print(f"[ERROR] All input and output folders must be selected")
+            return False
+        return True
+
+    def find_matching_files(self, show_report=False):
+        engine = self.create_engine()
+        try:
+            matching_files = engine.find_matching_files()
+        except FileNotFoundError as e:
+            messagebox.showerror("Error", f"Folder not found: {e.filename}")
+            print(f"[ERROR] Folder not found: {e.filename}")
+            return []
+        except (ValueError, re.error) as e:
+            messagebox.showerror("Error", f"Invalid pairing options: {e}")
+            print(f"[ERROR] Invalid pairing options: {e}")
+            return []
+        self.current_pairs = engine.pairs
+        report = engine.pairing_report
+        if show_report and any(report[key] for key in ("unmatched1", "unmatched2", "duplicates1", "duplicates2")):
+            self._show_unpaired_window(report)
+        return matching_files
+
+    def _show_unpaired_window(self, report, max_rows=2000):
+        window = tk.Toplevel(self.root)
+        window.title("Unpaired Files")
+        window.geometry("700x360")
+        window.transient(self.root)
+
+        rows = [("Folder 1", path, "no match") for path in report["unmatched1"]]
+        rows += [("Folder 2", path, "no match") for path in report["unmatched2"]]
+        rows += [("Folder 1", path, "duplicate key") for path in report["duplicates1"]]
+        rows += [("Folder 2", path, "duplicate key") for path in report["duplicates2"]]
+        summary = f"{len(report['pairs'])} pairs found. These {len(rows)} files were left out:"
+        if len(rows) > max_rows:
+            summary += f" (showing the first {max_rows})"
+        ttk.Label(window, text=summary).pack(padx=10, pady=10, anchor="w")
+
+        frame = ttk.Frame(window)
+        frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        tree = ttk.Treeview(frame, columns=("folder", "file", "reason"), show="headings")
+        tree.heading("folder", text="Folder")
+        tree.heading("file", text="File")
+        tree.heading("reason", text="Reason")
+        tree.column("folder", width=80, anchor="w")
+        tree.column("file", width=460, anchor="w")
+        tree.column("reason", width=110, anchor="w")
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+        for row in rows[:max_rows]:
+            tree.insert("", "end", values=row)
+
+        ttk.Button(window, text="Close", command=window.destroy).pack(pady=(0, 10))
+
+    def setup_track_selection(self):
+        if not self.validate_paths(): return
+        self.save_settings()
+        matching_files = self.find_matching_files(show_report=True)
+        if not matching_files:
+            messagebox.showinfo("Information", "No matching files found.")
+            print(f"[INFO] No matching files found")
+            return
+
+        if self.pipeline_mode.get():
+            # Durations are checked by the merge itself; only the sample pair is needed now
+            self._current_matching_files = matching_files
+            self.layout_clusters = []
+            self._continue_setup_track_selection()
+            return
+
+        self.show_progress_window(len(matching_files))
+        if self.merge_progress_label:
+            self.merge_progress_label.config(text="Analyzing file durations...")
+
+        self.check_thread = threading.Thread(target=self._analyze_durations_worker, args=(matching_files,), daemon=True)
+        self.check_thread.start()
+
+    def create_engine(self, settings=None):
+        # Imported on first use so the window is up before the engine's dependencies load
+        from batch_merger.engine import BatchEngine
+        return BatchEngine(
+            self.mkvtoolnix_path.get(), self.folder1_path.get(), self.folder2_path.get(),
+            self.output_folder_path.get(), settings if settings is not None else {},
+            max_workers=self.max_threads.get(), identify_cache=self.identify_cache,
+            on_event=self._on_engine_event, cancel_event=self.cancel_event,
+            resume=self.resume_batches.get(), continue_on_error=self.continue_on_error.get(),
+            retries=self.retries.get(),
+            device_limits=self.device_limits if self.limit_per_device.get() else None,
+            autotune=self.autotune_threads.get(), autotune_start=self.autotune_level,
+            order="size" if self.largest_first.get() else "name", job_rate=self.merge_job_rate,
+            pairing=self.pairing_options(), pairs=self.current_pairs, verify=self.verify_outputs.get(),
+            staging={"folder": self.scratch_folder.get().strip(),
+                     "budget_bytes": int(self.scratch_budget_gb.get() * 1e9)}
+        )
+
+    def _post(self, callback):
+        # One-off hand-over to the Tk thread; pending progress is applied first so it cannot land afterwards
+        def _run():
+            self._apply_ui_state()
+            callback()
+        self.root.after(0, _run)
+
+    def _on_engine_event(self, event):
+        # Called from worker threads: only record the state here, _poll_ui redraws it on its own tick
+        self.metrics(event)
+        self.ui_events(event)
+
+    def _poll_ui(self):
+        self._apply_ui_state()
+        self.root.after(UI_POLL_MS, self._poll_ui)
+
+    def _apply_ui_state(self):
+        changes = self.ui_events.drain()
+        if changes is None:
+            return
+        with tracing.span("ui_update"):
+            if "analyze" in changes:
+                self._update_analyze_progress(*changes["analyze"])
+            if "export" in changes and self.merge_progressbar:
+                self.merge_progressbar.config(value=changes["export"])
+            if "jobs" in changes:
+                self._sync_job_rows(changes["jobs"])
+            if "merge" in changes:
+                self._update_merge_progress(*changes["merge"])
+            if "overall" in changes and self.merge_eta_label:
+                self._update_overall_progress(changes["overall"])
+            if "tuning" in changes:
+                self._update_tuning_label(*changes["tuning"])
+            if "space" in changes and self.merge_progress_label:
+                filename, needed, available = changes["space"]
+                self.merge_progress_label.config(text=f"Waiting for space on the output volume: {filename} needs "
+                                                      f"{needed / 1e9:.1f} GB, {available / 1e9:.1f} GB available")
+
+    def _analyze_durations_worker(self, matching_files):
+        engine = self.create_engine()
+        mismatched_files = engine.analyze_durations(matching_files)
+        clusters = engine.layout_clusters
+        self._post(lambda: self._on_analysis_complete(mismatched_files, matching_files, clusters))
+
+    def _update_analyze_progress(self, current, filename, total):
+        try:
+            if self.merge_progressbar:
+                self.merge_progressbar["value"] = current
+            if self.merge_progress_label:
+                self.merge_progress_label.config(text=f"Analyzing duration: {filename} ({current}/{total})")
+        except Exception:
+            pass
+
+    def _format_ns(self, ns):
+        ms = ns // 1000000
+        seconds = ms // 1000
+        ms_rem = ms % 1000
+        minutes = seconds // 60
+        seconds_rem = seconds % 60
+        hours = minutes // 60
+        minutes_rem = minutes % 60
+        return f"{hours:02d}:{minutes_rem:02d}:{seconds_rem:02d}.{ms_rem:03d}"
+
+    def _show_mismatch_dialog(self, mismatched_files):
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Mismatched Durations")
+        dialog.geometry("750x400")
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        choice_var = tk.StringVar(value="cancel")
+
+        def set_choice(c):
+            choice_var.set(c)
+            dialog.destroy()
+
+        dialog.protocol("WM_DELETE_WINDOW", lambda: set_choice("cancel"))
+
+        lbl = ttk.Label(dialog, text="The following files have mismatched durations (> 100ms difference):", font=("TkDefaultFont", 10, "bold"))
+        lbl.pack(pady=10, padx=10, anchor="w")
+
+        rows = [{"file": fname, "duration1": d1, "duration2": d2, "diff": abs(d1 - d2)}
+                for fname, d1, d2 in mismatched_files]
+        table = VirtualTable(dialog, ResultTable(rows), [
+            ("file", "Filename", 350, "w", None),
+            ("duration1", "File 1 Duration", 120, "center", self._format_ns),
+            ("duration2", "File 2 Duration", 120, "center", self._format_ns),
+            ("diff", "Difference", 120, "center", self._format_ns),
+        ])
+        table.frame.pack(fill="both", expand=True, padx=10, pady=5)
+
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(fill="x", pady=15, padx=10)
+
+        ttk.Button(btn_frame, text="Continue merging ALL", command=lambda: set_choice("all")).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="EXCLUDE mismatched files", command=lambda: set_choice("exclude")).pack(side="left", padx=5)
+        ttk.Button(btn_frame, text="Cancel", command=lambda: set_choice("cancel")).pack(side="right", padx=5)
+
+        self.root.wait_window(dialog)
+        return choice_var.get()
+
+    def _show_results_window(self, rows):
+        window = tk.Toplevel(self.root)
+        window.title("Batch Results")
+        window.geometry("900x500")
+        window.transient(self.root)
+
+        def size(value):
+            return f"{value / 1e6:,.0f} MB"
+
+        table = VirtualTable(window, ResultTable(rows), [
+            ("file", "Filename", 320, "w", None),
+            ("status", "Status", 80, "center", None),
+            ("input_size", "Input", 90, "e", size),
+            ("output_size", "Output", 90, "e", size),
+            ("seconds", "Time", 70, "e", format_eta),
+            ("error", "Error", 220, "w", None),
+        ], height=20)
+        table.frame.pack(fill="both", expand=True, padx=10, pady=10)
+        ttk.Button(window, text="Close", command=window.destroy).pack(pady=(0, 10))
+
+    def _on_analysis_complete(self, mismatched_files, matching_files, clusters=None):
+        if self.progress_window and tk.Toplevel.winfo_exists(self.progress_window):
+            try:
+                self.progress_window.destroy()
+            except Exception:
+                pass
+            
+        if mismatched_files:
+            choice = self._show_mismatch_dialog(mismatched_files)
+            
+            if choice == "cancel":
+                return
+            elif choice == "exclude":
+                mismatched_names = {item[0] for item in mismatched_files}
+                matching_files = [f for f in matching_files if f not in mismatched_names]
+                if not matching_files:
+                    messagebox.showinfo("Information", "No files left to process after exclusion.")
+                    return
+                
+        self._current_matching_files = matching_files
+        remaining = set(matching_files)
+        self.layout_clusters = []
+        for cluster in clusters or []:
+            files = [f for f in cluster["files"] if f in remaining]
+            if files:
+                self.layout_clusters.append(dict(cluster, files=files, sample=files[0]))
+        self._continue_setup_track_selection()
+
+    def _load_sample(self, sample_filename):
+        path1, path2 = self.current_pairs.get(sample_filename) or (
+            os.path.join(self.folder1_path.get(), sample_filename), os.path.join(self.folder2_path.get(), sample_filename))
+        json1 = self.parse_mkvmerge_json(path1)
+        json2 = self.parse_mkvmerge_json(path2)
+        if not json1 or not json2:
+            bad = path1 if not json1 else path2
+            messagebox.showerror("Error Analyzing File", f"Could not analyze files.\n\nmkvmerge could not identify: {bad}")
+            print(f"[ERROR] Could not analyze files")
+            return None
+        return path1, path2, json1, json2
+
+    def _continue_setup_track_selection(self):
+        matching_files = self._current_matching_files
+        # One track selection per stream layout found by the analysis; the largest group comes first
+        clusters = self.layout_clusters or [{"fingerprint": None, "files": matching_files, "sample": matching_files[0]}]
+        samples = []
+        for cluster in clusters:
+            sample = self._load_sample(cluster["sample"])
+            if sample is None:
+                return
+            samples.append(sample)
+        sample_filename = clusters[0]["sample"]
+        path1, path2, self.file_jsons[1], self.file_jsons[2] = samples[0]
+
+        self.sample_paths[1] = path1
+        self.sample_paths[2] = path2
+
+        has_chapters1 = bool(self.file_jsons[1] and self.file_jsons[1].get("chapters"))
+        has_chapters2 = bool(self.file_jsons[2] and self.file_jsons[2].get("chapters"))
+
+        # tags detection - mkvmerge may store tags under 'tags' or 'global_tags'
+        has_tags1 = bool(self.file_jsons[1] and (self.file_jsons[1].get("tags") or self.file_jsons[1].get("global_tags")))
+        has_tags2 = bool(self.file_jsons[2] and (self.file_jsons[2].get("tags") or self.file_jsons[2].get("global_tags")))
+
+        has_attachments1 = bool(self.file_jsons[1] and self.file_jsons[1].get("attachments"))
+        has_attachments2 = bool(self.file_jsons[2] and self.file_jsons[2].get("attachments"))
+
+        self.track_window = tk.Toplevel(self.root)
+        self.track_window.title("Track Selection and Customization")
+
+        folder1_name = os.path.basename(os.path.normpath(self.folder1_path.get()))
+        folder2_name = os.path.basename(os.path.normpath(self.folder2_path.get()))
+        self.track_selections = {}
+        self.layout_selections = {}
+        if len(clusters) == 1:
+            self.create_track_widgets(self.track_window, f"File 1: {sample_filename} (from '{folder1_name}')",
+                                      tracks_from_identify(self.file_jsons[1]), 1)
+            self.create_track_widgets(self.track_window, f"File 2: {sample_filename} (from '{folder2_name}')",
+                                      tracks_from_identify(self.file_jsons[2]), 2)
+        else:
+            ttk.Label(self.track_window, text=f"These files use {len(clusters)} different track layouts. "
+                                              "Choose the tracks for each layout:").pack(padx=10, pady=(10, 0), anchor="w")
+            notebook = ttk.Notebook(self.track_window)
+            notebook.pack(padx=10, pady=5, fill="both", expand=True)
+            for i, (cluster, (_, _, json1, json2)) in enumerate(zip(clusters, samples)):
+                tab = ttk.Frame(notebook)
+                notebook.add(tab, text=f"Layout {i + 1} ({len(cluster['files'])} files)")
+                selections = self.track_selections if i == 0 else {}
+                self.layout_selections[cluster["fingerprint"]] = {
+                    "selections": selections, "sample": cluster["sample"], "files": len(cluster["files"])}
+                self.create_track_widgets(tab, f"File 1: {cluster['sample']} (from '{folder1_name}')",
+                                          tracks_from_identify(json1), 1, selections)
+                self.create_track_widgets(tab, f"File 2: {cluster['sample']} (from '{folder2_name}')",
+                                          tracks_from_identify(json2), 2, selections)
+
+        self.create_global_properties_widgets(self.track_window, container_title(self.file_jsons[1]), sample_filename,
+                                             has_chapters1=has_chapters1, has_chapters2=has_chapters2,
+                                             has_tags1=has_tags1, has_tags2=has_tags2,
+                                             has_attachments1=has_attachments1, has_attachments2=has_attachments2)
+
+        button_frame = ttk.Frame(self.track_window)
+        button_frame.pack(pady=10, fill="x")
+        ttk.Button(button_frame, text="Save Preset", command=self.save_preset).pack(side="left", padx=10)
+        ttk.Button(button_frame, text="Load Preset", command=self.load_preset).pack(side="left", padx=5)
+
+        self.start_merge_button = ttk.Button(button_frame, text="Start Merging", command=self.start_merging)
+        self.start_merge_button.pack(side="right", padx=10)
+
+        self.export_script_button = ttk.Button(button_frame, text="Export Batch Script", command=self.export_batch_script)
+        self.export_script_button.pack(side="right", padx=5)
+        ttk.Button(button_frame, text="Export Job Folder", command=self.export_job_folder).pack(side="right", padx=5)
+
+        ttk.Button(button_frame, text="Preview Order", command=self.preview_merge_order).pack(side="right", padx=5)
+
+    def create_global_properties_widgets(self, parent, sample_title, filename,
+                                         has_chapters1=False, has_chapters2=False,
+                                         has_tags1=False, has_tags2=False,
+                                         has_attachments1=False, has_attachments2=False):
+        frame = ttk.LabelFrame(parent, text="Global Properties")
+        frame.pack(padx=10, pady=5, fill="x", expand=True)
+
+        ttk.Label(frame, text="Metadata Title:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        default_title = sample_title or os.path.splitext(filename)[0]
+        self.metadata_title.set(default_title)
+        ttk.Entry(frame, textvariable=self.metadata_title, width=50).grid(row=0, column=1, columnspan=3, padx=5, pady=5, sticky="we")
+
+        chapter_frame = ttk.Frame(frame)
+        chapter_frame.grid(row=1, column=0, columnspan=4, padx=5, pady=(2,4), sticky="w")
+
+        row1 = ttk.Frame(chapter_frame)
+        row1.pack(anchor="w", pady=2, fill="x")
+        cb1 = ttk.Checkbutton(row1, text="Include chapters from File 1", variable=self.include_chapters_file1)
+        cb1.pack(side="left")
+        if not has_chapters1:
+            cb1.state(["disabled"])
+            ttk.Label(row1, text="(No chapters found or mkvmerge unavailable for File 1)", foreground="gray").pack(side="left", padx=8)
+
+        row2 = ttk.Frame(chapter_frame)
+        row2.pack(anchor="w", pady=2, fill="x")
+        cb2 = ttk.Checkbutton(row2, text="Include chapters from File 2", variable=self.include_chapters_file2)
+        cb2.pack(side="left")
+        if not has_chapters2:
+            cb2.state(["disabled"])
+            ttk.Label(row2, text="(No chapters found or mkvmerge unavailable for File 2)", foreground="gray").pack(side="left", padx=8)
+
+        tags_frame = ttk.Frame(frame)
+        tags_frame.grid(row=2, column=0, columnspan=4, padx=5, pady=(2,4), sticky="w")
+
+        tags_row1 = ttk.Frame(tags_frame)
+        tags_row1.pack(anchor="w", pady=2, fill="x")
+        tcb1 = ttk.Checkbutton(tags_row1, text="Include global tags from File 1", variable=self.include_global_tags_file1)
+        tcb1.pack(side="left")
+        view_tags_btn1 = ttk.Button(tags_row1, text="View tags", command=lambda idx=1: self.show_global_tags_window(idx))
+        view_tags_btn1.pack(side="left", padx=8)
+        if not has_tags1:
+            tcb1.state(["disabled"])
+            view_tags_btn1.state(["disabled"])
+            ttk.Label(tags_row1, text="(No global tags found or mkvmerge unavailable for File 1)", foreground="gray").pack(side="left", padx=8)
+
+        tags_row2 = ttk.Frame(tags_frame)
+        tags_row2.pack(anchor="w", pady=2, fill="x")
+        tcb2 = ttk.Checkbutton(tags_row2, text="Include global tags from File 2", variable=self.include_global_tags_file2)
+        tcb2.pack(side="left")
+        view_tags_btn2 = ttk.Button(tags_row2, text="View tags", command=lambda idx=2: self.show_global_tags_window(idx))
+        view_tags_btn2.pack(side="left", padx=8)
+        if not has_tags2:
+            tcb2.state(["disabled"])
+            view_tags_btn2.state(["disabled"])
+            ttk.Label(tags_row2, text="(No global tags found or mkvmerge unavailable for File 2)", foreground="gray").pack(side="left", padx=8)
+
+        attach_frame = ttk.Frame(frame)
+        attach_frame.grid(row=3, column=0, columnspan=4, padx=5, pady=(2,8), sticky="w")
+
+        attach_row1 = ttk.Frame(attach_frame)
+        attach_row1.pack(anchor="w", pady=2, fill="x")
+        acb1 = ttk.Checkbutton(attach_row1, text="Include attachments from File 1", variable=self.include_attachments_file1)
+        acb1.pack(side="left")
+        view_attach_btn1 = ttk.Button(attach_row1, text="View attachments...", command=lambda idx=1: self.show_attachments_window(idx))
+        view_attach_btn1.pack(side="left", padx=8)
+        if not has_attachments1:
+            acb1.state(["disabled"])
+            view_attach_btn1.state(["disabled"])
+            ttk.Label(attach_row1, text="(No attachments found or mkvmerge unavailable for File 1)", foreground="gray").pack(side="left", padx=8)
+
+        attach_row2 = ttk.Frame(attach_frame)
+        attach_row2.pack(anchor="w", pady=2, fill="x")
+        acb2 = ttk.Checkbutton(attach_row2, text="Include attachments from File 2", variable=self.include_attachments_file2)
+        acb2.pack(side="left")
+        view_attach_btn2 = ttk.Button(attach_row2, text="View attachments...", command=lambda idx=2: self.show_attachments_window(idx))
+        view_attach_btn2.pack(side="left", padx=8)
+        if not has_attachments2:
+            acb2.state(["disabled"])
+            view_attach_btn2.state(["disabled"])
+            ttk.Label(attach_row2, text="(No attachments found or mkvmerge unavailable for File 2)", foreground="gray").pack(side="left", padx=8)
+
+    def parse_mkvmerge_json(self, filepath):
+        with tracing.span("parse_mkvmerge_json", file=os.path.basename(filepath)):
+            return self._parse_mkvmerge_json(filepath)
+
+    def _parse_mkvmerge_json(self, filepath):
+        # Matroska headers are read directly; mkvmerge only handles what the header reader can't
+        try:
+            return read_header(filepath)
+        except (UnsupportedFile, OSError) as e:
+            print(f"[INFO] Using mkvmerge for {os.path.basename(filepath)}: {e}")
+
+        mkvmerge_path = mkvmerge_executable(self.mkvtoolnix_path.get())
+
+        if not os.path.exists(mkvmerge_path):
+            print(f"[INFO] mkvmerge not found at: {mkvmerge_path}. JSON parsing disabled for {filepath}")
+            return None
+
+        try:
+            data = self.identify_cache.identify(mkvmerge_path, filepath)
+            if not data:
+                print(f"[INFO] mkvmerge returned no output for file: {filepath}")
+                return None
+            return data
+        except subprocess.CalledProcessError as cpe:
+            print(f"[ERROR] mkvmerge identified error for file {filepath}: returncode={cpe.returncode}")
+            if cpe.stderr:
+                print(cpe.stderr)
+            traceback.print_exc()
+            return None
+        except Exception as e:
+            print(f"[ERROR] Exception while parsing mkvmerge JSON for {filepath}: {e}")
+            traceback.print_exc()
+            return None
+
+    def show_attachments_window(self, file_index):
+        data = self.file_jsons.get(file_index)
+        if not data:
+            messagebox.showinfo("No data", "No mkvmerge JSON info is available for this file.")
+            return
+        attachments = data.get("attachments") or []
+        if not attachments:
+            messagebox.showinfo("No attachments", "No attachments found for this file.")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Attachments - File {file_index}")
+        win.geometry("700x300")
+
+        cols = ("id", "file_name", "mime_type", "size", "description")
+        tree = ttk.Treeview(win, columns=cols, show="headings")
+        for c in cols:
+            tree.heading(c, text=c.replace("_", " ").title())
+            tree.column(c, width=120, anchor="w")
+        tree.pack(fill="both", expand=True, padx=8, pady=8)
+
+        for a in attachments:
+            aid = a.get("id") or a.get("attachment_id") or ""
+            fname = a.get("file_name") or a.get("name") or ""
+            mtype = a.get("mime_type") or a.get("content_type") or ""
+            size = a.get("size") or ""
+            desc = a.get("description") or ""
+            tree.insert("", "end", values=(str(aid), str(fname), str(mtype), str(size), str(desc)))
+
+        def on_double_click(event):
+            sel = tree.selection()
+            if not sel: return
+            item = tree.item(sel[0])
+            values = item.get("values", [])
+            file_name = values[1] if len(values) > 1 else None
+            if not file_name:
+                messagebox.showinfo("Info", "No filename available for this attachment.")
+                return
+            path = self.sample_paths.get(file_index)
+            if not path:
+                messagebox.showerror("Error", "Original file path not available.")
+                return
+            save_to = filedialog.asksaveasfilename(initialfile=file_name)
+            if not save_to:
+                return
+            mkvextract_exe = "mkvextract.exe" if sys.platform == "win32" else "mkvextract"
+            mkvextract_path = os.path.join(self.mkvtoolnix_path.get(), mkvextract_exe)
+            if os.path.exists(mkvextract_path):
+                try:
+                    aid = values[0]
+                    subprocess.run([mkvextract_path, "attachments", "extract", path, f"{aid}:{save_to}"], check=True)
+                    messagebox.showinfo("Success", f"Attachment saved to:\n{save_to}")
+                except subprocess.CalledProcessError as e:
+                    messagebox.showerror("Error", f"mkvextract failed: {e}")
+                except Exception as e:
+                    messagebox.showerror("Error", f"Could not extract attachment: {e}")
+            else:
+                messagebox.showinfo("mkvextract not found",
+                    "mkvextract not found in MKVToolNix path.\n"
+                    "Install / point to mkvextract or extract attachments using your usual tool.")
+
+        tree.bind("<Double-1>", on_double_click)
+
+        ttk.Label(win, text="Double-click an attachment to try extracting it (requires mkvextract).").pack(padx=8, pady=(0,8), anchor="w")
+
+    def show_global_tags_window(self, file_index):
+        data = self.file_jsons.get(file_index)
+        if not data:
+            messagebox.showinfo("No data", "No mkvmerge JSON info is available for this file.")
+            return
+        tags = data.get("tags") or data.get("global_tags") or {}
+        if not tags:
+            messagebox.showinfo("No global tags", "No global tags found for this file.")
+            return
+
+        win = tk.Toplevel(self.root)
+        win.title(f"Global tags - File {file_index}")
+        win.geometry("700x420")
+
+        text = tk.Text(win, wrap="none")
+        text.pack(fill="both", expand=True, padx=6, pady=6)
+
+        try:
+            pretty = json.dumps(tags, indent=2, ensure_ascii=False)
+        except Exception:
+            pretty = str(tags)
+        text.insert("1.0", pretty)
+        text.config(state="disabled")
+
+        vscroll = ttk.Scrollbar(win, orient="vertical", command=text.yview)
+        hscroll = ttk.Scrollbar(win, orient="horizontal", command=text.xview)
+        text.configure(yscrollcommand=vscroll.set, xscrollcommand=hscroll.set)
+        vscroll.pack(side="right", fill="y")
+        hscroll.pack(side="bottom", fill="x")
+
+    def create_track_widgets(self, parent, title, tracks, file_index, selections=None):
+        frame = ttk.LabelFrame(parent, text=title)
+        frame.pack(padx=10, pady=10, fill="x", expand=True)
+        selections = self.track_selections if selections is None else selections
+        selections[file_index] = []
+
+        headers = ["Include", "ID", "Type", "Codec", "Language", "Name", "Default", "Forced"]
+        for i, header in enumerate(headers):
+            ttk.Label(frame, text=header, font=("TkDefaultFont", 9, "bold")).grid(row=0, column=i, padx=5, sticky="w")
+
+        for i, track in enumerate(tracks):
+            include_var = tk.BooleanVar(value=True)
+            lang_var = tk.StringVar(value=track.language or "und")
+            name_var = tk.StringVar(value=track.track_name or "")
+            default_var = tk.BooleanVar(value=track.default_track)
+            forced_var = tk.BooleanVar(value=track.forced_track)
+            selections[file_index].append({
+                "track_obj": track, "include": include_var, "language": lang_var,
+                "name": name_var, "default": default_var, "forced": forced_var
+            })
+            row = i + 1
+            ttk.Checkbutton(frame, variable=include_var).grid(row=row, column=0)
+            ttk.Label(frame, text=str(track.track_id)).grid(row=row, column=1, sticky="w")
+            ttk.Label(frame, text=track.track_type.capitalize()).grid(row=row, column=2, sticky="w")
+            codec_str = getattr(track, 'track_codec', 'N/A')
+            ttk.Label(frame, text=codec_str).grid(row=row, column=3, sticky="w")
+            ttk.Entry(frame, textvariable=lang_var, width=6).grid(row=row, column=4, sticky="w")
+            ttk.Entry(frame, textvariable=name_var, width=28).grid(row=row, column=5, sticky="w")
+            ttk.Checkbutton(frame, variable=default_var).grid(row=row, column=6)
+            ttk.Checkbutton(frame, variable=forced_var).grid(row=row, column=7)
+
+    def show_progress_window(self, maximum):
+        # Leftovers of the previous batch must not be drawn into the new window
+        self.ui_events.clear()
+        if self.progress_window and tk.Toplevel.winfo_exists(self.progress_window):
+            try:
+                self.progress_window.destroy()
+            except Exception:
+                pass
+
+        self.progress_window = tk.Toplevel(self.root)
+        self.progress_window.title("Merging Progress")
+        self.progress_window.geometry("450x160")
+        self.progress_window.resizable(False, False)
+        self.progress_window.transient(self.root)
+        self.progress_window.protocol("WM_DELETE_WINDOW", lambda: None)
+
+        container = ttk.Frame(self.progress_window, padding=12)
+        container.pack(fill="both", expand=True)
+
+        ttk.Label(container, text="Batch merge in progress...", font=(None, 11, 'bold')).pack(anchor="w")
+
+        self.merge_progressbar = ttk.Progressbar(container, orient="horizontal", length=380, mode="determinate")
+        self.merge_progressbar.pack(pady=(12, 6))
+        self.merge_progressbar["maximum"] = maximum
+        self.merge_progress_label = ttk.Label(container, text="Preparing...")
+        self.merge_progress_label.pack()
+        self.merge_eta_label = ttk.Label(container, text="")
+        self.merge_eta_label.pack()
+        self.merge_tuning_label = ttk.Label(container, text="", foreground="gray", wraplength=420)
+        self.merge_tuning_label.pack()
+        self.merge_jobs_frame = ttk.Frame(container)
+        self.merge_jobs_frame.pack(fill="x", pady=(6, 0))
+        self.merge_job_rows = {}
+
+        self.cancel_button = ttk.Button(container, text="Cancel", command=self.cancel_merge)
+        self.cancel_button.pack(pady=(12, 0))
+
+        self.accept_button = None
+        self.progress_window.lift()
+        self.root.update_idletasks()
+
+    def cancel_merge(self):
+        self.cancel_event.set()
+        if hasattr(self, 'cancel_button') and self.cancel_button:
+            self.cancel_button.state(["disabled"])
+            self.cancel_button.config(text="Cancelling...")
+
+    def finish_progress_window(self, final_text, success=True, results=None):
+        tracer = tracing.active()
+        if tracer is not None and os.environ.get(tracing.TRACE_ENV):
+            # Rewritten after every batch, so the file always covers the whole session so far
+            try:
+                tracer.write(os.environ[tracing.TRACE_ENV])
+                print(f"[INFO] Trace written to {os.environ[tracing.TRACE_ENV]}\n{tracer.format_summary()}")
+            except OSError as e:
+                print(f"[ERROR] Could not write trace: {e}")
+
+        def _finish():
+            if not (self.progress_window and tk.Toplevel.winfo_exists(self.progress_window)):
+                return
+            self.progress_window.protocol("WM_DELETE_WINDOW", self.progress_window.destroy)
+            self.merge_progress_label.config(text=final_text, wraplength=420, justify="left")
+
+            cb = getattr(self, 'cancel_button', None)
+            if cb is not None and cb.winfo_exists():
+                cb.pack_forget()
+            for row in self.merge_job_rows.values():
+                row.destroy()
+            self.merge_job_rows = {}
+            if self.merge_eta_label:
+                self.merge_eta_label.config(text="")
+
+            if not self.accept_button:
+                try:
+                    geom = self.progress_window.geometry().split('+')[0]
+                    w, h = geom.split('x')
+                    # Batch summaries can span several lines
+                    lines = final_text.count("\n") + 1
+                    new_h = max(int(h), 200 + 18 * (lines - 1))
+                    self.progress_window.geometry(f"{w}x{new_h}")
+                except Exception:
+                    self.progress_window.geometry("450x200")
+
+                button_frame = ttk.Frame(self.progress_window)
+                button_frame.pack(side="bottom", pady=14)
+
+                self.accept_button = ttk.Button(button_frame, text="Accept", command=self.progress_window.destroy, width=14)
+                self.accept_button.pack(side="left", padx=5, ipadx=8, ipady=6)
+
+                if results:
+                    ttk.Button(button_frame, text="Show Results", command=lambda: self._show_results_window(results),
+                               width=14).pack(side="left", padx=5, ipadx=8, ipady=6)
+                
+                if success and self.output_folder_path.get():
+                    import subprocess
+                    def open_folder():
+                        if sys.platform == 'win32':
+                            os.startfile(self.output_folder_path.get())
+                        elif sys.platform == 'darwin':
+                            subprocess.Popen(['open', self.output_folder_path.get()])
+                        else:
+                            subprocess.Popen(['xdg-open', self.output_folder_path.get()])
+                            
+                    open_folder_btn = ttk.Button(button_frame, text="Open Output Folder", command=open_folder, width=18)
+                    open_folder_btn.pack(side="left", padx=5, ipadx=8, ipady=6)
+
+                self.progress_window.update_idletasks()
+
+            if success and self.merge_progressbar:
+                try:
+                    self.merge_progressbar["value"] = self.merge_progressbar["maximum"]
+                except Exception:
+                    pass
+
+            if self.start_merge_button:
+                try:
+                    if getattr(self.start_merge_button, "winfo_exists", lambda: 0)():
+                        self.start_merge_button.state(["!disabled"])
+                except tk.TclError:
+                    pass
+
+        self._post(_finish)
+
+    def start_merging(self):
+        if self.start_merge_button:
+            try:
+                if getattr(self.start_merge_button, "winfo_exists", lambda: 0)():
+                    self.start_merge_button.state(["disabled"])
+            except tk.TclError:
+                pass
+
+        try:
+            if hasattr(self, 'track_window') and self.track_window and tk.Toplevel.winfo_exists(self.track_window):
+                self.track_window.destroy()
+        except Exception:
+            pass
+
+        matching_files = getattr(self, '_current_matching_files', None)
+        if not matching_files:
+            matching_files = self.find_matching_files()
+            
+        if not matching_files:
+            messagebox.showinfo("Information", "No matching files found.")
+            print(f"[ERROR] No matching files found")
+            if self.start_merge_button:
+                try:
+                    if getattr(self.start_merge_button, "winfo_exists", lambda: 0)():
+                        self.start_merge_button.state(["!disabled"])
+                except tk.TclError:
+                    pass
+            return
+
+        self.show_progress_window(len(matching_files))
+
+        self.merge_thread = threading.Thread(target=self._merge_worker, args=(matching_files,), daemon=True)
+        self.merge_thread.start()
+
+    def _merge_worker(self, matching_files, pipeline=None):
+        # Capture Tkinter variables in a thread-safe way, before starting pool
+        engine = self.create_engine(self.collect_preset())
+        result = engine.merge(matching_files, pipeline=self.pipeline_mode.get() if pipeline is None else pipeline)
+        tuning = result.get("concurrency")
+        if tuning and tuning["curve"]:
+            # Next batch starts climbing from the level that won this time
+            self.autotune_level = tuning["level"]
+            update_settings(autotune_level=tuning["level"], autotune_curve=tuning["curve"])
+        if result.get("job_rate"):
+            self.merge_job_rate = result["job_rate"]
+            update_settings(merge_job_rate=result["job_rate"])
+        rows = result["files"] + [{"file": e["file"], "status": "parked", "error": f"{e['reason']} mismatch"}
+                                  for e in result.get("parked") or []]
+        self.finish_progress_window(result["message"], success=result["success"], results=rows)
+        if result.get("parked") and not result["cancelled"] and not result["stopped_early"]:
+            parked = [(e["file"], e["duration1"], e["duration2"]) for e in result["parked"] if e["reason"] == "duration"]
+            if parked:
+                self._post(lambda: self._review_parked(parked))
+
+    def _review_parked(self, parked):
+        if self._show_mismatch_dialog(parked) != "all":
+            return
+        if self.progress_window and tk.Toplevel.winfo_exists(self.progress_window):
+            self.progress_window.destroy()
+        self.show_progress_window(len(parked))
+        files = [item[0] for item in parked]
+        self.merge_thread = threading.Thread(target=self._merge_worker, args=(files, False), daemon=True)
+        self.merge_thread.start()
+
+    def preview_merge_order(self):
+        matching_files = getattr(self, '_current_matching_files', None) or self.find_matching_files()
+        if not matching_files:
+            return
+        preset = self.collect_preset()
+        threading.Thread(target=self._plan_worker, args=(matching_files, preset), daemon=True).start()
+
+    def _plan_worker(self, matching_files, preset):
+        engine = self.create_engine(preset)
+        _, plan = engine.plan(matching_files, workers=self.autotune_level if self.autotune_threads.get() else None)
+        self._post(lambda: self._show_plan_window(plan))
+
+    def _show_plan_window(self, plan):
+        window = tk.Toplevel(self.root)
+        window.title("Merge Order")
+        window.geometry("600x400")
+        window.transient(self.root)
+
+        summary = (f"{len(plan['order'])} files, {plan['total_bytes'] / 1e9:.1f} GB on {plan['workers']} threads. "
+                   f"Busiest thread: {plan['makespan_bytes'] / 1e9:.1f} GB "
+                   f"(in name order: {plan['name_order_makespan_bytes'] / 1e9:.1f} GB)")
+        if plan["makespan_seconds"] is not None:
+            summary += f"\nPredicted duration from the last batch's speed: {format_eta(plan['makespan_seconds'])}"
+        ttk.Label(window, text=summary, wraplength=570, justify="left").pack(padx=10, pady=10, anchor="w")
+
+        frame = ttk.Frame(window)
+        frame.pack(fill="both", expand=True, padx=10, pady=(0, 10))
+        tree = ttk.Treeview(frame, columns=("pos", "file", "size"), show="headings")
+        tree.heading("pos", text="#")
+        tree.heading("file", text="Filename")
+        tree.heading("size", text="Estimated Size")
+        tree.column("pos", width=50, anchor="center")
+        tree.column("file", width=380, anchor="w")
+        tree.column("size", width=120, anchor="e")
+        vsb = ttk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+        for pos, (fname, cost) in enumerate(zip(plan["order"], plan["costs"]), start=1):
+            tree.insert("", "end", values=(pos, fname, f"{cost / 1e6:,.0f} MB"))
+
+        ttk.Button(window, text="Close", command=window.destroy).pack(pady=(0, 10))
+
+    def _update_tuning_label(self, level, curve):
+        try:
+            if self.merge_tuning_label:
+                points = ", ".join(f"{lvl}: {mbps:.0f}" for lvl, mbps in curve.items())
+                self.merge_tuning_label.config(text=f"Auto-tune: {level} concurrent jobs (MB/s by jobs - {points})")
+        except Exception:
+            pass
+
+    def _update_merge_progress(self, current, filename, total, overall=None):
+        try:
+            self._remove_job_row(filename)
+            if self.merge_progressbar:
+                self.merge_progressbar["value"] = current
+            if self.merge_progress_label:
+                self.merge_progress_label.config(text=f"Processed: {filename} ({current}/{total})")
+            if overall is not None:
+                self._update_overall_progress(overall)
+        except Exception:
+            pass
+
+    def _update_overall_progress(self, overall):
+        # The bar counts files, but its position follows the byte-weighted percentage
+        if self.merge_progressbar:
+            self.merge_progressbar["value"] = self.merge_progressbar["maximum"] * overall["percent"] / 100
+        if self.merge_eta_label:
+            self.merge_eta_label.config(
+                text=f"{overall['percent']:.1f}% of {overall['bytes_total'] / 1e9:.1f} GB - "
+                     f"{overall['rate'] / 1e6:.0f} MB/s - ETA {format_eta(overall['eta'])}")
+
+    def _resize_progress_window(self):
+        try:
+            w = self.progress_window.geometry().split('+')[0].split('x')[0]
+            self.progress_window.geometry(f"{w}x{180 + 22 * len(self.merge_job_rows)}")
+        except Exception:
+            pass
+
+    def _add_job_row(self, filename):
+        if not self.merge_jobs_frame or filename in self.merge_job_rows:
+            return
+        try:
+            row = ttk.Label(self.merge_jobs_frame, text=f"{filename}: starting...", foreground="gray")
+            row.pack(anchor="w")
+            self.merge_job_rows[filename] = row
+            self._resize_progress_window()
+        except tk.TclError:
+            pass
+
+    def _remove_job_row(self, filename):
+        row = self.merge_job_rows.pop(filename, None)
+        if row is not None:
+            row.destroy()
+            self._resize_progress_window()
+
+    def _update_job_row(self, event):
+        try:
+            row = self.merge_job_rows.get(event["file"])
+            if row is not None:
+                row.config(text=f"{event['file']}: {event['percent']}% - {event['rate'] / 1e6:.0f} MB/s - "
+                                f"ETA {format_eta(event['eta'])}")
+        except Exception:
+            pass
+
+    def _sync_job_rows(self, jobs):
+        for filename in [f for f in self.merge_job_rows if f not in jobs]:
+            self._remove_job_row(filename)
+        for filename, event in jobs.items():
+            self._add_job_row(filename)
+            if event is not None:
+                self._update_job_row(event)
+
+    def export_batch_script(self):
+        matching_files = getattr(self, '_current_matching_files', None)
+        if not matching_files:
+            matching_files = self.find_matching_files()
+            if not matching_files:
+                return
+            
+        script_path = filedialog.asksaveasfilename(defaultextension=".bat", filetypes=[("Batch script", "*.bat"), ("Shell script", "*.sh")])
+        if not script_path:
+            return
+        self._start_export(matching_files, script_path, job_folder=False)
+
+    def export_job_folder(self):
+        matching_files = getattr(self, '_current_matching_files', None)
+        if not matching_files:
+            matching_files = self.find_matching_files()
+            if not matching_files:
+                return
+
+        folder = filedialog.askdirectory(title="Folder for option files and run scripts")
+        if not folder:
+            return
+        self._start_export(matching_files, folder, job_folder=True)
+
+    def _start_export(self, matching_files, target, job_folder):
+        self.show_progress_window(len(matching_files))
+        if self.merge_progress_label:
+            self.merge_progress_label.config(text="Generating script...")
+        
+        if hasattr(self, 'cancel_button') and self.cancel_button:
+            self.cancel_button.destroy()
+
+        self.export_thread = threading.Thread(target=self._export_worker, args=(matching_files, target, job_folder),
+                                              daemon=True)
+        self.export_thread.start()
+
+    def _export_worker(self, matching_files, target, job_folder=False):
+        engine = self.create_engine(self.collect_preset())
+        if job_folder:
+            result = engine.export_job_folder(matching_files, target)
+        else:
+            result = engine.export_script(matching_files, target)
+        self.finish_progress_window(result["message"], success=result["success"])
+
+    def collect_preset(self):
+        preset_data = {
+            "global_properties": {
+                "title": self.metadata_title.get(),
+                "include_chapters_file1": self.include_chapters_file1.get(),
+                "include_chapters_file2": self.include_chapters_file2.get(),
+                "include_global_tags_file1": self.include_global_tags_file1.get(),
+                "include_global_tags_file2": self.include_global_tags_file2.get(),
+                "include_attachments_file1": self.include_attachments_file1.get(),
+                "include_attachments_file2": self.include_attachments_file2.get()
+            },
+            "tracks": self._selections_to_preset(self.track_selections)
+        }
+        if len(self.layout_selections) > 1:
+            # Keyed by layout fingerprint; "tracks" above stays the first layout's for older versions
+            preset_data["layouts"] = {
+                fingerprint: {"sample": entry["sample"], "files": entry["files"],
+                              "tracks": self._selections_to_preset(entry["selections"])}
+                for fingerprint, entry in self.layout_selections.items()
+            }
+        return preset_data
+
+    def _selections_to_preset(self, track_selections):
+        tracks = {}
+        for file_index, selections in track_selections.items():
+            tracks[file_index] = [{
+                "track_id": s["track_obj"].track_id, "include": s["include"].get(),
+                "language": s["language"].get(), "name": s["name"].get(),
+                "default": s["default"].get(), "forced": s["forced"].get()
+            } for s in selections]
+        return tracks
+
+    def _apply_track_settings(self, track_selections, track_data):
+        for file_index_str, tracks in track_data.items():
+            file_index = int(file_index_str)
+            for track_settings in tracks:
+                for ui_track in track_selections.get(file_index, []):
+                    if ui_track["track_obj"].track_id == track_settings["track_id"]:
+                        ui_track["include"].set(track_settings["include"])
+                        ui_track["language"].set(track_settings["language"])
+                        ui_track["name"].set(track_settings["name"])
+                        ui_track["default"].set(track_settings["default"])
+                        ui_track["forced"].set(track_settings["forced"])
+                        break
+
+    def save_preset(self):
+        preset_data = self.collect_preset()
+        filepath = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        if filepath:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                json.dump(preset_data, f, indent=4)
+            messagebox.showinfo("Success", "Preset saved successfully.")
+
+    def load_preset(self):
+        filepath = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
+        if filepath:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                preset_data = json.load(f)
+
+            global_props = preset_data.get("global_properties", {})
+            self.metadata_title.set(global_props.get("title", ""))
+            self.include_chapters_file1.set(global_props.get("include_chapters_file1", False))
+            self.include_chapters_file2.set(global_props.get("include_chapters_file2", False))
+            self.include_global_tags_file1.set(global_props.get("include_global_tags_file1", False))
+            self.include_global_tags_file2.set(global_props.get("include_global_tags_file2", False))
+            self.include_attachments_file1.set(global_props.get("include_attachments_file1", False))
+            self.include_attachments_file2.set(global_props.get("include_attachments_file2", False))
+
+            self._apply_track_settings(self.track_selections, preset_data.get("tracks", {}))
+            for fingerprint, layout in preset_data.get("layouts", {}).items():
+                if fingerprint in self.layout_selections:
+                    self._apply_track_settings(self.layout_selections[fingerprint]["selections"], layout.get("tracks", {}))
+            messagebox.showinfo("Success", "Preset loaded successfully.")
+
+def main():
+    if os.environ.get(tracing.TRACE_ENV):
+        tracing.enable()
+    root = tk.Tk()
+    Pymkv2MergerApp(root)
+    root.mainloop()
+    return 0
@@ -0,0 +1,102 @@
+import subprocess
+
+from batch_merger.commands import selected_tracks, track_settings_for
+from batch_merger.ebml import UnsupportedFile, read_header
+from batch_merger.identify import run_identify
+
+# mkvmerge's output runs to the end of its longest track, which can differ from the sources' by a few frames
+DURATION_TOLERANCE_NS = 500000000
+# Checks read a few header pages each, so a small pool keeps up with many muxes
+VERIFY_WORKERS = 2
+
+
+class VerificationError(RuntimeError):
+    pass
+
+
+def expected_output(sources, settings):
+    """What a mux of ``sources`` with ``settings`` should contain (same arguments as ``build_merge_command``).
+
+    Returns ``{"tracks": [...], "duration": ns, "shortest": ns}``; tracks are in mkvmerge's default output
+    order, File 1 before File 2 and by source track ID, as ``{"type", "languages", "name", "default",
+    "forced"}``. ``duration`` is the longest contributing source and ``shortest`` the shortest.
+    """
+    tracks = []
+    durations = []
+    for file_index, (_, info) in enumerate(sources, start=1):
+        chosen = selected_tracks(track_settings_for(settings, file_index), info)
+        if not chosen:
+            continue
+        duration = (info or {}).get("container", {}).get("properties", {}).get("duration")
+        if duration is not None:
+            durations.append(duration)
+        for selection, track in sorted(chosen, key=lambda pair: pair[1]["id"]):
+            props = track.get("properties", {})
+            if selection.get("language"):
+                languages = [selection["language"]]
+            else:
+                languages = [props[key] for key in ("language", "language_ietf") if props.get(key)] or ["und"]
+            tracks.append({"type": track.get("type"), "languages": [language.lower() for language in languages],
+                           "name": selection.get("name") or "", "default": bool(selection.get("default")),
+                           "forced": bool(selection.get("forced"))})
+    return {"tracks": tracks, "duration": max(durations) if durations else None,
+            "shortest": min(durations) if durations else None}
+
+
+def read_output(path, mkvmerge_path=None):
+    try:
+        return read_header(path)
+    except UnsupportedFile as e:
+        if mkvmerge_path is None:
+            raise VerificationError(f"unreadable headers ({e})")
+        # mkvmerge has the last word on anything the header reader does not understand
+        try:
+            data = run_identify(mkvmerge_path, path)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            data = None
+        if not data or not data.get("container", {}).get("recognized"):
+            raise VerificationError(f"unreadable headers ({e})")
+        return data
+
+
+def check_output(path, expected, mkvmerge_path=None, tolerance_ns=DURATION_TOLERANCE_NS):
+    """Problems found in a finished mux compared with ``expected_output``; an empty list means it matches."""
+    try:
+        info = read_output(path, mkvmerge_path)
+    except (OSError, VerificationError) as e:
+        return [str(e)]
+    problems = []
+    tracks = info.get("tracks", [])
+    if len(tracks) != len(expected["tracks"]):
+        problems.append(f"{len(tracks)} tracks, expected {len(expected['tracks'])}")
+    for number, (want, track) in enumerate(zip(expected["tracks"], tracks), start=1):
+        props = track.get("properties", {})
+        if track.get("type") != want["type"]:
+            problems.append(f"track {number} is {track.get('type')}, expected {want['type']}")
+            continue
+        languages = {(props.get(key) or "").lower() for key in ("language", "language_ietf")}
+        if not languages & set(want["languages"]):
+            problems.append(f"track {number} language {props.get('language_ietf') or props.get('language')}, "
+                            f"expected {want['languages'][0]}")
+        if (props.get("track_name") or "") != want["name"]:
+            problems.append(f"track {number} name {props.get('track_name') or ''!r}, expected {want['name']!r}")
+        for flag, key in (("default", "default_track"), ("forced", "forced_track")):
+            if bool(props.get(key)) != want[flag]:
+                problems.append(f"track {number} {flag} flag {'set' if props.get(key) else 'unset'}")
+    duration = info.get("container", {}).get("properties", {}).get("duration")
+    longest = expected["duration"]
+    if longest is not None:
+        shortest = expected.get("shortest")
+        if shortest is None or longest - shortest <= tolerance_ns:
+            shortest = longest
+        # With sources that disagree (a mismatch the user accepted) the output runs as long as whichever
+        # selected track is longest, so anything between the two is fine
+        if duration is None:
+            problems.append("no duration")
+        elif not shortest - tolerance_ns <= duration <= longest + tolerance_ns:
+            if shortest == longest:
+                problems.append(f"duration {duration / 1e9:.3f} s, sources {longest / 1e9:.3f} s")
+            else:
+                problems.append(f"duration {duration / 1e9:.3f} s, sources {shortest / 1e9:.3f} to "
+                                f"{longest / 1e9:.3f} s")
+    return problems
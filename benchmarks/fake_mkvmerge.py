@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Stand-in for mkvmerge used by the benchmarks; needs no real media or MKVToolNix.
+
+``-J`` prints identification JSON built from the file's Matroska headers. A mux sleeps for
+input bytes / ``FAKE_MKVMERGE_RATE_MB`` (MB/s, default 2000), printing ``--gui-mode`` progress,
+and writes an output of the same size whose headers hold the selected tracks with their
+language, name and flag options; it is sparse unless ``FAKE_MKVMERGE_REAL_WRITE=1``.
+``FAKE_MKVMERGE_FAIL`` is a regex; outputs matching it fail with exit status 2.
+``FAKE_MKVMERGE_SHORT`` is a regex; outputs matching it get half the duration, like a cut-short mux.
+"""
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from batch_merger.ebml import UnsupportedFile, read_header  # noqa: E402
+
+from fixtures import write_mkv  # noqa: E402
+
+VERSION = "mkvmerge v80.0 ('Roundabout') 64-bit (benchmark stand-in)"
+
+# The subset of mkvmerge's syntax the app writes
+VALUE_OPTIONS = {"-o", "--title", "--language", "--track-name", "--default-track-flag", "--forced-display-flag",
+                 "--video-tracks", "--audio-tracks", "--subtitle-tracks"}
+TRACK_TYPE_OPTIONS = {"video": ("--video-tracks", "--no-video"), "audio": ("--audio-tracks", "--no-audio"),
+                      "subtitles": ("--subtitle-tracks", "--no-subtitles")}
+
+
+def identify(path):
+    try:
+        data = read_header(path)
+    except (UnsupportedFile, OSError) as e:
+        print(json.dumps({"container": {"recognized": False, "supported": False}, "errors": [str(e)],
+                          "file_name": path}))
+        return 2
+    data["container"].update({"recognized": True, "supported": True, "type": "Matroska"})
+    data.update({"file_name": path, "identification_format_version": 17})
+    print(json.dumps(data))
+    return 0
+
+
+def parse_mux(args):
+    """(output, title, [(input, {option: [values]})]); file options apply to the input that follows them."""
+    output, title, inputs, options = None, "", [], {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in VALUE_OPTIONS:
+            value = args[i + 1]
+            i += 2
+            if arg == "-o":
+                output = value
+            elif arg == "--title":
+                title = value
+            else:
+                options.setdefault(arg, []).append(value)
+            continue
+        i += 1
+        if arg.startswith("-"):
+            options[arg] = []
+        else:
+            inputs.append((arg, options))
+            options = {}
+    return output, title, inputs
+
+
+def output_tracks(path, options):
+    def by_id(option):
+        return dict(value.split(":", 1) for value in options.get(option, []))
+
+    languages, names = by_id("--language"), by_id("--track-name")
+    defaults, forced = by_id("--default-track-flag"), by_id("--forced-display-flag")
+    tracks = []
+    for track in read_header(path)["tracks"]:
+        keep_option, drop_option = TRACK_TYPE_OPTIONS[track["type"]]
+        tid, props = str(track["id"]), track["properties"]
+        if drop_option in options or (keep_option in options and tid not in options[keep_option][0].split(",")):
+            continue
+        tracks.append({"type": track["type"], "codec": props["codec_id"],
+                       "language": languages.get(tid, props.get("language", "und")),
+                       "name": names.get(tid, props.get("track_name", "")),
+                       "default": defaults.get(tid, "1" if props.get("default_track") else "0") == "1",
+                       "forced": forced.get(tid, "1" if props.get("forced_track") else "0") == "1"})
+    return tracks
+
+
+def mux(args):
+    gui_mode = "--gui-mode" in args
+    output, title, inputs = parse_mux([arg for arg in args if arg != "--gui-mode"])
+    total = sum(os.path.getsize(path) for path, _ in inputs)
+
+    fail_pattern = os.environ.get("FAKE_MKVMERGE_FAIL")
+    if fail_pattern and re.search(fail_pattern, output):
+        print("#GUI#error Simulated failure" if gui_mode else "Error: Simulated failure")
+        return 2
+
+    tracks, durations = [], []
+    for path, options in inputs:
+        try:
+            tracks += output_tracks(path, options)
+            durations.append(read_header(path)["container"]["properties"]["duration"] / 1e9)
+        except (UnsupportedFile, OSError):
+            pass
+    duration = max(durations, default=0)
+    short_pattern = os.environ.get("FAKE_MKVMERGE_SHORT")
+    if short_pattern and re.search(short_pattern, output):
+        duration /= 2
+
+    seconds = total / (float(os.environ.get("FAKE_MKVMERGE_RATE_MB", "2000")) * 1024 * 1024)
+    real_write = os.environ.get("FAKE_MKVMERGE_REAL_WRITE") == "1"
+    chunk = b"\0" * (1024 * 1024)
+    payload_start = write_mkv(output, duration, total, title=title, tracks=tracks)
+    with open(output, "r+b") as f:
+        f.seek(payload_start)
+        for percent in range(0, 101, 10):
+            if percent:
+                time.sleep(seconds / 10)
+                if real_write:
+                    target = payload_start + (total - payload_start) * percent // 100
+                    while f.tell() < target:
+                        f.write(chunk[:target - f.tell()])
+            line = f"#GUI#progress {percent}%" if gui_mode else f"Progress: {percent}%"
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+    return 0
+
+
+def main(argv):
+    if argv and argv[0].startswith("@"):
+        with open(argv[0][1:], "r", encoding="utf-8") as f:
+            argv = json.load(f) + argv[1:]
+    if not argv or argv[0] == "--version":
+        print(VERSION)
+        return 0
+    if argv[0] == "-J":
+        return identify(argv[1])
+    return mux(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,176 @@
+"""Generates folder pairs of small but structurally complete Matroska files for the benchmarks.
+
+Each file has an EBML header, a SeekHead, Info, Tracks, Attachments, Chapters and statistics
+Tags in front of a single Cluster. The Cluster's payload is left as a sparse hole, so a fixture
+can report multi-gigabyte sizes while using a few kilobytes of disk.
+
+    python benchmarks/fixtures.py /tmp/bench --files 1000
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_merger import ebml  # noqa: E402
+
+FIXTURE_MARKER = "fixture.json"
+
+
+def _id_bytes(element_id):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+
+
+def _size_bytes(size, length=None):
+    length = length or next(n for n in range(1, 9) if size < (1 << (7 * n)) - 1)
+    return (size | (1 << (7 * length))).to_bytes(length, "big")
+
+
+def _element(element_id, payload):
+    return _id_bytes(element_id) + _size_bytes(len(payload)) + payload
+
+
+def _uint(element_id, value):
+    return _element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big"))
+
+
+def _string(element_id, value):
+    return _element(element_id, value.encode("utf-8"))
+
+
+def _float(element_id, value):
+    return _element(element_id, struct.pack(">d", value))
+
+
+def _track(number, track_type, codec_id, language, name, default, forced=0, extra=b""):
+    payload = (_uint(ebml.TRACK_NUMBER, number) + _uint(ebml.TRACK_UID, number * 1000 + 1)
+               + _uint(ebml.TRACK_TYPE, track_type) + _string(ebml.CODEC_ID, codec_id)
+               + _string(ebml.LANGUAGE, language) + _string(ebml.NAME, name)
+               + _uint(ebml.FLAG_DEFAULT, default) + _uint(ebml.FLAG_FORCED, forced))
+    return _element(ebml.TRACK_ENTRY, payload + extra)
+
+
+def _statistics_tag(track_uid, number_of_bytes):
+    return _element(ebml.TAG, _element(ebml.TARGETS, _uint(ebml.TAG_TRACK_UID, track_uid))
+                    + _element(ebml.SIMPLE_TAG, _string(ebml.TAG_NAME, "NUMBER_OF_BYTES")
+                               + _string(ebml.TAG_STRING, str(number_of_bytes))))
+
+
+TRACK_TYPE_CODES = {"video": 1, "audio": 2, "subtitles": 17}
+
+
+def write_mkv(path, duration_s, size, title="", extra_audio=False, tracks=None):
+    """Writes a Matroska file of ``size`` bytes (mostly a sparse Cluster) lasting ``duration_s``.
+
+    ``tracks`` replaces the default video, audio and subtitle tracks with
+    ``[{"type", "codec", "language", "name", "default", "forced"}]``. Returns where the Cluster's payload starts.
+    """
+    header = _element(ebml.EBML_HEADER, _uint(0x4286, 1) + _uint(0x42F7, 1) + _uint(ebml.EBML_MAX_ID_LENGTH, 4)
+                      + _uint(ebml.EBML_MAX_SIZE_LENGTH, 8) + _string(ebml.DOC_TYPE, "matroska")
+                      + _uint(0x4287, 4) + _uint(ebml.DOC_TYPE_READ_VERSION, 2))
+    info = _element(ebml.INFO, _uint(ebml.TIMESTAMP_SCALE, 1000000) + _float(ebml.DURATION, duration_s * 1000.0)
+                    + _string(ebml.TITLE, title))
+    if tracks is not None:
+        entries = [_track(number, TRACK_TYPE_CODES[t["type"]], t["codec"], t["language"], t["name"], int(t["default"]),
+                          forced=int(t["forced"])) for number, t in enumerate(tracks, start=1)]
+    else:
+        entries = [
+            _track(1, 1, "V_MPEG4/ISO/AVC", "und", "", 1,
+                   extra=_element(ebml.VIDEO, _uint(ebml.PIXEL_WIDTH, 1920) + _uint(ebml.PIXEL_HEIGHT, 1080))),
+            _track(2, 2, "A_AAC", "jpn", "Japanese", 1,
+                   extra=_element(ebml.AUDIO, _float(ebml.SAMPLING_FREQUENCY, 48000.0) + _uint(ebml.CHANNELS, 2))),
+            _track(3, 17, "S_TEXT/ASS", "eng", "Signs", 0, forced=1),
+        ]
+        if extra_audio:
+            entries.append(_track(4, 2, "A_FLAC", "eng", "Commentary", 0,
+                                  extra=_element(ebml.AUDIO, _float(ebml.SAMPLING_FREQUENCY, 48000.0)
+                                                 + _uint(ebml.CHANNELS, 2))))
+    tracks = _element(ebml.TRACKS, b"".join(entries))
+    attachments = _element(ebml.ATTACHMENTS, _element(ebml.ATTACHED_FILE, _string(ebml.FILE_NAME, "font.ttf")
+                                                      + _string(ebml.FILE_MIME_TYPE, "font/ttf")
+                                                      + _element(ebml.FILE_DATA, b"\0" * 2048)
+                                                      + _uint(ebml.FILE_UID, 7)))
+    chapters = _element(ebml.CHAPTERS, _element(ebml.EDITION_ENTRY, _element(ebml.CHAPTER_ATOM, _uint(0x73C4, 1))))
+    payload_bytes = max(0, size - 4096)
+    tags = _element(ebml.TAGS, _statistics_tag(1001, int(payload_bytes * 0.85))
+                    + _statistics_tag(2001, int(payload_bytes * 0.14)))
+
+    def seek_head(positions):
+        # Fixed 8-byte positions keep the SeekHead's size independent of the offsets it holds
+        return _element(ebml.SEEK_HEAD, b"".join(
+            _element(ebml.SEEK, _element(ebml.SEEK_ID, _id_bytes(element_id))
+                     + _element(ebml.SEEK_POSITION, position.to_bytes(8, "big")))
+            for element_id, position in positions))
+
+    level1 = [(ebml.INFO, info), (ebml.TRACKS, tracks), (ebml.ATTACHMENTS, attachments),
+              (ebml.CHAPTERS, chapters), (ebml.TAGS, tags)]
+    position = len(seek_head([(element_id, 0) for element_id, _ in level1]))
+    positions = []
+    for element_id, data in level1:
+        positions.append((element_id, position))
+        position += len(data)
+    body = seek_head(positions) + b"".join(data for _, data in level1)
+    cluster_header = _id_bytes(ebml.CLUSTER) + _size_bytes(payload_bytes, 8)
+    segment_size = len(body) + len(cluster_header) + payload_bytes
+
+    with open(path, "wb") as f:
+        f.write(header + _id_bytes(ebml.SEGMENT) + _size_bytes(segment_size, 8) + body + cluster_header)
+        payload_start = f.tell()
+        f.truncate(payload_start + payload_bytes)
+    return payload_start
+
+
+def generate(root, files, min_mb=50, max_mb=2000, mismatch_fraction=0.02, layout_fraction=0.0, seed=1):
+    """Writes ``root/A`` and ``root/B`` with ``files`` pairs; reuses an identical earlier fixture."""
+    params = {"files": files, "min_mb": min_mb, "max_mb": max_mb, "mismatch_fraction": mismatch_fraction,
+              "layout_fraction": layout_fraction, "seed": seed}
+    marker = os.path.join(root, FIXTURE_MARKER)
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == params:
+                return params
+    except (OSError, ValueError):
+        pass
+
+    rng = random.Random(seed)
+    width = len(str(files))
+    for side in ("A", "B"):
+        folder = os.path.join(root, side)
+        os.makedirs(folder, exist_ok=True)
+        for name in os.listdir(folder):
+            os.remove(os.path.join(folder, name))
+    for i in range(1, files + 1):
+        name = f"Show - S01E{i:0{width}d}.mkv"
+        duration = rng.uniform(20 * 60, 50 * 60)
+        # Log-uniform sizes: mostly episodes, with the occasional much larger special
+        size = int(min_mb * (max_mb / min_mb) ** rng.random() * 1024 * 1024)
+        mismatch = rng.random() < mismatch_fraction
+        extra_audio = rng.random() < layout_fraction
+        write_mkv(os.path.join(root, "A", name), duration, size, title=name)
+        write_mkv(os.path.join(root, "B", name), duration + (30 if mismatch else 0), size // 5, title=name,
+                  extra_audio=extra_audio)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    return params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate benchmark folder pairs of sparse Matroska files")
+    parser.add_argument("root", help="Folder to create A/ and B/ in")
+    parser.add_argument("--files", type=int, default=1000, help="Number of pairs (10 to 100000)")
+    parser.add_argument("--min-mb", type=float, default=50, help="Smallest apparent file size in folder A")
+    parser.add_argument("--max-mb", type=float, default=2000, help="Largest apparent file size in folder A")
+    parser.add_argument("--mismatch-fraction", type=float, default=0.02, help="Pairs whose durations differ")
+    parser.add_argument("--layout-fraction", type=float, default=0.0,
+                        help="Pairs whose folder B file has an extra audio track (a second layout)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+    print(json.dumps(generate(args.root, args.files, args.min_mb, args.max_mb, args.mismatch_fraction,
+                              args.layout_fraction, args.seed)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Times the batch stages against generated fixtures and the stand-in mkvmerge, and writes the results as JSON.
+
+    python benchmarks/run.py --files 1000 --output results-1000.json
+    python benchmarks/run.py --files 100000 --scenarios pairing,analyze
+
+Keep the JSON files of earlier versions and compare the ``median`` figures to spot regressions.
+Runs on any Linux box: fixtures are sparse files and no real MKVToolNix is needed.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from batch_merger.engine import BatchEngine  # noqa: E402
+from batch_merger.identify import IdentifyCache, tracks_from_identify  # noqa: E402
+
+from fixtures import generate  # noqa: E402
+
+PRESET = {
+    "global_properties": {"title": "", "include_chapters_file1": True, "include_attachments_file1": True},
+    "tracks": {
+        "1": [{"track_id": 0, "include": True, "language": "und", "name": "", "default": True, "forced": False}],
+        "2": [{"track_id": 1, "include": True, "language": "jpn", "name": "Japanese", "default": True,
+               "forced": False}],
+    },
+}
+
+
+def install_fake_mkvmerge(workdir):
+    """A folder with an ``mkvmerge`` that runs fake_mkvmerge.py with this interpreter."""
+    folder = os.path.join(workdir, "mkvtoolnix")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, "mkvmerge")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(BENCH_DIR, "fake_mkvmerge.py")}" "$@"\n')
+    os.chmod(path, 0o755)
+    return folder
+
+
+class Context:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.folder1 = os.path.join(workdir, "A")
+        self.folder2 = os.path.join(workdir, "B")
+        self.output = os.path.join(workdir, "out")
+        self.mkvtoolnix = install_fake_mkvmerge(workdir)
+        self.cache_path = os.path.join(workdir, "identify_cache.sqlite3")
+        self.cache = None
+        self.matching_files = None
+        self.pairs = None
+
+    def close_cache(self):
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def reset_cache(self, keep):
+        self.close_cache()
+        if not keep:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.cache_path + suffix)
+                except FileNotFoundError:
+                    pass
+        if self.args.cache != "none":
+            self.cache = IdentifyCache(self.cache_path)
+
+    def engine(self, **kwargs):
+        # Outputs are sparse, so the free-space check would only measure the benchmark machine's disk
+        return BatchEngine(self.mkvtoolnix, self.folder1, self.folder2, self.output, PRESET,
+                           max_workers=self.args.jobs, identify_cache=self.cache, resume=False, pairs=self.pairs,
+                           free_space_margin=None, **kwargs)
+
+    def files(self):
+        # Paired once, outside the timed region of every scenario but "pairing"
+        if self.matching_files is None:
+            engine = self.engine()
+            self.matching_files = engine.find_matching_files()
+            self.pairs = engine.pairs
+        return self.matching_files
+
+
+def scenario_pairing(ctx):
+    files = ctx.engine().find_matching_files()
+    return {"pairs": len(files)}
+
+
+def scenario_analyze(ctx):
+    engine = ctx.engine()
+    mismatched = engine.analyze_durations(ctx.files())
+    return {"pairs": len(ctx.files()), "mismatched": len(mismatched), "layouts": len(engine.layout_clusters)}
+
+
+def scenario_analyze_identify(ctx):
+    engine = ctx.engine(header_reader=False)
+    mismatched = engine.analyze_durations(ctx.files())
+    return {"pairs": len(ctx.files()), "mismatched": len(mismatched)}
+
+
+def scenario_track_setup(ctx):
+    # What the track selection window does before building widgets: identify one sample pair
+    engine = ctx.engine()
+    path1, path2, _ = engine.source_paths(ctx.files()[0])
+    tracks = tracks_from_identify(engine.identify(path1)) + tracks_from_identify(engine.identify(path2))
+    return {"pairs": 1, "tracks": len(tracks)}
+
+
+def scenario_export_script(ctx):
+    files = ctx.files()
+    result = ctx.engine().export_script(files, os.path.join(ctx.workdir, "export.sh"))
+    return {"pairs": len(files), "success": result["success"]}
+
+
+def scenario_export_job_folder(ctx):
+    files = ctx.files()
+    result = ctx.engine().export_job_folder(files, os.path.join(ctx.workdir, "jobs"))
+    return {"pairs": len(files), "success": result["success"]}
+
+
+def scenario_merge(ctx, verify=False):
+    files = ctx.files()[:ctx.args.merge_files]
+    shutil.rmtree(ctx.output, ignore_errors=True)
+    os.makedirs(ctx.output)
+    result = ctx.engine(continue_on_error=True, verify=verify).merge(files)
+    return {"pairs": len(files), "success": result["success"]}
+
+
+def scenario_merge_verify(ctx):
+    return scenario_merge(ctx, verify=True)
+
+
+SCENARIOS = {
+    "pairing": scenario_pairing,
+    "analyze": scenario_analyze,
+    "analyze_identify": scenario_analyze_identify,
+    "track_setup": scenario_track_setup,
+    "export_script": scenario_export_script,
+    "export_job_folder": scenario_export_job_folder,
+    "merge": scenario_merge,
+    "merge_verify": scenario_merge_verify,
+}
+
+
+def git_version():
+    try:
+        process = subprocess.run(["git", "describe", "--always", "--dirty"], cwd=REPO_DIR,
+                                 capture_output=True, text=True, check=True)
+        return process.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(ctx, name):
+    function = SCENARIOS[name]
+    warm = ctx.args.cache == "warm"
+    ctx.reset_cache(keep=False)
+    if warm:
+        function(ctx)
+    timings, details = [], None
+    for _ in range(ctx.args.repeat):
+        ctx.reset_cache(keep=warm)
+        started = time.perf_counter()
+        details = function(ctx)
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    pairs = details.get("pairs") or 0
+    return dict(details, seconds=[round(t, 4) for t in timings], median=round(median, 4),
+                min=round(min(timings), 4), per_pair_ms=round(1000 * median / pairs, 3) if pairs else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the batch stages with a stand-in mkvmerge")
+    parser.add_argument("--files", type=int, default=1000, help="Pairs in the generated fixture (10 to 100000)")
+    parser.add_argument("--layout-fraction", type=float, default=0.0, help="Pairs with a second track layout")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: "
+                        + ", ".join(SCENARIOS))
+    parser.add_argument("--jobs", type=int, default=4, help="max_workers passed to the engine")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per scenario")
+    parser.add_argument("--cache", choices=("cold", "warm", "none"), default="cold",
+                        help="Identification cache: emptied before each repetition, pre-filled, or disabled")
+    parser.add_argument("--merge-files", type=int, default=100, help="Pairs the merge scenario muxes")
+    parser.add_argument("--mux-rate-mb", type=float, default=2000, help="Simulated mkvmerge throughput (MB/s)")
+    parser.add_argument("--workdir", default=None,
+                        help="Where fixtures live; reused across runs with the same parameters (default: temp folder)")
+    parser.add_argument("--output", default=None, help="JSON results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    os.environ["FAKE_MKVMERGE_RATE_MB"] = str(args.mux_rate_mb)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="mkv_merger_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    started = time.perf_counter()
+    fixture = generate(workdir, args.files, layout_fraction=args.layout_fraction)
+    fixture_seconds = time.perf_counter() - started
+
+    ctx = Context(args, workdir)
+    results = {}
+    # The engine logs to stdout, which may carry the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        ctx.files()
+        for name in names:
+            print(f"[INFO] Running {name}...")
+            results[name] = run_scenario(ctx, name)
+            print(f"[INFO] {name}: median {results[name]['median']:.3f} s")
+    ctx.close_cache()
+
+    report = {
+        "version": git_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {"jobs": args.jobs, "repeat": args.repeat, "cache": args.cache,
+                       "merge_files": args.merge_files, "mux_rate_mb": args.mux_rate_mb},
+        "fixture": dict(fixture, seconds=round(fixture_seconds, 3)),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
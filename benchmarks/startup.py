@@ -0,0 +1,136 @@
+"""Times cold starts of the command-line and GUI entry points, each in a fresh interpreter.
+
+    python benchmarks/startup.py --repeat 20 --output startup.json
+
+Scripted runs (an export regenerated from cron, a queue-status poll) pay this on every call, so
+compare the ``median`` figures between versions like the results of run.py. ``gui_window`` builds
+the main window and needs a display; it is skipped without one. ``cli_export`` also runs the
+stand-in mkvmerge once per file, so it grows with ``--files``.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+APP = os.path.join(REPO_DIR, "pymkv_merger_app.py")
+
+sys.path.insert(0, REPO_DIR)
+
+from fixtures import generate  # noqa: E402
+from run import PRESET, git_version, install_fake_mkvmerge  # noqa: E402
+
+GUI_WINDOW = (
+    "import tkinter as tk\n"
+    "from batch_merger.ui import Pymkv2MergerApp\n"
+    "root = tk.Tk()\n"
+    "Pymkv2MergerApp(root)\n"
+    "root.update()\n"
+    "root.destroy()\n"
+)
+
+
+def scenarios(workdir):
+    mkvtoolnix = install_fake_mkvmerge(workdir)
+    preset = os.path.join(workdir, "preset.json")
+    with open(preset, "w", encoding="utf-8") as f:
+        json.dump(PRESET, f)
+    common = ["--mkvtoolnix", mkvtoolnix, "--folder1", os.path.join(workdir, "A"),
+              "--folder2", os.path.join(workdir, "B")]
+    return {
+        "python": [sys.executable, "-c", "pass"],
+        "cli_help": [sys.executable, APP, "--help"],
+        "cli_queue_status": [sys.executable, APP, "queue-status", "--queue", os.path.join(workdir, "no-queue")],
+        "cli_plan": [sys.executable, APP, "plan", *common, "--no-cache"],
+        "cli_export": [sys.executable, APP, "export", *common, "--out", os.path.join(workdir, "out"),
+                       "--preset", preset, "--script", os.path.join(workdir, "merge.sh"), "--no-cache"],
+        "gui_import": [sys.executable, "-c", "import batch_merger.ui"],
+        "gui_window": [sys.executable, "-c", GUI_WINDOW],
+    }
+
+
+def time_command(command, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        process = subprocess.run(command, cwd=REPO_DIR, capture_output=True, text=True)
+        timings.append(time.perf_counter() - started)
+        if process.returncode not in (0, 2):
+            return {"error": process.stderr.strip().splitlines()[-1:] or [f"exit status {process.returncode}"]}
+    return {"seconds": [round(t, 4) for t in timings], "median": round(statistics.median(timings), 4),
+            "min": round(min(timings), 4)}
+
+
+def slowest_imports(command, count):
+    """Top-level modules and their direct imports by cumulative time, from ``python -X importtime``."""
+    process = subprocess.run([command[0], "-X", "importtime", *command[1:]], cwd=REPO_DIR,
+                             capture_output=True, text=True)
+    rows = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Deeper modules are already counted in their parents
+        if not name[1:].startswith("    "):
+            rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "ms": round(us / 1000, 1)} for us, name in rows[:count]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark cold start of the CLI and GUI entry points")
+    parser.add_argument("--repeat", type=int, default=10, help="Interpreter starts per scenario")
+    parser.add_argument("--files", type=int, default=10, help="Pairs in the fixture cli_plan and cli_export run on")
+    parser.add_argument("--scenarios", default=None, help="Comma-separated subset (default: all)")
+    parser.add_argument("--imports", type=int, default=10, help="Slowest imports listed per scenario")
+    parser.add_argument("--output", default=None, help="JSON results file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="mkv_merger_startup_")
+    try:
+        generate(workdir, args.files)
+        commands = scenarios(workdir)
+        names = [n.strip() for n in args.scenarios.split(",")] if args.scenarios else list(commands)
+        unknown = [name for name in names if name not in commands]
+        if unknown:
+            parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+        results = {}
+        for name in names:
+            if name == "gui_window" and sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+                results[name] = {"skipped": "no display"}
+                continue
+            print(f"[INFO] Timing {name}...", file=sys.stderr)
+            results[name] = time_command(commands[name], args.repeat)
+            if "median" in results[name]:
+                if name != "python":
+                    results[name]["imports"] = slowest_imports(commands[name], args.imports)
+                print(f"[INFO] {name}: median {results[name]['median'] * 1000:.0f} ms", file=sys.stderr)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "version": git_version(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {"repeat": args.repeat, "files": args.files},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
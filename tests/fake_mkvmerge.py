@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""Stand-in for mkvmerge used by the tests; needs no real media or MKVToolNix.
+
+Test media are small but structurally complete Matroska files whose Cluster payload is a
+sparse hole, so a file can report any size while using a few kilobytes of disk. ``-J`` prints
+identification JSON built from the headers. A mux prints progress, then writes an output of
+the inputs' combined size holding the selected tracks with their language, name and flag
+options. ``@file.json`` arguments are read as JSON arrays of arguments. ``FAKE_MKVMERGE_FAIL``
+is a regex; outputs matching it are left half written and the mux exits with status 2.
+``FAKE_MKVMERGE_SHORT`` is a regex; outputs matching it get half the duration, like a cut-short mux.
+``FAKE_MKVMERGE_RATE_MB`` slows a mux down to that many MB of input per second.
+"""
+import json
+import os
+import re
+import struct
+import sys
+import time
+
+from batch_merger import ebml
+from batch_merger.ebml import UnsupportedFile, read_header
+
+VERSION = "mkvmerge v80.0 ('Roundabout') 64-bit (test stand-in)"
+
+DEFAULT_TRACKS = [
+    {"type": "video", "codec": "V_MPEG4/ISO/AVC", "language": "und", "name": "", "default": True, "forced": False},
+    {"type": "audio", "codec": "A_AAC", "language": "jpn", "name": "Japanese", "default": True, "forced": False},
+    {"type": "subtitles", "codec": "S_TEXT/ASS", "language": "eng", "name": "Signs", "default": False,
+     "forced": True},
+]
+TRACK_TYPE_CODES = {"video": 1, "audio": 2, "subtitles": 17}
+# Room left for everything in front of the Cluster's payload
+HEADER_BYTES = 2048
+
+# The subset of mkvmerge's syntax the app writes
+VALUE_OPTIONS = {"-o", "--title", "--language", "--track-name", "--default-track-flag", "--forced-display-flag",
+                 "--video-tracks", "--audio-tracks", "--subtitle-tracks"}
+TRACK_TYPE_OPTIONS = {"video": ("--video-tracks", "--no-video"), "audio": ("--audio-tracks", "--no-audio"),
+                      "subtitles": ("--subtitle-tracks", "--no-subtitles")}
+
+
+def _id_bytes(element_id):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+
+
+def _size_bytes(size, length=None):
+    length = length or next(n for n in range(1, 9) if size < (1 << (7 * n)) - 1)
+    return (size | (1 << (7 * length))).to_bytes(length, "big")
+
+
+def _element(element_id, payload):
+    return _id_bytes(element_id) + _size_bytes(len(payload)) + payload
+
+
+def _uint(element_id, value):
+    return _element(element_id, value.to_bytes(max(1, (value.bit_length() + 7) // 8), "big"))
+
+
+def _string(element_id, value):
+    return _element(element_id, value.encode("utf-8"))
+
+
+def _float(element_id, value):
+    return _element(element_id, struct.pack(">d", value))
+
+
+def _track(number, track):
+    extra = b""
+    if track["type"] == "video":
+        extra = _element(ebml.VIDEO, _uint(ebml.PIXEL_WIDTH, 1920) + _uint(ebml.PIXEL_HEIGHT, 1080))
+    elif track["type"] == "audio":
+        extra = _element(ebml.AUDIO, _float(ebml.SAMPLING_FREQUENCY, 48000.0) + _uint(ebml.CHANNELS, 2))
+    payload = (_uint(ebml.TRACK_NUMBER, number) + _uint(ebml.TRACK_UID, number * 1000 + 1)
+               + _uint(ebml.TRACK_TYPE, TRACK_TYPE_CODES[track["type"]]) + _string(ebml.CODEC_ID, track["codec"])
+               + _string(ebml.LANGUAGE, track["language"]) + _string(ebml.NAME, track["name"])
+               + _uint(ebml.FLAG_DEFAULT, int(track["default"])) + _uint(ebml.FLAG_FORCED, int(track["forced"])))
+    return _element(ebml.TRACK_ENTRY, payload + extra)
+
+
+def _statistics_tag(track_uid, number_of_bytes):
+    return _element(ebml.TAG, _element(ebml.TARGETS, _uint(ebml.TAG_TRACK_UID, track_uid))
+                    + _element(ebml.SIMPLE_TAG, _string(ebml.TAG_NAME, "NUMBER_OF_BYTES")
+                               + _string(ebml.TAG_STRING, str(number_of_bytes))))
+
+
+def write_media(path, duration_s, size=4096, title="", tracks=None):
+    """Writes a Matroska file of ``size`` bytes (mostly a sparse Cluster) lasting ``duration_s``.
+
+    ``tracks`` replaces the default video, audio and subtitle tracks with
+    ``[{"type", "codec", "language", "name", "default", "forced"}]``, ``codec`` being a CodecID.
+    The file carries one attachment, one chapter and NUMBER_OF_BYTES statistics for its first
+    two tracks. Returns where the Cluster's payload starts.
+    """
+    tracks = DEFAULT_TRACKS if tracks is None else tracks
+    header = _element(ebml.EBML_HEADER, _uint(0x4286, 1) + _uint(0x42F7, 1) + _uint(ebml.EBML_MAX_ID_LENGTH, 4)
+                      + _uint(ebml.EBML_MAX_SIZE_LENGTH, 8) + _string(ebml.DOC_TYPE, "matroska")
+                      + _uint(0x4287, 4) + _uint(ebml.DOC_TYPE_READ_VERSION, 2))
+    info = _element(ebml.INFO, _uint(ebml.TIMESTAMP_SCALE, 1000000) + _float(ebml.DURATION, duration_s * 1000.0)
+                    + _string(ebml.TITLE, title))
+    entries = _element(ebml.TRACKS, b"".join(_track(number, t) for number, t in enumerate(tracks, start=1)))
+    attachments = _element(ebml.ATTACHMENTS, _element(ebml.ATTACHED_FILE, _string(ebml.FILE_NAME, "font.ttf")
+                                                      + _string(ebml.FILE_MIME_TYPE, "font/ttf")
+                                                      + _element(ebml.FILE_DATA, b"\0" * 256)
+                                                      + _uint(ebml.FILE_UID, 7)))
+    chapters = _element(ebml.CHAPTERS, _element(ebml.EDITION_ENTRY, _element(ebml.CHAPTER_ATOM, _uint(0x73C4, 1))))
+    payload_bytes = max(0, size - HEADER_BYTES)
+    tags = _element(ebml.TAGS, _statistics_tag(1001, int(payload_bytes * 0.85))
+                    + _statistics_tag(2001, int(payload_bytes * 0.14)))
+
+    def seek_head(positions):
+        # Fixed 8-byte positions keep the SeekHead's size independent of the offsets it holds
+        return _element(ebml.SEEK_HEAD, b"".join(
+            _element(ebml.SEEK, _element(ebml.SEEK_ID, _id_bytes(element_id))
+                     + _element(ebml.SEEK_POSITION, position.to_bytes(8, "big")))
+            for element_id, position in positions))
+
+    level1 = [(ebml.INFO, info), (ebml.TRACKS, entries), (ebml.ATTACHMENTS, attachments),
+              (ebml.CHAPTERS, chapters), (ebml.TAGS, tags)]
+    position = len(seek_head([(element_id, 0) for element_id, _ in level1]))
+    positions = []
+    for element_id, data in level1:
+        positions.append((element_id, position))
+        position += len(data)
+    body = seek_head(positions) + b"".join(data for _, data in level1)
+    cluster_header = _id_bytes(ebml.CLUSTER) + _size_bytes(payload_bytes, 8)
+    segment_size = len(body) + len(cluster_header) + payload_bytes
+
+    with open(path, "wb") as f:
+        f.write(header + _id_bytes(ebml.SEGMENT) + _size_bytes(segment_size, 8) + body + cluster_header)
+        payload_start = f.tell()
+        f.truncate(payload_start + payload_bytes)
+    return payload_start
+
+
+def read_media(path):
+    return read_header(path)
+
+
+def identify(path):
+    try:
+        data = read_media(path)
+    except (UnsupportedFile, OSError) as e:
+        print(json.dumps({"container": {"recognized": False, "supported": False}, "errors": [str(e)],
+                          "file_name": path}))
+        return 2
+    data["container"].update({"recognized": True, "supported": True, "type": "Matroska"})
+    data.update({"file_name": path, "identification_format_version": 17})
+    print(json.dumps(data))
+    return 0
+
+
+def parse_mux(args):
+    """(output, title, [(input, {option: [values]})]); file options apply to the input that follows them."""
+    output, title, inputs, options = None, "", [], {}
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in VALUE_OPTIONS:
+            value = args[i + 1]
+            i += 2
+            if arg == "-o":
+                output = value
+            elif arg == "--title":
+                title = value
+            else:
+                options.setdefault(arg, []).append(value)
+            continue
+        i += 1
+        if arg.startswith("-"):
+            options[arg] = []
+        else:
+            inputs.append((arg, options))
+            options = {}
+    return output, title, inputs
+
+
+def output_tracks(data, options):
+    def by_id(option):
+        return dict(value.split(":", 1) for value in options.get(option, []))
+
+    languages, names = by_id("--language"), by_id("--track-name")
+    defaults, forced = by_id("--default-track-flag"), by_id("--forced-display-flag")
+    tracks = []
+    for track in data["tracks"]:
+        keep_option, drop_option = TRACK_TYPE_OPTIONS[track["type"]]
+        tid, props = str(track["id"]), track["properties"]
+        if drop_option in options or (keep_option in options and tid not in options[keep_option][0].split(",")):
+            continue
+        tracks.append({"type": track["type"], "codec": props["codec_id"],
+                       "language": languages.get(tid, props.get("language", "und")),
+                       "name": names.get(tid, props.get("track_name", "")),
+                       "default": defaults.get(tid, "1" if props.get("default_track") else "0") == "1",
+                       "forced": forced.get(tid, "1" if props.get("forced_track") else "0") == "1"})
+    return tracks
+
+
+def mux(args):
+    gui_mode = "--gui-mode" in args
+    output, title, inputs = parse_mux([arg for arg in args if arg != "--gui-mode"])
+    tracks, durations = [], []
+    for path, options in inputs:
+        data = read_media(path)
+        tracks += output_tracks(data, options)
+        durations.append(data["container"]["properties"]["duration"] / 1e9)
+
+    fail_pattern = os.environ.get("FAKE_MKVMERGE_FAIL")
+    if fail_pattern and re.search(fail_pattern, output):
+        with open(output, "wb") as f:
+            f.write(b"\0" * 1024)
+        print("#GUI#error Simulated failure" if gui_mode else "Error: Simulated failure")
+        return 2
+
+    duration = max(durations, default=0)
+    short_pattern = os.environ.get("FAKE_MKVMERGE_SHORT")
+    if short_pattern and re.search(short_pattern, output):
+        duration /= 2
+    size = sum(os.path.getsize(path) for path, _ in inputs)
+    rate_mb = os.environ.get("FAKE_MKVMERGE_RATE_MB")
+    for percent in range(0, 101, 25):
+        if percent and rate_mb:
+            time.sleep(size / (float(rate_mb) * 1024 * 1024) / 4)
+        print(f"#GUI#progress {percent}%" if gui_mode else f"Progress: {percent}%", flush=True)
+    write_media(output, duration, size,
+                title=title, tracks=tracks)
+    return 0
+
+
+def expand_option_files(argv):
+    args = []
+    for arg in argv:
+        if arg.startswith("@"):
+            with open(arg[1:], encoding="utf-8") as f:
+                args += json.load(f)
+        else:
+            args.append(arg)
+    return args
+
+
+def main(argv):
+    argv = expand_option_files(argv)
+    if not argv or argv[0] == "--version":
+        print(VERSION)
+        return 0
+    if argv[0] == "-J":
+        return identify(argv[1])
+    return mux(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
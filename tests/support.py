@@ -0,0 +1,113 @@
+"""Shared helpers: test media folders and a stand-in mkvmerge."""
+import os
+import sys
+import tempfile
+import unittest
+
+from tests.fake_mkvmerge import write_media
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+
+# Keeps the video and audio of File 1 and the audio of File 2
+PRESET = {
+    "global_properties": {"title": "", "include_chapters_file1": True, "include_attachments_file1": True},
+    "tracks": {
+        "1": [{"track_id": 0, "include": True, "language": "und", "name": "", "default": True, "forced": False},
+              {"track_id": 1, "include": True, "language": "jpn", "name": "Japanese", "default": True,
+               "forced": False}],
+        "2": [{"track_id": 1, "include": True, "language": "eng", "name": "English", "default": False,
+               "forced": False}],
+    },
+}
+
+# The stand-in mkvmerge is a shell script
+needs_posix = unittest.skipUnless(os.name == "posix", "the stand-in mkvmerge needs /bin/sh")
+
+
+def episode_name(i):
+    return f"Show - S01E{i:02d}.mkv"
+
+
+def make_pairs(root, count, size=64 * 1024, mismatched=()):
+    """Writes ``root/A`` and ``root/B`` with ``count`` pairs; pairs numbered in ``mismatched`` differ by 30 s."""
+    for side in ("A", "B"):
+        os.makedirs(os.path.join(root, side), exist_ok=True)
+    names = []
+    for i in range(1, count + 1):
+        name = episode_name(i)
+        duration = 1200.0 + i
+        write_media(os.path.join(root, "A", name), duration, size, title=name)
+        write_media(os.path.join(root, "B", name), duration + (30 if i in mismatched else 0), size // 4,
+                    title=name)
+        names.append(name)
+    return names
+
+
+def install_fake_mkvmerge(folder):
+    """A folder with an ``mkvmerge`` that runs fake_mkvmerge.py with this interpreter and this checkout."""
+    folder = os.path.join(folder, "mkvtoolnix")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, "mkvmerge")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'#!/bin/sh\nexport PYTHONPATH="{REPO_DIR}"\n'
+                f'exec "{sys.executable}" "{os.path.join(TESTS_DIR, "fake_mkvmerge.py")}" "$@"\n')
+    os.chmod(path, 0o755)
+    return folder
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory(prefix="mkv_merger_test_")
+        self.tmp = self._tmp.name
+        self.addCleanup(self._tmp.cleanup)
+
+    def path(self, *parts):
+        return os.path.join(self.tmp, *parts)
+
+    def write_file(self, name, data=b"x"):
+        path = self.path(name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+
+class MediaTestCase(TempDirTestCase):
+    """Five pairs in ``A`` and ``B``, an empty ``out`` folder and the stand-in mkvmerge."""
+
+    pairs = 5
+
+    def setUp(self):
+        super().setUp()
+        self.names = make_pairs(self.tmp, self.pairs)
+        self.mkvtoolnix = install_fake_mkvmerge(self.tmp)
+        self.out = self.path("out")
+        os.makedirs(self.out)
+
+    def outputs(self):
+        return sorted(name for name in os.listdir(self.out) if name.endswith(".mkv") and not name.startswith("."))
+
+
+class FakeTopology:
+    """StorageTopology stand-in: the first path component is the device, every device is rotational."""
+
+    def device_of(self, path):
+        return path.strip("/").split("/")[0]
+
+    def existing_path(self, path):
+        return path
+
+    def kind_of(self, dev):
+        return "rotational"
+
+    def describe(self, dev):
+        return dev
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
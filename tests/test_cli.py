@@ -0,0 +1,185 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from batch_merger import cli, settings
+from tests.fake_mkvmerge import read_media, write_media
+from tests.support import PRESET, REPO_DIR, MediaTestCase, make_pairs, needs_posix
+
+
+@needs_posix
+class CliTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        # Keep the GUI's settings file out of reach
+        patcher = mock.patch.object(settings, "get_settings_path", return_value=self.path("settings.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.preset = self.path("preset.json")
+        with open(self.preset, "w", encoding="utf-8") as f:
+            json.dump(PRESET, f)
+
+    def run_cli(self, command, *args, common=True):
+        argv = [command]
+        if common:
+            argv += ["--mkvtoolnix", self.mkvtoolnix, "--folder1", self.path("A"), "--folder2", self.path("B"),
+                     "--no-cache"]
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            code = cli.main(argv + list(args))
+        events = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        return code, events, stderr.getvalue()
+
+    def merge_args(self, *args):
+        return ("--out", self.out, "--preset", self.preset) + args
+
+    def test_merge_writes_outputs_and_json_lines(self):
+        code, events, log = self.run_cli("merge", *self.merge_args())
+        self.assertEqual(code, 0)
+        self.assertEqual(self.outputs(), self.names)
+        kinds = [event["event"] for event in events]
+        self.assertEqual(kinds[-1], "batch_complete")
+        self.assertLess(kinds.index("batch_start"), kinds.index("job_start"))
+        self.assertEqual(kinds.count("job_start"), 5)
+        self.assertEqual(kinds.count("job_done"), 5)
+        self.assertTrue(events[-1]["success"])
+        self.assertIn("[INFO] Starting merge", log)
+        tracks = read_media(os.path.join(self.out, self.names[0]))["tracks"]
+        self.assertEqual([(t["type"], t["properties"]["language"]) for t in tracks],
+                         [("video", "und"), ("audio", "jpn"), ("audio", "eng")])
+
+    def test_tuning_is_saved_only_when_asked(self):
+        self.run_cli("merge", *self.merge_args("--auto-jobs"))
+        self.assertFalse(os.path.exists(self.path("settings.json")))
+        self.run_cli("merge", *self.merge_args("--auto-jobs", "--no-resume", "--save-tuning"))
+        with open(self.path("settings.json"), encoding="utf-8") as f:
+            saved = json.load(f)
+        self.assertGreater(saved["merge_job_rate"], 0)
+
+    def test_analyze_reports_mismatched_durations(self):
+        make_pairs(self.tmp, 5, mismatched={2})
+        code, events, _ = self.run_cli("analyze")
+        self.assertEqual(code, 0)
+        done = events[-1]
+        self.assertEqual(done["event"], "analysis_complete")
+        self.assertEqual([item["file"] for item in done["mismatched"]], [self.names[1]])
+
+    def test_analyze_reads_headers_directly(self):
+        _, _, log = self.run_cli("analyze")
+        self.assertIn("Header reader: 10 files read directly, 0 through mkvmerge", log)
+
+    def test_mismatch_exclude_and_cancel(self):
+        make_pairs(self.tmp, 5, mismatched={2})
+        code, events, _ = self.run_cli("merge", *self.merge_args("--mismatch", "cancel"))
+        self.assertEqual((code, self.outputs()), (1, []))
+        code, events, _ = self.run_cli("merge", *self.merge_args("--mismatch", "exclude"))
+        self.assertEqual(code, 0)
+        self.assertEqual(self.outputs(), self.names[:1] + self.names[2:])
+
+    def test_mismatched_pairs_are_skipped_by_default(self):
+        make_pairs(self.tmp, 5, mismatched={2})
+        code, events, _ = self.run_cli("merge", *self.merge_args())
+        self.assertEqual(code, 0)
+        self.assertEqual(self.outputs(), self.names[:1] + self.names[2:])
+        code, events, _ = self.run_cli("merge", *self.merge_args("--mismatch", "all"))
+        self.assertEqual(self.outputs(), self.names)
+
+    def test_mismatch_park(self):
+        make_pairs(self.tmp, 5, mismatched={2})
+        code, events, log = self.run_cli("merge", *self.merge_args("--mismatch", "park"))
+        self.assertEqual(code, 0)
+        self.assertEqual(self.outputs(), self.names[:1] + self.names[2:])
+        self.assertIn(f"Not merged, durations differ: {self.names[1]}", log)
+
+    def test_export_writes_one_command_per_pair(self):
+        script = self.path("merge.sh")
+        code, events, _ = self.run_cli("export", *self.merge_args()[:4], "--script", script)
+        self.assertEqual(code, 0)
+        self.assertEqual(events[-1]["event"], "export_complete")
+        with open(script, encoding="utf-8") as f:
+            text = f.read()
+        self.assertTrue(text.startswith("#!/bin/bash"))
+        self.assertEqual(text.count("# Merging "), 5)
+        self.assertTrue(os.access(script, os.X_OK))
+
+    def test_plan_orders_largest_first(self):
+        write_media(self.path("A", self.names[2]), 1203.0, 1024 * 1024)
+        code, events, _ = self.run_cli("plan", "--jobs", "2")
+        self.assertEqual(code, 0)
+        plan = events[-1]
+        self.assertEqual(plan["event"], "plan")
+        self.assertEqual(plan["order"][0], self.names[2])
+        self.assertLessEqual(plan["makespan_bytes"], plan["name_order_makespan_bytes"])
+        _, events, _ = self.run_cli("plan", "--order", "name")
+        self.assertEqual(events[-1]["order"], self.names)
+
+    def test_queue_enqueue_worker_and_status(self):
+        queue = self.path("queue")
+        code, events, _ = self.run_cli("enqueue", *self.merge_args("--queue", queue))
+        self.assertEqual(code, 0)
+        code, events, _ = self.run_cli("worker", "--queue", queue, "--mkvtoolnix", self.mkvtoolnix, "--jobs", "2",
+                                       "--no-wait", "--no-cache", common=False)
+        self.assertEqual(code, 0)
+        self.assertEqual(self.outputs(), self.names)
+        self.assertEqual((events[-1]["event"], events[-1]["merged"]), ("worker_complete", 5))
+        code, events, _ = self.run_cli("queue-status", "--queue", queue, common=False)
+        self.assertEqual((events[-1]["done"], events[-1]["pending"]), (5, 0))
+
+    def test_trace_is_written(self):
+        trace = self.path("trace.json")
+        code, _, log = self.run_cli("merge", *self.merge_args("--trace", trace))
+        self.assertEqual(code, 0)
+        with open(trace, encoding="utf-8") as f:
+            stages = json.load(f)["otherData"]["summary"]
+        self.assertEqual(stages["mux"]["count"], 5)
+        self.assertIn("build_command", stages)
+        self.assertIn(f"Trace written to {trace}", log)
+
+    def test_metrics_textfile(self):
+        textfile = self.path("mkv_merger.prom")
+        code, _, _ = self.run_cli("merge", *self.merge_args("--metrics-textfile", textfile))
+        self.assertEqual(code, 0)
+        with open(textfile, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn('mkv_merger_jobs{state="merged"} 5', text)
+        self.assertIn('mkv_merger_jobs{state="running"} 0', text)
+
+    def test_identification_cache_is_used(self):
+        cache_path = self.path("cache.sqlite3")
+        with mock.patch.object(cli, "get_identify_cache_path", return_value=cache_path):
+            argv = ["analyze", "--mkvtoolnix", self.mkvtoolnix, "--folder1", self.path("A"),
+                    "--folder2", self.path("B"), "--no-header-reader"]
+            self.run_cli(*argv, common=False)
+            _, _, log = self.run_cli(*argv, common=False)
+        self.assertIn("Identification cache: 10 hits, 0 misses", log)
+
+    def test_missing_mkvmerge_or_folder(self):
+        code, events, log = self.run_cli("analyze", "--mkvtoolnix", self.path("nowhere"), "--folder1", "x",
+                                         "--folder2", "y", common=False)
+        self.assertEqual((code, events), (2, []))
+        self.assertIn("mkvmerge not found", log)
+        code, _, log = self.run_cli("analyze", "--mkvtoolnix", self.mkvtoolnix, "--folder1", self.path("nope"),
+                                    "--folder2", self.path("B"), "--no-cache", common=False)
+        self.assertEqual(code, 2)
+        self.assertIn("Folder not found", log)
+
+
+class StartupTests(unittest.TestCase):
+    def test_help_does_not_load_the_gui_or_the_engine(self):
+        code = ("import sys, contextlib, io\n"
+                "from batch_merger import cli\n"
+                "with contextlib.redirect_stdout(io.StringIO()):\n"
+                "    try:\n"
+                "        cli.main(['--help'])\n"
+                "    except SystemExit:\n"
+                "        pass\n"
+                "print(sorted(m for m in ('tkinter', 'http.server', 'batch_merger.engine') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True,
+                                check=True)
+        self.assertEqual(result.stdout.strip(), "[]")
+
@@ -0,0 +1,79 @@
+import io
+import sys
+import unittest
+
+from batch_merger.commands import (PROGRESS_RE, build_merge_command, format_script_command, iter_output_lines,
+                                   run_merge_command)
+
+INFO1 = {"tracks": [{"id": 0, "type": "video"}, {"id": 1, "type": "audio"}, {"id": 2, "type": "subtitles"}]}
+INFO2 = {"tracks": [{"id": 0, "type": "video"}, {"id": 1, "type": "audio"}]}
+SETTINGS = {
+    "global_properties": {"title": "Merged", "include_chapters_file1": True},
+    "tracks": {
+        "1": [{"track_id": 0, "include": True, "language": "und", "name": "", "default": True, "forced": False},
+              {"track_id": 2, "include": True, "language": "", "name": "Signs", "default": False, "forced": True}],
+        "2": [{"track_id": 1, "include": True, "language": "ja", "name": "Japanese", "default": True,
+               "forced": False},
+              {"track_id": 0, "include": False}],
+    },
+}
+
+
+class BuildMergeCommandTests(unittest.TestCase):
+    def test_selected_tracks_and_properties(self):
+        cmd = build_merge_command("mkvmerge", "out.mkv", [("a.mkv", INFO1), ("b.mka", INFO2)], SETTINGS)
+        self.assertEqual(cmd, [
+            "mkvmerge", "-o", "out.mkv", "--title", "Merged",
+            "--language", "0:und", "--track-name", "0:", "--default-track-flag", "0:1",
+            "--forced-display-flag", "0:0",
+            "--track-name", "2:Signs", "--default-track-flag", "2:0", "--forced-display-flag", "2:1",
+            "--video-tracks", "0", "--no-audio", "--subtitle-tracks", "2",
+            "--no-global-tags", "--no-attachments", "a.mkv",
+            "--language", "1:ja", "--track-name", "1:Japanese", "--default-track-flag", "1:1",
+            "--forced-display-flag", "1:0",
+            "--no-video", "--audio-tracks", "1", "--no-subtitles",
+            "--no-chapters", "--no-global-tags", "--no-attachments", "b.mka",
+        ])
+
+    def test_file_without_selected_tracks_is_left_out(self):
+        settings = {"tracks": {1: SETTINGS["tracks"]["1"]}}
+        cmd = build_merge_command("mkvmerge", "out.mkv", [("a.mkv", INFO1), ("b.mka", INFO2)], settings)
+        self.assertIn("a.mkv", cmd)
+        self.assertNotIn("b.mka", cmd)
+
+    def test_missing_identification(self):
+        with self.assertRaises(ValueError):
+            build_merge_command("mkvmerge", "out.mkv", [("a.mkv", None), ("b.mka", INFO2)], SETTINGS)
+
+
+class RunMergeCommandTests(unittest.TestCase):
+    def run_exiting(self, status, message=""):
+        return run_merge_command([sys.executable, "-c", f"print({message!r}); raise SystemExit({status})"])
+
+    def test_warnings_count_as_success(self):
+        self.assertEqual(self.run_exiting(0), 0)
+        self.assertEqual(self.run_exiting(1), 1)
+
+    def test_error_line_is_reported(self):
+        with self.assertRaisesRegex(RuntimeError, "status 2: Error: no space"):
+            self.run_exiting(2, "Progress: 10%\nError: no space")
+
+
+class ProgressOutputTests(unittest.TestCase):
+    def test_progress_pattern(self):
+        self.assertEqual(PROGRESS_RE.search("#GUI#progress 42%").group(1), "42")
+        self.assertEqual(PROGRESS_RE.search("Progress: 7%").group(1), "7")
+
+    def test_lines_split_on_carriage_returns(self):
+        stream = io.BytesIO(b"Progress: 1%\rProgress: 2%\r\nDone\nlast")
+        self.assertEqual(list(iter_output_lines(stream)), ["Progress: 1%", "Progress: 2%", "Done", "last"])
+
+
+class FormatScriptCommandTests(unittest.TestCase):
+    def test_shell_quoting_and_continuations(self):
+        script = format_script_command(["mkvmerge", "-o", "my out.mkv", "--title", "", "a.mkv"], False)
+        self.assertEqual(script, "mkvmerge \\\n  -o 'my out.mkv' \\\n  --title '' a.mkv")
+
+    def test_batch_quoting(self):
+        script = format_script_command(["mkvmerge.exe", "-o", "my out.mkv", "--title", ""], True)
+        self.assertEqual(script, 'mkvmerge.exe ^\n  -o "my out.mkv" ^\n  --title ""')
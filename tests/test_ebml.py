@@ -0,0 +1,68 @@
+import os
+
+from batch_merger.ebml import UnsupportedFile, read_header
+from tests.fake_mkvmerge import write_media
+from tests.support import TempDirTestCase
+
+
+class ReadHeaderTests(TempDirTestCase):
+    def test_default_fixture_tracks_and_duration(self):
+        path = self.path("a.mkv")
+        write_media(path, 1500.0, 64 * 1024, title="Episode")
+        info = read_header(path)
+        self.assertEqual(info["container"]["properties"]["duration"], 1500 * 10 ** 9)
+        self.assertEqual(info["container"]["properties"]["title"], "Episode")
+        self.assertEqual([t["type"] for t in info["tracks"]], ["video", "audio", "subtitles"])
+        self.assertEqual([t["id"] for t in info["tracks"]], [0, 1, 2])
+        video, audio, subs = info["tracks"]
+        self.assertEqual(video["properties"]["pixel_dimensions"], "1920x1080")
+        self.assertEqual(audio["codec"], "AAC")
+        self.assertEqual(audio["properties"]["language"], "jpn")
+        self.assertEqual(audio["properties"]["audio_channels"], 2)
+        self.assertTrue(subs["properties"]["forced_track"])
+        self.assertFalse(subs["properties"]["default_track"])
+        self.assertEqual(subs["properties"]["track_name"], "Signs")
+        self.assertEqual(len(info["attachments"]), 1)
+        self.assertEqual(info["chapters"], [{"num_entries": 1}])
+        self.assertIn("tag_number_of_bytes", video["properties"])
+
+    def test_custom_tracks(self):
+        path = self.path("b.mkv")
+        write_media(path, 60.0, 8192, tracks=[
+            {"type": "audio", "codec": "A_FLAC", "language": "eng", "name": "Main", "default": True, "forced": False},
+            {"type": "subtitles", "codec": "S_TEXT/UTF8", "language": "ger", "name": "", "default": False,
+             "forced": False},
+        ])
+        info = read_header(path)
+        self.assertEqual([t["codec"] for t in info["tracks"]], ["FLAC", "SubRip/SRT"])
+        self.assertEqual(info["tracks"][1]["properties"]["language"], "ger")
+
+    def test_truehd_is_not_labelled_atmos(self):
+        path = self.path("truehd.mkv")
+        write_media(path, 60.0, 8192, tracks=[
+            {"type": "audio", "codec": "A_TRUEHD", "language": "eng", "name": "", "default": True, "forced": False},
+        ])
+        self.assertEqual(read_header(path)["tracks"][0]["codec"], "TrueHD")
+
+    def test_rejects_non_matroska(self):
+        path = self.path("c.mkv")
+        with open(path, "wb") as f:
+            f.write(b"RIFF" + b"\0" * 64)
+        with self.assertRaises(UnsupportedFile):
+            read_header(path)
+
+    def test_rejects_empty_and_truncated_files(self):
+        empty = self.path("empty.mkv")
+        open(empty, "wb").close()
+        with self.assertRaises(UnsupportedFile):
+            read_header(empty)
+        full = self.path("full.mkv")
+        write_media(full, 10.0, 8192)
+        with open(full, "rb") as f:
+            head = f.read(200)
+        truncated = self.path("truncated.mkv")
+        with open(truncated, "wb") as f:
+            f.write(head)
+        self.assertLess(os.path.getsize(truncated), os.path.getsize(full))
+        with self.assertRaises(UnsupportedFile):
+            read_header(truncated)
@@ -0,0 +1,310 @@
+import collections
+import os
+import subprocess
+import threading
+from unittest import mock
+
+from batch_merger import engine as engine_module
+from batch_merger.engine import ERROR_LOG_FILENAME, BatchEngine, summarize_merge
+from batch_merger.scheduling import FreeSpaceGate, JobScheduler
+from batch_merger.staging import SESSION_PREFIX
+from tests.fake_mkvmerge import HEADER_BYTES, write_media
+from tests.support import PRESET, MediaTestCase, make_pairs, needs_posix
+
+GB = 1000 ** 3
+Usage = collections.namedtuple("Usage", "total used free")
+
+
+def run_with_timeout(target, seconds=120):
+    """Runs ``target`` in a thread so a dispatcher that never returns fails the test instead of hanging it."""
+    outcome = {}
+
+    def _run():
+        outcome["result"] = target()
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    return thread.is_alive(), outcome.get("result")
+
+
+@needs_posix
+class MergeTests(MediaTestCase):
+    def make_engine(self, settings=PRESET, **kwargs):
+        kwargs.setdefault("max_workers", 2)
+        return BatchEngine(self.mkvtoolnix, self.path("A"), self.path("B"), self.out, settings, **kwargs)
+
+    def merge(self, engine, fail=None, short=None, **kwargs):
+        env = {"FAKE_MKVMERGE_FAIL": fail} if fail else {}
+        if short:
+            env["FAKE_MKVMERGE_SHORT"] = short
+        with mock.patch.dict(os.environ, env):
+            return engine.merge(engine.find_matching_files(), **kwargs)
+
+    def test_merges_and_resumes(self):
+        result = self.merge(self.make_engine())
+        self.assertEqual((result["completed"], result["skipped"]), (5, 0))
+        self.assertEqual(self.outputs(), self.names)
+        result = self.merge(self.make_engine())
+        self.assertEqual((result["success"], result["skipped"]), (True, 5))
+
+    def test_changed_source_or_preset_is_remuxed(self):
+        self.merge(self.make_engine())
+        write_media(self.path("B", self.names[0]), 1201.0, 8192)
+        self.assertEqual(self.merge(self.make_engine())["skipped"], 4)
+        settings = dict(PRESET, global_properties={"title": "Renamed"})
+        self.assertEqual(self.merge(self.make_engine(settings))["skipped"], 0)
+
+    def test_resume_off_remuxes_everything(self):
+        self.merge(self.make_engine())
+        result = self.merge(self.make_engine(resume=False))
+        self.assertEqual((result["completed"], result["skipped"]), (5, 0))
+
+    def test_failed_job_leaves_no_output(self):
+        result = self.merge(self.make_engine(max_workers=1), fail="E02")
+        self.assertTrue(result["stopped_early"])
+        self.assertEqual([entry["file"] for entry in result["failed"]], [self.names[1]])
+        # A job that had already started when the batch stopped still finishes
+        self.assertEqual(self.outputs()[0], self.names[0])
+        self.assertNotIn(self.names[1], self.outputs())
+        self.assertEqual(result["merged"], len(self.outputs()))
+        self.assertEqual([name for name in os.listdir(self.out) if "partial" in name], [])
+        self.assertIn("Stopped after an error", summarize_merge(result))
+        self.assertTrue(os.path.exists(os.path.join(self.out, ERROR_LOG_FILENAME)))
+
+    def test_continue_on_error_and_retries(self):
+        engine = self.make_engine(continue_on_error=True, retries=2, retry_delay=0)
+        result = self.merge(engine, fail="E0[24]")
+        self.assertEqual((result["merged"], result["retried"], len(result["failed"])), (3, 4, 2))
+        self.assertFalse(result["stopped_early"])
+        self.assertEqual(self.outputs(), [self.names[0], self.names[2], self.names[4]])
+        self.assertIn("3 of 5 files merged, 2 failed.", summarize_merge(result))
+        # Only the failed files are redone on the next run
+        result = self.merge(self.make_engine())
+        self.assertEqual((result["merged"], result["skipped"]), (2, 3))
+
+    def test_result_lists_every_finished_job(self):
+        self.merge(self.make_engine())
+        write_media(self.path("B", self.names[0]), 1201.0, 8192)
+        write_media(self.path("B", self.names[2]), 1203.0, 8192)
+        result = self.merge(self.make_engine(continue_on_error=True), fail="E03")
+        rows = {row["file"]: row for row in result["files"]}
+        self.assertEqual(sorted(rows), self.names)
+        self.assertEqual(rows[self.names[0]]["status"], "merged")
+        self.assertGreater(rows[self.names[0]]["output_size"], 0)
+        self.assertEqual(rows[self.names[1]]["status"], "skipped")
+        self.assertEqual(rows[self.names[2]]["status"], "failed")
+        self.assertIn("Simulated failure", rows[self.names[2]]["error"])
+
+    def test_verify_rejects_a_short_output(self):
+        result = self.merge(self.make_engine(verify=True, continue_on_error=True), short="E04")
+        self.assertEqual(result["merged"], 4)
+        self.assertEqual([entry["file"] for entry in result["failed"]], [self.names[3]])
+        self.assertIn("duration", result["failed"][0]["error"])
+        self.assertEqual(self.outputs(), self.names[:3] + self.names[4:])
+        self.assertEqual([name for name in os.listdir(self.out) if "partial" in name], [])
+        # A verified output is journaled like any other, a rejected one is redone
+        result = self.merge(self.make_engine(verify=True))
+        self.assertEqual((result["merged"], result["skipped"]), (1, 4))
+
+    def test_staged_merge_matches_an_unstaged_one(self):
+        scratch = self.path("scratch")
+        result = self.merge(self.make_engine(staging={"folder": scratch, "prefetch": 2}, verify=True))
+        self.assertEqual((result["merged"], result["failed"]), (5, []))
+        self.assertEqual(self.outputs(), self.names)
+        self.assertEqual(os.listdir(scratch), [])
+        # Same journal digest with or without scratch
+        result = self.merge(self.make_engine())
+        self.assertEqual(result["skipped"], 5)
+
+    def test_staged_jobs_keep_output_space_until_moved(self):
+        seen = {"partials": set(), "done": []}
+
+        class RecordingGate(FreeSpaceGate):
+            def __init__(self, topology, **kwargs):
+                super().__init__(topology, disk_usage=lambda path: Usage(0, 0, 100 * GB), **kwargs)
+
+            def reserved(self, dev):
+                seen["partials"].update(job.get("partial") for job in self.running.get(dev, ()))
+                return super().reserved(dev)
+
+            def on_done(self, job):
+                seen["done"].append(os.path.exists(job["output"]))
+                super().on_done(job)
+
+        scratch = self.path("scratch")
+        with mock.patch.object(engine_module, "FreeSpaceGate", RecordingGate):
+            result = self.merge(self.make_engine(staging={"folder": scratch, "prefetch": 2}))
+        self.assertEqual((result["merged"], result["failed"]), (5, []))
+        # Only partials on the output volume are measured, and space is released once outputs are in place
+        self.assertTrue(seen["partials"])
+        self.assertEqual({os.path.dirname(p) for p in seen["partials"] if p}, {self.out})
+        self.assertEqual(seen["done"], [True] * 5)
+        self.assertEqual(os.listdir(scratch), [])
+
+    def test_stale_scratch_session_is_removed(self):
+        stale = self.path("scratch", f"{SESSION_PREFIX}1-1")
+        os.makedirs(os.path.join(stale, "in"))
+        os.utime(stale, (0, 0))
+        result = self.merge(self.make_engine(staging={"folder": self.path("scratch")}))
+        self.assertEqual(result["merged"], 5)
+        self.assertEqual(os.listdir(self.path("scratch")), [])
+
+    def test_autotune_reports_its_level(self):
+        events = []
+        result = self.merge(self.make_engine(max_workers=3, autotune=True, autotune_start=2, on_event=events.append))
+        self.assertEqual(result["merged"], 5)
+        self.assertEqual(next(e["jobs"] for e in events if e["event"] == "batch_start"), 2)
+        self.assertIn(result["concurrency"]["level"], (1, 2, 3))
+
+    def test_progress_events(self):
+        events = []
+        self.merge(self.make_engine(on_event=events.append))
+        progress = [e for e in events if e["event"] == "job_progress"]
+        self.assertEqual({e["file"] for e in progress}, set(self.names))
+        self.assertEqual({e["percent"] for e in progress}, {0, 25, 50, 75, 100})
+        done = [e for e in events if e["event"] == "job_done"]
+        self.assertEqual(done[-1]["overall"]["percent"], 100.0)
+
+    def test_cost_comes_from_statistics_tags(self):
+        job = self.make_engine().make_job(0, self.names[0])
+        # File 1 keeps both tagged tracks, File 2 only the audio one
+        payload1, payload2 = 64 * 1024 - HEADER_BYTES, 16 * 1024 - HEADER_BYTES
+        expected = int(payload1 * 0.85) + int(payload1 * 0.14) + int(payload2 * 0.14)
+        self.assertEqual(self.make_engine().estimate_cost(job), expected)
+        # Without headers or a cache, whole files are counted
+        job = self.make_engine(header_reader=False).make_job(0, self.names[0])
+        self.assertEqual(self.make_engine(header_reader=False).estimate_cost(job),
+                         os.path.getsize(job["src1"]) + os.path.getsize(job["src2"]))
+
+    def test_nested_pairs_keep_their_folders(self):
+        os.makedirs(self.path("A", "Season 1"))
+        write_media(self.path("A", "Season 1", "Other - 07.mkv"), 1300.0, 8192)
+        write_media(self.path("B", "Other S01E07.mka"), 1300.0, 8192)
+        engine = self.make_engine(pairing={"mode": "episode", "recursive": True})
+        names = engine.find_matching_files()
+        self.assertIn("Season 1/Other - 07.mkv", names)
+        result = engine.merge(names)
+        self.assertEqual(result["merged"], len(names))
+        self.assertTrue(os.path.exists(os.path.join(self.out, "Season 1", "Other - 07.mkv")))
+
+    def test_pipeline_parks_mismatched_pairs(self):
+        make_pairs(self.tmp, 5, mismatched={3})
+        result = self.merge(self.make_engine(), pipeline=True)
+        self.assertEqual(result["merged"], 4)
+        self.assertEqual([entry["file"] for entry in result["parked"]], [self.names[2]])
+        self.assertNotIn(self.names[2], self.outputs())
+
+    def test_job_too_big_for_the_volume_waits_for_space(self):
+        free = {"bytes": 0}
+        events = []
+
+        class FullVolumeGate(FreeSpaceGate):
+            def __init__(self, topology, **kwargs):
+                super().__init__(topology, disk_usage=lambda path: Usage(0, 0, free["bytes"]), report_seconds=0,
+                                 **kwargs)
+
+        def on_event(event):
+            events.append(event)
+            # Space is freed while the batch waits, after the wait has been reported twice
+            if sum(1 for e in events if e["event"] == "space_wait") == 2:
+                free["bytes"] = 100 * GB
+
+        with mock.patch.object(engine_module, "FreeSpaceGate", FullVolumeGate):
+            engine = self.make_engine(on_event=on_event)
+            hung, result = run_with_timeout(lambda: self.merge(engine))
+        self.assertFalse(hung, "merge did not return")
+        self.assertEqual((result["merged"], result["failed"]), (5, []))
+        self.assertGreaterEqual(sum(1 for e in events if e["event"] == "space_wait"), 2)
+
+    def test_job_too_big_for_the_volume_fails_when_asked(self):
+        huge = 10 ** 18
+        result = self.merge(self.make_engine(free_space_margin=huge, fail_if_no_space=True))
+        self.assertTrue(result["stopped_early"])
+        self.assertEqual(len(result["failed"]), 1)
+        self.assertIn("Not enough space", result["failed"][0]["error"])
+        result = self.merge(self.make_engine(free_space_margin=huge, fail_if_no_space=True, continue_on_error=True))
+        self.assertEqual(len(result["failed"]), 5)
+
+    def test_job_too_big_for_the_volume_can_be_cancelled(self):
+        engine = self.make_engine(free_space_margin=10 ** 18)
+        events = []
+
+        def on_event(event):
+            events.append(event)
+            if event["event"] == "space_wait":
+                engine.cancel_event.set()
+
+        engine.on_event = on_event
+        hung, result = run_with_timeout(lambda: self.merge(engine))
+        self.assertFalse(hung, "merge did not return")
+        self.assertTrue(result["cancelled"])
+        self.assertEqual((result["merged"], result["failed"]), (0, []))
+
+    def test_space_wait_ends_when_a_running_job_finishes(self):
+        class TightGate(FreeSpaceGate):
+            # Room for one job's output at a time
+            def free_bytes(self, job):
+                return int(self.needed(job) * 1.5) + self.margin
+
+        events = []
+        with mock.patch.object(engine_module, "FreeSpaceGate", TightGate):
+            result = self.merge(self.make_engine(on_event=events.append))
+        self.assertEqual(result["merged"], 5)
+        self.assertTrue(any(event["event"] == "space_wait" for event in events))
+
+    def test_checked_jobs_queue_stays_bounded(self):
+        peak = [0]
+
+        class RecordingScheduler(JobScheduler):
+            def add(self, job):
+                super().add(job)
+                peak[0] = max(peak[0], len(self.pending))
+
+        names = make_pairs(self.tmp, 12)
+        with mock.patch.object(engine_module, "JobScheduler", RecordingScheduler), \
+                mock.patch.dict(os.environ, {"FAKE_MKVMERGE_RATE_MB": "0.5"}):
+            result = self.merge(self.make_engine(max_workers=1), pipeline=True)
+        self.assertEqual(result["merged"], len(names))
+        # Twice the worker target are checked ahead of the muxer, not the whole batch
+        self.assertLessEqual(peak[0], 2)
+
+    def test_pairs_are_grouped_by_layout(self):
+        tracks = [{"type": "video", "codec": "V_MPEG4/ISO/AVC", "language": "und", "name": "", "default": True,
+                   "forced": False},
+                  {"type": "audio", "codec": "A_AAC", "language": "eng", "name": "", "default": True, "forced": False},
+                  {"type": "audio", "codec": "A_FLAC", "language": "eng", "name": "Commentary", "default": False,
+                   "forced": False}]
+        write_media(self.path("B", self.names[4]), 1205.0, 16384, tracks=tracks)
+        engine = self.make_engine()
+        engine.analyze_durations(engine.find_matching_files())
+        clusters = engine.layout_clusters
+        self.assertEqual([len(cluster["files"]) for cluster in clusters], [4, 1])
+        self.assertEqual(clusters[1]["sample"], self.names[4])
+        # A preset with a selection for the common layout only holds the odd pair back
+        settings = dict(PRESET, layouts={clusters[0]["fingerprint"]: {"tracks": PRESET["tracks"]}})
+        result = self.merge(self.make_engine(settings), pipeline=True)
+        self.assertEqual(result["merged"], 4)
+        self.assertEqual([(entry["file"], entry["reason"]) for entry in result["parked"]], [(self.names[4], "layout")])
+
+    def test_exported_script_runs_in_batch_order(self):
+        script = self.path("merge.sh")
+        engine = self.make_engine()
+        self.assertTrue(engine.export_script(engine.find_matching_files(), script)["success"])
+        with open(script, encoding="utf-8") as f:
+            merged = [line[len("# Merging "):] for line in f.read().splitlines() if line.startswith("# Merging ")]
+        self.assertEqual(merged, self.names)
+        subprocess.run([script], check=True, capture_output=True)
+        self.assertEqual(self.outputs(), self.names)
+        self.assertEqual(sorted(os.listdir(self.out)), self.names)
+
+    def test_exported_script_leaves_no_output_for_a_failed_job(self):
+        script = self.path("merge.sh")
+        engine = self.make_engine()
+        engine.export_script(engine.find_matching_files(), script)
+        env = dict(os.environ, FAKE_MKVMERGE_FAIL="E03")
+        run = subprocess.run([script], env=env, capture_output=True, text=True)
+        self.assertEqual(run.returncode, 1)
+        self.assertIn("Failed (2)", run.stderr)
+        self.assertEqual(sorted(os.listdir(self.out)), self.names[:2] + self.names[3:])
+
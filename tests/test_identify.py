@@ -0,0 +1,113 @@
+import itertools
+import os
+import unittest
+from unittest import mock
+
+from batch_merger import identify
+from batch_merger.identify import IdentifyCache, container_title, tracks_from_identify
+from tests.support import TempDirTestCase
+
+DATA = {"container": {"properties": {"title": "Episode 1"}},
+        "tracks": [{"id": 0, "type": "video", "codec": "AVC", "properties": {"language": "und"}},
+                   {"id": 1, "type": "audio", "codec": "AAC",
+                    "properties": {"language": "jpn", "track_name": "Main", "default_track": True}}]}
+
+
+class IdentifyCacheTests(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = self.write_file("a.mkv", b"0123456789")
+
+    def open_cache(self, **kwargs):
+        cache = IdentifyCache(self.path("cache.sqlite3"), **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_round_trip_and_counters(self):
+        cache = self.open_cache()
+        self.assertIsNone(cache.get(self.media, "v1"))
+        cache.put(self.media, "v1", DATA)
+        self.assertEqual(cache.get(self.media, "v1"), DATA)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+
+    def test_entries_survive_reopening(self):
+        cache = self.open_cache()
+        cache.put(self.media, "v1", DATA)
+        cache.close()
+        self.assertEqual(self.open_cache().get(self.media, "v1"), DATA)
+
+    def test_changed_size_mtime_or_version_is_a_miss(self):
+        cache = self.open_cache()
+        cache.put(self.media, "v1", DATA)
+        self.assertIsNone(cache.get(self.media, "v2"))
+        st = os.stat(self.media)
+        os.utime(self.media, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(cache.get(self.media, "v1"))
+        cache.put(self.media, "v1", DATA)
+        with open(self.media, "ab") as f:
+            f.write(b"more")
+        os.utime(self.media, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(cache.get(self.media, "v1"))
+
+    def test_missing_file_or_unknown_version_is_not_cached(self):
+        cache = self.open_cache()
+        cache.put(self.media, None, DATA)
+        cache.put(self.path("missing.mkv"), "v1", DATA)
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertIsNone(cache.get(self.path("missing.mkv"), "v1"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        paths = [self.write_file(f"{name}.mkv") for name in "abcd"]
+        clock = itertools.count(1)
+        cache = self.open_cache(max_entries=3)
+        with mock.patch.object(identify.time, "time", lambda: next(clock)):
+            for path in paths[:3]:
+                cache.put(path, "v1", DATA)
+            cache.get(paths[0], "v1")
+            cache.put(paths[3], "v1", DATA)
+        # Trimmed to 90% of the limit, oldest use first
+        self.assertEqual(cache.stats()["evictions"], 2)
+        self.assertIsNotNone(cache.get(paths[0], "v1"))
+        self.assertIsNone(cache.get(paths[1], "v1"))
+        self.assertIsNone(cache.get(paths[2], "v1"))
+        self.assertIsNotNone(cache.get(paths[3], "v1"))
+
+    def test_byte_limit_evicts(self):
+        cache = self.open_cache(max_bytes=1)
+        cache.put(self.media, "v1", DATA)
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_identify_runs_mkvmerge_once(self):
+        cache = self.open_cache()
+        with mock.patch.object(identify, "get_mkvmerge_version", return_value="v1"), \
+                mock.patch.object(identify, "run_identify", return_value=DATA) as run:
+            self.assertEqual(cache.identify("mkvmerge", self.media), DATA)
+            self.assertEqual(cache.identify("mkvmerge", self.media), DATA)
+        self.assertEqual(run.call_count, 1)
+
+    def test_identify_without_version_always_runs_mkvmerge(self):
+        cache = self.open_cache()
+        with mock.patch.object(identify, "get_mkvmerge_version", return_value=None), \
+                mock.patch.object(identify, "run_identify", return_value=DATA) as run:
+            cache.identify("mkvmerge", self.media)
+            cache.identify("mkvmerge", self.media)
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_unopenable_database_disables_the_cache(self):
+        cache = IdentifyCache(self.path("missing", "cache.sqlite3"))
+        self.assertFalse(cache.enabled)
+        cache.put(self.media, "v1", DATA)
+        self.assertIsNone(cache.get(self.media, "v1"))
+
+
+class TrackInfoTests(unittest.TestCase):
+    def test_tracks_and_title(self):
+        video, audio = tracks_from_identify(DATA)
+        self.assertEqual((video.track_type, video.language, video.default_track), ("video", "und", False))
+        self.assertEqual((audio.track_id, audio.track_name, audio.default_track), (1, "Main", True))
+        self.assertEqual(container_title(DATA), "Episode 1")
+        self.assertEqual(tracks_from_identify(None), [])
@@ -0,0 +1,87 @@
+import os
+from unittest import mock
+
+from batch_merger.jobqueue import JobQueue
+from tests.support import FakeClock, TempDirTestCase
+
+
+class JobQueueTests(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.path("queue")
+        JobQueue.create(self.root, {"folder1": "A"}, [{"name": "a.mkv"}, {"name": "b.mkv"}], max_attempts=2)
+        self.clock = FakeClock(os.stat(self.root).st_mtime)
+
+    def worker(self):
+        return JobQueue(self.root, lease_seconds=60, clock=self.clock)
+
+    def expire(self, job_id):
+        # Age the lease's heartbeat rather than moving the clock, so new leases are fresh
+        path = os.path.join(self.root, "leases", f"{job_id}.lease")
+        old = self.clock.now - 120
+        os.utime(path, (old, old))
+
+    def test_claims_are_exclusive(self):
+        a, b = self.worker(), self.worker()
+        self.assertEqual(a.claim("A"), "0")
+        self.assertEqual(b.claim("B"), "1")
+        self.assertIsNone(a.claim("A"))
+        self.assertTrue(a.heartbeat("0", "A"))
+        self.assertFalse(b.heartbeat("0", "B"))
+
+    def test_completed_and_exhausted_jobs_are_final(self):
+        a = self.worker()
+        a.claim("A")
+        a.complete("0", "A", True)
+        a.claim("A")
+        a.complete("1", "A", False, error="boom")
+        self.assertEqual(a.claim("A"), "1")
+        a.complete("1", "A", False, error="boom")
+        self.assertIsNone(a.claim("A"))
+        self.assertEqual(a.status()["done"], 1)
+        self.assertEqual(a.status()["failed"], 1)
+
+    def test_finished_jobs_are_not_checked_again(self):
+        a, b = self.worker(), self.worker()
+        self.assertEqual(a.claim("A"), "0")
+        a.complete("0", "A", True)
+        self.assertEqual(b.claim("B"), "1")
+        b.complete("1", "B", False, error="boom")
+        b.claim("B")
+        b.complete("1", "B", True)
+        with mock.patch.object(a, "is_final", wraps=a.is_final) as is_final:
+            self.assertIsNone(a.claim("A"))
+            # Job 0 finished here; only job 1, finished elsewhere, is looked at
+            self.assertEqual({call.args[0] for call in is_final.call_args_list}, {"1"})
+            is_final.reset_mock()
+            self.assertIsNone(a.claim("A"))
+            is_final.assert_not_called()
+
+    def test_expired_lease_is_taken_over(self):
+        a, b = self.worker(), self.worker()
+        a.claim("A")
+        self.expire("0")
+        self.assertEqual(b.claim("B"), "0")
+        self.assertEqual(b.lease_owner("0"), "B")
+        self.assertFalse(a.heartbeat("0", "A"))
+
+    def test_takeover_race_leaves_the_winner_alone(self):
+        a, b = self.worker(), self.worker()
+        a.claim("old")
+        self.expire("0")
+        judge = a._lease_identity
+        calls = []
+
+        def racing(path):
+            identity = judge(path)
+            if not calls:
+                # B takes the lease over between A's expiry check and A's rename
+                self.assertTrue(b._acquire("0", "B"))
+            calls.append(path)
+            return identity
+
+        a._lease_identity = racing
+        self.assertFalse(a._acquire("0", "A"))
+        self.assertEqual(a.lease_owner("0"), "B")
+        self.assertTrue(b.heartbeat("0", "B"))
+        self.assertEqual(os.listdir(os.path.join(self.root, "leases")), ["0.lease"])
@@ -0,0 +1,73 @@
+import os
+
+from batch_merger.journal import JOURNAL_FILENAME, JobJournal, command_digest, file_fingerprint
+from tests.support import TempDirTestCase
+
+
+class JobJournalTests(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        for name, data in (("src1.mkv", b"one"), ("src2.mkv", b"two"), ("out.mkv", b"output")):
+            self.write_file(name, data)
+        self.digest = command_digest(["mkvmerge", "-o", "out.mkv"])
+
+    def record_done(self, journal):
+        journal.record("out.mkv", "running", command=self.digest, input1=file_fingerprint(self.path("src1.mkv")),
+                       input2=file_fingerprint(self.path("src2.mkv")))
+        journal.record("out.mkv", "done", output_size=os.path.getsize(self.path("out.mkv")))
+
+    def is_complete(self, journal, digest=None):
+        return journal.is_complete("out.mkv", self.path("src1.mkv"), self.path("src2.mkv"), self.path("out.mkv"),
+                                   digest or self.digest)
+
+    def test_completion_survives_reload(self):
+        self.record_done(JobJournal(self.tmp))
+        journal = JobJournal(self.tmp)
+        self.assertTrue(self.is_complete(journal))
+        self.assertFalse(self.is_complete(journal, digest=command_digest(["mkvmerge", "--other"])))
+
+    def test_without_a_digest_only_the_files_are_compared(self):
+        journal = JobJournal(self.tmp)
+        self.record_done(journal)
+        self.assertTrue(journal.is_complete("out.mkv", self.path("src1.mkv"), self.path("src2.mkv"),
+                                            self.path("out.mkv")))
+
+    def test_changed_files_void_completion(self):
+        journal = JobJournal(self.tmp)
+        self.record_done(journal)
+        with open(self.path("out.mkv"), "ab") as f:
+            f.write(b"more")
+        self.assertFalse(self.is_complete(journal))
+        self.record_done(journal)
+        with open(self.path("src2.mkv"), "ab") as f:
+            f.write(b"more")
+        self.assertFalse(self.is_complete(journal))
+
+    def test_restart_voids_and_queue_keeps_completion(self):
+        journal = JobJournal(self.tmp)
+        self.record_done(journal)
+        journal.record_queued(["out.mkv"])
+        self.assertTrue(self.is_complete(journal))
+        journal.record("out.mkv", "running", command=self.digest)
+        self.assertFalse(self.is_complete(journal))
+
+    def test_compact_keeps_live_state(self):
+        journal = JobJournal(self.tmp)
+        self.record_done(journal)
+        for _ in range(5):
+            journal.record_queued(["out.mkv", "other.mkv"])
+        journal.record("other.mkv", "failed", error="boom")
+        journal.compact()
+        with open(self.path(JOURNAL_FILENAME), encoding="utf-8") as f:
+            lines = f.readlines()
+        # The requeued file keeps its completion line next to its current state
+        self.assertEqual(len(lines), 3)
+        reloaded = JobJournal(self.tmp)
+        self.assertTrue(self.is_complete(reloaded))
+        self.assertEqual(reloaded.entries["other.mkv"]["state"], "failed")
+
+    def test_torn_last_line_is_ignored(self):
+        self.record_done(JobJournal(self.tmp))
+        with open(self.path(JOURNAL_FILENAME), "a", encoding="utf-8") as f:
+            f.write('{"file": "out.mkv", "state": "runn')
+        self.assertTrue(self.is_complete(JobJournal(self.tmp)))
@@ -0,0 +1,35 @@
+import unittest
+
+from batch_merger.layouts import describe_layout, layout_fingerprint, layout_tracks, track_layout
+
+
+def info(*tracks):
+    return {"tracks": [{"id": tid, "type": track_type, "codec": codec,
+                        "properties": {"codec_id": codec_id, "language": language, "track_name": "x"}}
+                       for tid, (track_type, codec, codec_id, language) in enumerate(tracks)]}
+
+
+VIDEO = ("video", "AVC/H.264/MPEG-4p10", "V_MPEG4/ISO/AVC", "und")
+AUDIO = ("audio", "AAC", "A_AAC", "jpn")
+
+
+class LayoutTests(unittest.TestCase):
+    def test_layout_uses_codec_ids(self):
+        self.assertEqual(track_layout(info(VIDEO, AUDIO)),
+                         [(0, "video", "V_MPEG4/ISO/AVC", "und"), (1, "audio", "A_AAC", "jpn")])
+        self.assertEqual(describe_layout(info(AUDIO)), "0:audio A_AAC jpn")
+        self.assertEqual(track_layout(None), [])
+
+    def test_fingerprint_ignores_display_names(self):
+        renamed = info(("audio", "AAC LC", "A_AAC", "jpn"))
+        self.assertEqual(layout_fingerprint(info(VIDEO), info(AUDIO)), layout_fingerprint(info(VIDEO), renamed))
+        self.assertNotEqual(layout_fingerprint(info(VIDEO), info(AUDIO)),
+                            layout_fingerprint(info(VIDEO), info(("audio", "AAC", "A_AAC", "eng"))))
+        # Which side a track is on matters
+        self.assertNotEqual(layout_fingerprint(info(VIDEO), info(AUDIO)), layout_fingerprint(info(AUDIO), info(VIDEO)))
+
+    def test_layout_tracks(self):
+        self.assertEqual(layout_tracks({"tracks": {"1": []}}, "abc"), {"1": []})
+        preset = {"tracks": {"1": []}, "layouts": {"abc": {"tracks": {"2": []}}}}
+        self.assertEqual(layout_tracks(preset, "abc"), {"2": []})
+        self.assertIsNone(layout_tracks(preset, "def"))
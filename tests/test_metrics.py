@@ -0,0 +1,118 @@
+import os
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from batch_merger.metrics import BatchMetrics, MetricsServer, TextfileWriter
+from tests.support import FakeClock, TempDirTestCase
+
+
+def sample(text, name):
+    """The value of the sample line starting with ``name`` (a metric name with its labels)."""
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[-1])
+    return None
+
+
+class BatchMetricsTests(unittest.TestCase):
+    def test_job_states_and_counters(self):
+        metrics = BatchMetrics(clock=FakeClock())
+        metrics({"event": "batch_start", "total": 4, "jobs": 2})
+        metrics({"event": "job_skipped", "file": "a.mkv"})
+        metrics({"event": "job_done", "file": "a.mkv", "status": "skipped", "success": True})
+        metrics({"event": "job_start", "file": "b.mkv"})
+        metrics({"event": "job_start", "file": "c.mkv"})
+        text = metrics.render()
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="queued"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="running"}'), 2)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="skipped"}'), 1)
+        metrics({"event": "job_done", "file": "b.mkv", "status": "merged", "success": True, "seconds": 12.0,
+                 "input_size": 300, "output_size": 280, "overall": {"percent": 50.0, "eta": 30.0}})
+        metrics({"event": "job_done", "file": "c.mkv", "status": "failed", "success": False, "seconds": 1.0})
+        text = metrics.render()
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="running"}'), 0)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="merged"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="failed"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_jobs_finished_total{status="skipped"}'), 1)
+        self.assertEqual(sample(text, "mkv_merger_read_bytes_total"), 300)
+        self.assertEqual(sample(text, "mkv_merger_written_bytes_total"), 280)
+        self.assertEqual(sample(text, "mkv_merger_batch_progress_ratio"), 0.5)
+        self.assertEqual(sample(text, "mkv_merger_batch_eta_seconds"), 30)
+        self.assertEqual(sample(text, "mkv_merger_concurrency"), 2)
+        self.assertEqual(sample(text, "mkv_merger_last_event_timestamp_seconds"), 1000)
+
+    def test_jobs_leave_the_state_they_are_in(self):
+        metrics = BatchMetrics()
+        metrics({"event": "batch_start", "total": 3, "jobs": 1})
+        metrics({"event": "job_start", "file": "a"})
+        # A retry starts the job again without moving another queued job
+        metrics({"event": "job_start", "file": "a"})
+        # Cancelled before it started, while "a" is still running
+        metrics({"event": "job_done", "file": "b", "status": "cancelled", "success": False})
+        text = metrics.render()
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="running"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="queued"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="cancelled"}'), 1)
+        metrics({"event": "job_done", "file": "a", "status": "cancelled", "success": False})
+        text = metrics.render()
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="running"}'), 0)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="queued"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="cancelled"}'), 2)
+        self.assertEqual(sample(text, 'mkv_merger_jobs_finished_total{status="cancelled"}'), 2)
+
+    def test_duration_histogram_counts_merged_jobs_only(self):
+        metrics = BatchMetrics()
+        metrics({"event": "batch_start", "total": 3, "jobs": 1})
+        for name, seconds, status in (("a", 3.0, "merged"), ("b", 7200.0, "merged"), ("c", 2.0, "failed")):
+            metrics({"event": "job_start", "file": name})
+            metrics({"event": "job_done", "file": name, "status": status, "seconds": seconds})
+        text = metrics.render()
+        self.assertEqual(sample(text, 'mkv_merger_job_duration_seconds_bucket{le="1"}'), 0)
+        self.assertEqual(sample(text, 'mkv_merger_job_duration_seconds_bucket{le="5"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_job_duration_seconds_bucket{le="3600"}'), 1)
+        self.assertEqual(sample(text, 'mkv_merger_job_duration_seconds_bucket{le="+Inf"}'), 2)
+        self.assertEqual(sample(text, "mkv_merger_job_duration_seconds_sum"), 7203.0)
+
+    def test_a_new_batch_resets_the_gauges_only(self):
+        metrics = BatchMetrics()
+        metrics({"event": "batch_start", "total": 1, "jobs": 1})
+        metrics({"event": "job_start", "file": "a"})
+        metrics({"event": "job_done", "file": "a", "status": "merged", "seconds": 1.0})
+        metrics({"event": "batch_start", "total": 2, "jobs": 1})
+        text = metrics.render()
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="merged"}'), 0)
+        self.assertEqual(sample(text, 'mkv_merger_jobs{state="queued"}'), 2)
+        self.assertEqual(sample(text, 'mkv_merger_jobs_finished_total{status="merged"}'), 1)
+
+    def test_cache_stats(self):
+        stats = {"hits": 3, "misses": 1, "hit_rate": 0.75, "entries": 4}
+        text = BatchMetrics(cache_stats=lambda: stats).render()
+        self.assertEqual(sample(text, 'mkv_merger_identify_cache_requests_total{result="hit"}'), 3)
+        self.assertEqual(sample(text, "mkv_merger_identify_cache_hit_ratio"), 0.75)
+        self.assertNotIn("identify_cache", BatchMetrics().render())
+
+
+class ExportTests(TempDirTestCase):
+    def test_server_answers_on_localhost(self):
+        metrics = BatchMetrics()
+        metrics({"event": "batch_start", "total": 2, "jobs": 1})
+        server = MetricsServer(metrics, 0)
+        with mock.patch("builtins.print"):
+            server.start()
+        self.addCleanup(server.stop)
+        self.assertEqual(server.httpd.server_address[0], "127.0.0.1")
+        url = f"http://127.0.0.1:{server.port}"
+        with urllib.request.urlopen(url + "/metrics", timeout=10) as response:
+            self.assertEqual(sample(response.read().decode("utf-8"), "mkv_merger_batch_jobs"), 2)
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/other", timeout=10)
+
+    def test_textfile_is_written_on_stop(self):
+        path = self.path("mkv_merger.prom")
+        writer = TextfileWriter(BatchMetrics(), path, interval=3600).start()
+        writer.stop()
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(sample(f.read(), "mkv_merger_batch_jobs"), 0)
+        self.assertEqual(os.listdir(self.tmp), ["mkv_merger.prom"])
@@ -0,0 +1,77 @@
+import os
+import subprocess
+
+from batch_merger.engine import BatchEngine
+from batch_merger.optionfiles import option_file_id, write_job_folder
+from tests.fake_mkvmerge import write_media
+from tests.support import PRESET, MediaTestCase, TempDirTestCase, needs_posix
+
+
+class WriteJobFolderTests(TempDirTestCase):
+    def job(self, name, args=("-o", "out.mkv")):
+        return {"id": option_file_id(name), "args": list(args), "output": f"out/{name}",
+                "partial": f"out/.{name}.partial.mkv", "inputs": [f"A/{name}", f"B/{name}"]}
+
+    def test_ids_are_stable_and_safe(self):
+        self.assertEqual(option_file_id("Show: 01.mkv"), option_file_id("Show: 01.mkv"))
+        self.assertNotEqual(option_file_id("a/b.mkv"), option_file_id("a_b.mkv"))
+        self.assertRegex(option_file_id("Season 1/Show: 01.mkv"), r"^[A-Za-z0-9._-]+$")
+
+    def test_unchanged_files_are_not_rewritten(self):
+        folder = self.path("jobs")
+        write_job_folder(folder, "/usr/bin/mkvmerge", [self.job("a.mkv"), self.job("b.mkv")])
+        option_file = os.path.join(folder, "jobs", option_file_id("a.mkv") + ".json")
+        os.utime(option_file, (1, 1))
+        write_job_folder(folder, "/usr/bin/mkvmerge", [self.job("a.mkv"), self.job("b.mkv")])
+        self.assertEqual(os.stat(option_file).st_mtime, 1)
+        write_job_folder(folder, "/usr/bin/mkvmerge", [self.job("a.mkv", ("--title", "x"))])
+        self.assertNotEqual(os.stat(option_file).st_mtime, 1)
+
+    def test_windows_runners(self):
+        folder = self.path("jobs")
+        write_job_folder(folder, "C:\\Program Files\\O'Brien\\mkvmerge.exe", [self.job("a.mkv")])
+        with open(os.path.join(folder, "run.ps1"), "rb") as f:
+            script = f.read()
+        # Windows PowerShell needs the BOM to read the script as UTF-8
+        self.assertTrue(script.startswith(b"\xef\xbb\xbf"))
+        self.assertIn("'C:\\Program Files\\O''Brien\\mkvmerge.exe'", script.decode("utf-8"))
+        self.assertIn("Start-Job", script.decode("utf-8"))
+        with open(os.path.join(folder, "run.bat"), "rb") as f:
+            bat = f.read()
+        self.assertNotIn(b"\n", bat.replace(b"\r\n", b""))
+        self.assertIn(b"run.ps1", bat)
+        # CRLF files compare as unchanged, so they keep their timestamp too
+        os.utime(os.path.join(folder, "run.bat"), (1, 1))
+        write_job_folder(folder, "C:\\Program Files\\O'Brien\\mkvmerge.exe", [self.job("a.mkv")])
+        self.assertEqual(os.stat(os.path.join(folder, "run.bat")).st_mtime, 1)
+
+    def test_dropped_pairs_lose_their_option_files(self):
+        folder = self.path("jobs")
+        write_job_folder(folder, "mkvmerge", [self.job("a.mkv"), self.job("b.mkv")])
+        write_job_folder(folder, "mkvmerge", [self.job("b.mkv")])
+        self.assertEqual(sorted(os.listdir(os.path.join(folder, "jobs"))),
+                         [option_file_id("b.mkv") + ".json", option_file_id("b.mkv") + ".paths"])
+        with open(os.path.join(folder, "jobs.txt"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), option_file_id("b.mkv") + "\n")
+
+
+@needs_posix
+class JobFolderRunTests(MediaTestCase):
+    def export(self):
+        engine = BatchEngine(self.mkvtoolnix, self.path("A"), self.path("B"), self.out, PRESET)
+        folder = self.path("jobs")
+        self.assertTrue(engine.export_job_folder(engine.find_matching_files(), folder)["success"])
+        return folder
+
+    def run_jobs(self, folder):
+        result = subprocess.run([os.path.join(folder, "run.sh"), "2"], check=True, capture_output=True, text=True)
+        return sorted(line.split(": ", 1)[0] for line in result.stdout.splitlines())
+
+    def test_reruns_only_remux_changed_pairs(self):
+        folder = self.export()
+        self.assertEqual(self.run_jobs(folder), ["Merged"] * 5)
+        self.assertEqual(self.outputs(), self.names)
+        self.assertEqual([name for name in os.listdir(self.out) if "partial" in name], [])
+        self.assertEqual(self.run_jobs(self.export()), ["Up to date"] * 5)
+        write_media(self.path("B", self.names[0]), 1201.0, 8192)
+        self.assertEqual(self.run_jobs(folder), ["Merged"] + ["Up to date"] * 4)
@@ -0,0 +1,82 @@
+import os
+import unittest
+
+from batch_merger.pairing import episode_key, pair_files, stem_key
+from tests.support import TempDirTestCase
+
+
+class EpisodeKeyTests(unittest.TestCase):
+    def test_patterns(self):
+        self.assertEqual(episode_key("Show - S02E05 - Title.mkv"), (2, 5))
+        self.assertEqual(episode_key("Show.s1.e12.mkv"), (1, 12))
+        self.assertEqual(episode_key("Show 3x07.mkv"), (3, 7))
+        self.assertEqual(episode_key("Show Episode 9.mkv"), (1, 9))
+        self.assertEqual(episode_key("[Group] Show - 05 [1080p].mkv"), (1, 5))
+        self.assertEqual(episode_key("[Group] Show - 05v2.mkv"), (1, 5))
+
+    def test_season_from_folder(self):
+        self.assertEqual(episode_key("Season 2/Show - 05.mkv"), (2, 5))
+        self.assertEqual(episode_key("Show/S03/Show - 11.mkv"), (3, 11))
+
+    def test_no_episode(self):
+        self.assertIsNone(episode_key("Movie (2004).mkv"))
+
+    def test_stem_key_ignores_tags_and_separators(self):
+        self.assertEqual(stem_key("[GroupA] Show_Name.01 (1080p).mkv"), stem_key("Show Name 01 [JPN].mka"))
+
+
+class PairFilesTests(TempDirTestCase):
+    def touch(self, *parts):
+        path = self.path(*parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+
+    def test_name_pairing(self):
+        for name in ("a.mkv", "b.mkv", "only1.mkv"):
+            self.touch("A", name)
+        for name in ("a.mkv", "b.mkv", "only2.mkv"):
+            self.touch("B", name)
+        result = pair_files(self.path("A"), self.path("B"))
+        self.assertEqual([p[0] for p in result["pairs"]], ["a.mkv", "b.mkv"])
+        self.assertEqual(result["pairs"][0][1:], (self.path("A", "a.mkv"), self.path("B", "a.mkv")))
+        self.assertEqual(result["unmatched1"], ["only1.mkv"])
+        self.assertEqual(result["unmatched2"], ["only2.mkv"])
+
+    def test_episode_pairing_reports_duplicates(self):
+        self.touch("A", "Show - S01E01.mkv")
+        self.touch("A", "Show - S01E02.mkv")
+        self.touch("B", "[Sub] Show 1x01.mka")
+        self.touch("B", "[Sub] Show 1x02.mka")
+        self.touch("B", "[Sub] Show 1x02 v2.mka")
+        result = pair_files(self.path("A"), self.path("B"), {"mode": "episode"})
+        self.assertEqual([p[0] for p in result["pairs"]], ["Show - S01E01.mkv", "Show - S01E02.mkv"])
+        self.assertEqual(result["pairs"][1][2], self.path("B", "[Sub] Show 1x02 v2.mka"))
+        self.assertEqual(result["duplicates2"], ["[Sub] Show 1x02.mka"])
+
+    def test_recursive_with_extensions(self):
+        self.touch("A", "Season 1", "Show - 01.mkv")
+        self.touch("A", "Season 1", "notes.txt")
+        self.touch("B", "Show S01E01.mka")
+        result = pair_files(self.path("A"), self.path("B"),
+                            {"mode": "episode", "recursive": True, "extensions": ".mkv,.mka"})
+        self.assertEqual([p[0] for p in result["pairs"]], ["Season 1/Show - 01.mkv"])
+        self.assertEqual(result["unmatched1"], [])
+
+    def test_regex_needs_pattern(self):
+        with self.assertRaises(ValueError):
+            pair_files(self.path(), self.path(), {"mode": "regex"})
+
+    def test_regex_and_stem_pairing(self):
+        self.touch("A", "Show ep 01.mkv")
+        self.touch("A", "Show ep 02.mkv")
+        self.touch("B", "audio_01_jpn.mka")
+        result = pair_files(self.path("A"), self.path("B"),
+                            {"mode": "regex", "pattern": r"ep (\d+)", "pattern2": r"_(\d+)_"})
+        self.assertEqual([p[0] for p in result["pairs"]], ["Show ep 01.mkv"])
+        self.assertEqual(result["unmatched1"], ["Show ep 02.mkv"])
+        # Output names always end in .mkv outside exact-name pairing
+        self.touch("C", "[Grp] Movie (1080p).mp4")
+        self.touch("D", "Movie.mka")
+        result = pair_files(self.path("C"), self.path("D"), {"mode": "stem"})
+        self.assertEqual([p[0] for p in result["pairs"]], ["[Grp] Movie (1080p).mkv"])
+
@@ -0,0 +1,77 @@
+import unittest
+
+from batch_merger.progress import BatchProgress, EventAggregate, format_eta
+from tests.support import FakeClock
+
+
+class BatchProgressTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(0.0)
+        self.progress = BatchProgress(1000, clock=self.clock)
+
+    def test_jobs_are_weighted_by_size(self):
+        self.progress.start("big", 800)
+        self.progress.start("small", 200)
+        self.clock.now = 10.0
+        job, overall = self.progress.update("big", 50)
+        self.assertEqual((job["file"], job["percent"]), ("big", 50))
+        self.assertEqual(job["rate"], 40.0)
+        self.assertEqual(job["eta"], 10.0)
+        self.assertEqual(overall["bytes_done"], 400)
+        self.assertEqual(overall["percent"], 40.0)
+        self.assertEqual(overall["eta"], 15.0)
+        overall = self.progress.finish("small")
+        self.assertEqual(overall["bytes_done"], 600)
+
+    def test_skipped_jobs_leave_the_total(self):
+        overall = self.progress.finish("done-before", 400, processed=False)
+        self.assertEqual((overall["bytes_total"], overall["bytes_done"]), (600, 0))
+        self.assertIsNone(overall["eta"])
+
+    def test_update_for_unknown_job(self):
+        self.assertIsNone(self.progress.update("nope", 10))
+
+    def test_format_eta(self):
+        self.assertEqual(format_eta(None), "--:--")
+        self.assertEqual(format_eta(75), "1:15")
+        self.assertEqual(format_eta(3725.9), "1:02:05")
+        self.assertEqual(format_eta(-3), "0:00")
+
+
+class EventAggregateTests(unittest.TestCase):
+    def setUp(self):
+        self.events = EventAggregate()
+
+    def test_only_the_latest_state_is_drained(self):
+        self.assertIsNone(self.events.drain())
+        for i in range(1, 1001):
+            self.events({"event": "analyze_progress", "completed": i, "file": f"{i}.mkv", "total": 1000})
+        self.assertEqual(self.events.drain(), {"analyze": (1000, "1000.mkv", 1000)})
+        self.assertIsNone(self.events.drain())
+
+    def test_running_jobs(self):
+        overall = {"percent": 10.0}
+        self.events({"event": "batch_start", "total": 2})
+        self.events({"event": "job_start", "file": "a"})
+        self.events({"event": "job_start", "file": "b"})
+        progress = {"event": "job_progress", "file": "a", "percent": 50, "overall": overall}
+        self.events(progress)
+        changes = self.events.drain()
+        self.assertEqual(changes["jobs"], {"a": progress, "b": None})
+        self.assertEqual(changes["overall"], overall)
+        self.events({"event": "job_done", "file": "a", "completed": 1, "total": 2, "overall": {"percent": 50.0}})
+        # Late progress of a finished job does not bring its row back
+        self.events({"event": "job_progress", "file": "a", "percent": 100, "overall": {"percent": 50.0}})
+        changes = self.events.drain()
+        self.assertEqual(changes["jobs"], {"b": None})
+        self.assertEqual(changes["merge"], (1, "a", 2))
+
+    def test_tuning_and_clear(self):
+        self.events({"event": "concurrency", "level": 3, "curve": [[1, 10.0]]})
+        self.events({"event": "job_start", "file": "a"})
+        self.assertEqual(self.events.drain()["tuning"], (3, [[1, 10.0]]))
+        self.events({"event": "export_progress", "completed": 4})
+        self.events.clear()
+        self.assertIsNone(self.events.drain())
+        self.events({"event": "job_start", "file": "b"})
+        self.assertEqual(self.events.drain()["jobs"], {"b": None})
@@ -0,0 +1,45 @@
+import unittest
+
+from batch_merger.results import ResultTable
+
+ROWS = [
+    {"file": "Show - E03.mkv", "status": "merged", "seconds": 12.0},
+    {"file": "show - E01.mkv", "status": "failed", "seconds": None},
+    {"file": "Movie.mkv", "status": "merged", "seconds": 3.5},
+    {"file": "Show - E02.mkv", "status": "skipped", "seconds": 1.0},
+]
+
+
+def files(table):
+    return [table.row(i)["file"] for i in range(len(table))]
+
+
+class ResultTableTests(unittest.TestCase):
+    def test_sort_ignores_case_and_puts_missing_first(self):
+        table = ResultTable(ROWS)
+        table.sort("file")
+        self.assertEqual(files(table), ["Movie.mkv", "show - E01.mkv", "Show - E02.mkv", "Show - E03.mkv"])
+        table.sort("seconds")
+        self.assertEqual(files(table)[0], "show - E01.mkv")
+        table.sort("seconds", reverse=True)
+        self.assertEqual(files(table), ["Show - E03.mkv", "Movie.mkv", "Show - E02.mkv", "show - E01.mkv"])
+
+    def test_filter_narrows_and_widens(self):
+        table = ResultTable(ROWS)
+        table.sort("file")
+        table.filter("SHOW")
+        self.assertEqual(len(table), 3)
+        table.filter("show - e0")
+        self.assertEqual(len(table), 3)
+        table.filter("show - e02")
+        self.assertEqual(files(table), ["Show - E02.mkv"])
+        table.filter("e0")
+        self.assertEqual(files(table), ["show - E01.mkv", "Show - E02.mkv", "Show - E03.mkv"])
+        table.filter("")
+        self.assertEqual(len(table), 4)
+
+    def test_sort_keeps_filter(self):
+        table = ResultTable(ROWS)
+        table.filter("show")
+        table.sort("seconds", reverse=True)
+        self.assertEqual(files(table), ["Show - E03.mkv", "Show - E02.mkv", "show - E01.mkv"])
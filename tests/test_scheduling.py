@@ -0,0 +1,244 @@
+import collections
+import os
+import unittest
+
+from batch_merger.scheduling import (ConcurrencyAutotuner, DeviceLimiter, FreeSpaceGate, JobScheduler,
+                                     StorageTopology, longest_first_key, order_longest_first, parse_device_limits,
+                                     predict_makespan)
+from tests.support import FakeClock, FakeTopology, TempDirTestCase
+
+GB = 1000 ** 3
+Usage = collections.namedtuple("Usage", "total used free")
+
+
+def make_job(index, cost, output="/out/x.mkv", src1="/a/x.mkv", src2="/b/x.mkv"):
+    return {"index": index, "name": f"{index}.mkv", "cost": cost, "output": output, "src1": src1, "src2": src2}
+
+
+class FreeSpaceGateTests(TempDirTestCase):
+    def make_gate(self, free, **kwargs):
+        self.free = free
+        self.clock = FakeClock()
+        self.waits = []
+        return FreeSpaceGate(FakeTopology(), margin=GB, on_wait=lambda *args: self.waits.append(args),
+                             disk_usage=lambda path: Usage(0, 0, self.free), clock=self.clock, **kwargs)
+
+    def test_reservation_holds_until_done(self):
+        gate = self.make_gate(10 * GB)
+        first, second = make_job(0, 5 * GB), make_job(1, 5 * GB)
+        self.assertTrue(gate.can_start(first))
+        gate.on_start(first)
+        # 10 GB free - 5.1 GB reserved - 1 GB margin leaves too little for another 5.1 GB
+        self.assertFalse(gate.can_start(second))
+        # The mux ending is not enough: the output still has to be moved into place
+        gate.on_finish(first)
+        self.assertFalse(gate.can_start(second))
+        gate.on_done(first)
+        self.assertTrue(gate.can_start(second))
+
+    def test_written_partial_is_not_counted_twice(self):
+        gate = self.make_gate(int(9.5 * GB))
+        first, second = make_job(0, 5 * GB), make_job(1, int(3.3 * GB))
+        gate.on_start(first)
+        self.assertTrue(gate.can_start(second))
+        # 3 GB written: the free reading drops by 3 GB and the reservation by as much
+        first["partial"] = self.path("partial.mkv")
+        with open(first["partial"], "wb") as f:
+            f.truncate(3 * GB)
+        self.free = int(6.5 * GB)
+        self.clock.now += 5
+        self.assertTrue(gate.can_start(second))
+
+    def test_other_volumes_are_independent(self):
+        gate = self.make_gate(10 * GB)
+        gate.on_start(make_job(0, 8 * GB))
+        self.assertTrue(gate.can_start(make_job(1, 8 * GB, output="/other/x.mkv")))
+
+    def test_readings_are_reused_briefly(self):
+        gate = self.make_gate(2 * GB)
+        job = make_job(0, 5 * GB)
+        self.assertFalse(gate.can_start(job))
+        self.free = 100 * GB
+        self.assertFalse(gate.can_start(job))
+        self.clock.now += 1
+        self.assertTrue(gate.can_start(job))
+        # One report per wait
+        self.assertEqual(len(self.waits), 1)
+        self.assertEqual(self.waits[0][1:], (int(5 * GB * 1.02), GB))
+
+    def test_wait_is_reported_again_while_it_lasts(self):
+        gate = self.make_gate(2 * GB, report_seconds=30.0)
+        job = make_job(0, 5 * GB)
+        for _ in range(3):
+            self.assertFalse(gate.can_start(job))
+        self.assertEqual(len(self.waits), 1)
+        self.clock.now += 31
+        self.assertFalse(gate.can_start(job))
+        self.assertEqual(len(self.waits), 2)
+        self.free = 100 * GB
+        self.clock.now += 5
+        self.assertTrue(gate.can_start(job))
+        gate.on_start(job)
+        self.free = 2 * GB
+        self.clock.now += 5
+        self.assertFalse(gate.can_start(make_job(1, 5 * GB)))
+        self.assertEqual(len(self.waits), 3)
+
+    def test_fits_when_idle(self):
+        gate = self.make_gate(10 * GB)
+        self.assertTrue(gate.fits_when_idle(make_job(0, 8 * GB)))
+        self.assertFalse(gate.fits_when_idle(make_job(1, 9 * GB)))
+        # Judged on a fresh reading, not the cached one
+        self.free = 20 * GB
+        self.assertTrue(gate.fits_when_idle(make_job(1, 9 * GB)))
+
+    def test_unknown_free_space_admits(self):
+        gate = FreeSpaceGate(FakeTopology(), disk_usage=lambda path: (_ for _ in ()).throw(OSError("gone")))
+        self.assertTrue(gate.can_start(make_job(0, 100 * GB)))
+
+
+class StorageTopologyTests(TempDirTestCase):
+    def test_kinds_from_sys_and_mount_table(self):
+        disk = self.path("sys", "devices", "sda")
+        os.makedirs(os.path.join(disk, "sda1"))
+        os.makedirs(os.path.join(disk, "queue"))
+        with open(os.path.join(disk, "queue", "rotational"), "w") as f:
+            f.write("1\n")
+        os.makedirs(self.path("sys", "dev", "block"))
+        os.symlink(os.path.join(disk, "sda1"), self.path("sys", "dev", "block", "8:1"))
+        mountinfo = self.path("mountinfo")
+        with open(mountinfo, "w") as f:
+            f.write("36 25 0:45 / /mnt/share rw,relatime shared:1 - nfs4 server:/export rw\n")
+        topology = StorageTopology(sys_root=self.path("sys"), mountinfo_path=mountinfo)
+        # A partition's queue/ lives on its parent disk
+        self.assertEqual(topology.kind_of(os.makedev(8, 1)), "rotational")
+        self.assertEqual(topology.kind_of(os.makedev(0, 45)), "network")
+        self.assertEqual(topology.kind_of(os.makedev(9, 9)), "unknown")
+        self.assertEqual(topology.kind_of(None), "unknown")
+
+    def test_missing_outputs_map_to_their_folder(self):
+        topology = StorageTopology(sys_root=self.path("sys"), mountinfo_path=self.path("none"))
+        self.assertEqual(topology.device_of(self.path("not", "yet", "out.mkv")), os.stat(self.tmp).st_dev)
+
+
+class DeviceLimiterTests(unittest.TestCase):
+    def test_limits_each_device(self):
+        limiter = DeviceLimiter(FakeTopology(), {"rotational": 2})
+        jobs = [make_job(i, 1, src1=f"/a/{i}.mkv", src2=f"/b{i}/x.mkv", output=f"/out{i}/x.mkv") for i in range(3)]
+        for job in jobs[:2]:
+            self.assertTrue(limiter.can_start(job))
+            limiter.on_start(job)
+        # Both running jobs read from /a
+        self.assertFalse(limiter.can_start(jobs[2]))
+        limiter.on_finish(jobs[0])
+        self.assertTrue(limiter.can_start(jobs[2]))
+
+    def test_unlimited_kind(self):
+        limiter = DeviceLimiter(FakeTopology(), {"rotational": None})
+        for i in range(10):
+            job = make_job(i, 1)
+            self.assertTrue(limiter.can_start(job))
+            limiter.on_start(job)
+
+    def test_parse_device_limits(self):
+        limits = parse_device_limits("rotational=1, network=none")
+        self.assertEqual(limits["rotational"], 1)
+        self.assertIsNone(limits["network"])
+        self.assertEqual(limits["ssd"], 8)
+        with self.assertRaises(ValueError):
+            parse_device_limits("floppy=1")
+
+
+class Gate:
+    """Admits jobs whose index is in ``allowed`` and records the hooks it sees."""
+
+    def __init__(self, allowed):
+        self.allowed = allowed
+        self.calls = []
+
+    def can_start(self, job):
+        return job["index"] in self.allowed
+
+    def on_start(self, job):
+        self.calls.append(("start", job["index"]))
+
+    def on_finish(self, job):
+        self.calls.append(("finish", job["index"]))
+
+    def on_done(self, job):
+        self.calls.append(("done", job["index"]))
+
+
+class JobSchedulerTests(unittest.TestCase):
+    def test_added_jobs_stay_sorted(self):
+        scheduler = JobScheduler([make_job(0, 5)], key=longest_first_key)
+        for index, cost in enumerate([1, 9, 5, 3, 9, 0], start=1):
+            scheduler.add(make_job(index, cost))
+        self.assertEqual([job["index"] for job in scheduler.pending], [2, 5, 0, 3, 4, 1, 6])
+        self.assertEqual(scheduler.next_ready()["index"], 2)
+        scheduler.add(make_job(7, 6))
+        self.assertEqual([job["index"] for job in scheduler.pending], [5, 7, 0, 3, 4, 1, 6])
+        scheduler.remove(scheduler.pending[2])
+        scheduler.add(make_job(8, 4))
+        self.assertEqual([job["index"] for job in scheduler.pending], [5, 7, 3, 8, 4, 1, 6])
+
+    def test_skips_held_back_jobs_and_calls_hooks(self):
+        gate = Gate({1, 3})
+        scheduler = JobScheduler([make_job(i, 1) for i in range(4)], [gate], lookahead=2)
+        job = scheduler.next_ready()
+        self.assertEqual(job["index"], 1)
+        # Job 3 is outside the lookahead while jobs 0 and 2 block the head
+        self.assertIsNone(scheduler.next_ready())
+        scheduler.finish(job)
+        scheduler.done(job)
+        self.assertEqual(gate.calls, [("start", 1), ("finish", 1), ("done", 1)])
+        self.assertEqual(len(scheduler.clear()), 3)
+        self.assertEqual(len(scheduler), 0)
+
+
+class PlanningTests(unittest.TestCase):
+    def test_longest_first_keeps_index_order_for_ties(self):
+        jobs = [make_job(index, cost) for index, cost in enumerate([5, 1, 9, 5])]
+        self.assertEqual([job["index"] for job in order_longest_first(jobs)], [2, 0, 3, 1])
+
+    def test_predict_makespan(self):
+        self.assertEqual(predict_makespan([9, 5, 4, 3, 3], 2), 12)
+        self.assertEqual(predict_makespan([3, 3, 4, 5, 9], 2), 16)
+        self.assertEqual(predict_makespan([], 3), 0)
+
+
+class AutotunerTests(unittest.TestCase):
+    def run_windows(self, tuner, clock, throughput, windows):
+        for _ in range(windows):
+            level = tuner.level
+            for job in range(level):
+                clock.now += 1.0 / level
+                evaluated = tuner.record(throughput[level] / level)
+            self.assertTrue(evaluated)
+
+    def test_settles_on_lowest_level_near_peak(self):
+        clock = FakeClock()
+        tuner = ConcurrencyAutotuner(1, maximum=8, min_window_jobs=1, min_window_seconds=1.0, clock=clock)
+        throughput = {1: 100.0, 2: 200.0, 3: 205.0, 4: 150.0}
+        self.run_windows(tuner, clock, throughput, 3)
+        # Level 3 is within 5 % of level 2, so the tuner goes back to 2 and stays
+        self.assertEqual(tuner.level, 2)
+        self.run_windows(tuner, clock, throughput, 3)
+        self.assertEqual(tuner.level, 2)
+        self.assertEqual(tuner.best_level(), 2)
+
+    def test_reprobes_after_settling(self):
+        clock = FakeClock()
+        tuner = ConcurrencyAutotuner(2, maximum=4, min_window_jobs=1, min_window_seconds=1.0, reprobe_windows=2,
+                                     clock=clock)
+        throughput = {1: 100.0, 2: 200.0, 3: 150.0, 4: 150.0}
+        self.run_windows(tuner, clock, throughput, 6)
+        self.assertEqual(tuner.best_level(), 2)
+        self.assertIn(3, [level for _, level, _ in tuner.history])
+
+    def test_waits_for_full_window(self):
+        clock = FakeClock()
+        tuner = ConcurrencyAutotuner(2, min_window_jobs=2, min_window_seconds=10.0, clock=clock)
+        self.assertFalse(tuner.record(100))
+        clock.now += 20
+        self.assertTrue(tuner.record(100))
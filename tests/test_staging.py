@@ -0,0 +1,75 @@
+import os
+import time
+
+from batch_merger.staging import SESSION_PREFIX, ScratchStager
+from tests.support import FakeClock, TempDirTestCase
+
+
+class ScratchStagerTests(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.jobs = []
+        for index in range(3):
+            src1 = self.write_file(f"{index}-a.mkv", b"a" * 1000)
+            src2 = self.write_file(f"{index}-b.mkv", b"b" * 500)
+            self.jobs.append({"index": index, "name": f"{index}.mkv", "src1": src1, "src2": src2,
+                              "output": self.path("out", f"{index}.mkv"), "input_size": 1500, "cost": 1000})
+
+    def start(self, **kwargs):
+        stager = ScratchStager(self.path("scratch"), **kwargs).start()
+        self.addCleanup(stager.close)
+        return stager
+
+    def wait_until_startable(self, stager, job):
+        deadline = time.monotonic() + 30
+        while not stager.can_start(job):
+            self.assertLess(time.monotonic(), deadline, "job was never staged")
+            time.sleep(0.01)
+
+    def test_jobs_start_from_local_copies(self):
+        stager = self.start(budget_bytes=10000, prefetch=2)
+        stager.want(self.jobs)
+        self.wait_until_startable(stager, self.jobs[0])
+        stager.on_start(self.jobs[0])
+        staged = self.jobs[0]["staged"]
+        self.assertEqual([os.path.dirname(path) for path in staged["inputs"]], [os.path.join(stager.session, "in")] * 2)
+        with open(staged["inputs"][1], "rb") as f:
+            self.assertEqual(f.read(), b"b" * 500)
+        self.assertTrue(staged["output"].startswith(os.path.join(stager.session, "out")))
+        stager.on_done(self.jobs[0])
+        self.assertNotIn("staged", self.jobs[0])
+        self.assertFalse(os.path.exists(staged["inputs"][0]))
+
+    def test_budget_limits_what_is_staged_ahead(self):
+        # Room for one job's inputs plus output at a time
+        stager = self.start(budget_bytes=3000, prefetch=3)
+        stager.want(self.jobs)
+        self.wait_until_startable(stager, self.jobs[0])
+        time.sleep(0.1)
+        self.assertEqual(sorted(stager.entries), [0])
+        self.assertFalse(stager.can_start(self.jobs[1]))
+        # As the engine does, only jobs still queued are wanted
+        stager.on_start(self.jobs[0])
+        stager.want(self.jobs[1:])
+        stager.on_done(self.jobs[0])
+        self.wait_until_startable(stager, self.jobs[1])
+        self.assertEqual(stager.used, stager.needed(self.jobs[1]))
+
+    def test_oversized_and_skipped_jobs_bypass_staging(self):
+        stager = self.start(budget_bytes=2000, skip=lambda job: job["index"] == 1)
+        big = dict(self.jobs[0], input_size=5000)
+        self.assertTrue(stager.can_start(big))
+        self.assertTrue(stager.can_start(self.jobs[1]))
+        stager.on_start(big)
+        self.assertNotIn("staged", big)
+
+    def test_close_removes_the_session_and_stale_ones(self):
+        stale = self.path("scratch", f"{SESSION_PREFIX}1-1")
+        os.makedirs(stale)
+        os.utime(stale, (0, 0))
+        recent = self.path("scratch", f"{SESSION_PREFIX}2-2")
+        os.makedirs(recent)
+        stager = ScratchStager(self.path("scratch"), clock=FakeClock(time.time())).start()
+        stager.close()
+        # A session another process touched recently is left alone
+        self.assertEqual(os.listdir(self.path("scratch")), [os.path.basename(recent)])
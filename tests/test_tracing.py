@@ -0,0 +1,72 @@
+import json
+import unittest
+
+from batch_merger import tracing
+from batch_merger.tracing import Tracer
+from tests.support import FakeClock, TempDirTestCase
+
+
+class TracerTests(TempDirTestCase):
+    def test_spans_and_percentiles(self):
+        clock = FakeClock(0.0)
+        tracer = Tracer(clock)
+        for ms in range(1, 21):
+            with tracer.span("mux", file=f"{ms}.mkv"):
+                clock.now += ms / 1000.0
+        with tracer.span("identify"):
+            clock.now += 0.5
+        summary = tracer.summary()
+        self.assertEqual(summary["mux"]["count"], 20)
+        self.assertAlmostEqual(summary["mux"]["total"], 0.21)
+        self.assertAlmostEqual(summary["mux"]["p50"], 0.010)
+        self.assertAlmostEqual(summary["mux"]["p95"], 0.019)
+        self.assertAlmostEqual(summary["mux"]["max"], 0.020)
+        # Stages are listed by total time
+        lines = tracer.format_summary().splitlines()
+        self.assertTrue(lines[1].startswith("identify"))
+        self.assertTrue(lines[2].startswith("mux"))
+
+    def test_span_is_recorded_when_the_body_raises(self):
+        tracer = Tracer(FakeClock(0.0))
+        with self.assertRaises(ValueError):
+            with tracer.span("build_command"):
+                raise ValueError()
+        self.assertEqual(tracer.summary()["build_command"]["count"], 1)
+
+    def test_trace_file(self):
+        clock = FakeClock(10.0)
+        tracer = Tracer(clock)
+        clock.now = 10.25
+        with tracer.span("mux", file="a.mkv"):
+            clock.now = 10.5
+        path = self.path("trace.json")
+        tracer.write(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        metadata, span = data["traceEvents"]
+        self.assertEqual(metadata["ph"], "M")
+        self.assertEqual((span["name"], span["ph"], span["ts"], span["dur"]), ("mux", "X", 250000.0, 250000.0))
+        self.assertEqual(span["args"], {"file": "a.mkv"})
+        self.assertEqual(data["otherData"]["summary"]["mux"]["count"], 1)
+
+
+class GlobalTracerTests(unittest.TestCase):
+    def tearDown(self):
+        tracing.disable()
+
+    def test_spans_are_no_ops_when_off(self):
+        tracing.disable()
+        with tracing.span("identify"):
+            pass
+        self.assertIsNone(tracing.now())
+        tracing.add_span("queued", None)
+        self.assertIsNone(tracing.active())
+
+    def test_cross_thread_spans(self):
+        clock = FakeClock(0.0)
+        tracer = tracing.enable(clock)
+        start = tracing.now()
+        clock.now = 2.0
+        tracing.add_span("queued", start, file="a.mkv")
+        self.assertIs(tracing.disable(), tracer)
+        self.assertEqual(tracer.summary()["queued"]["total"], 2.0)
@@ -0,0 +1,59 @@
+from batch_merger.ebml import read_header
+from batch_merger.verify import check_output, expected_output
+from tests.fake_mkvmerge import write_media
+from tests.support import TempDirTestCase
+
+SETTINGS = {"tracks": {
+    "1": [{"track_id": 0, "include": True, "language": "und", "name": "", "default": True, "forced": False}],
+    "2": [{"track_id": 2, "include": True, "language": "", "name": "Signs", "default": False, "forced": True}],
+}}
+OUTPUT_TRACKS = [
+    {"type": "video", "codec": "V_MPEG4/ISO/AVC", "language": "und", "name": "", "default": True, "forced": False},
+    {"type": "subtitles", "codec": "S_TEXT/ASS", "language": "eng", "name": "Signs", "default": False,
+     "forced": True},
+]
+
+
+class CheckOutputTests(TempDirTestCase):
+    def expected(self, duration1, duration2):
+        sources = []
+        for number, duration in ((1, duration1), (2, duration2)):
+            path = self.path(f"src{number}.mkv")
+            write_media(path, duration, 8192)
+            sources.append((path, read_header(path)))
+        return expected_output(sources, SETTINGS)
+
+    def output(self, duration, tracks=OUTPUT_TRACKS):
+        path = self.path("out.mkv")
+        write_media(path, duration, 8192, tracks=tracks)
+        return path
+
+    def test_matching_output(self):
+        expected = self.expected(1400.0, 1400.2)
+        self.assertEqual([t["type"] for t in expected["tracks"]], ["video", "subtitles"])
+        self.assertEqual(check_output(self.output(1400.1), expected), [])
+
+    def test_short_output_is_rejected(self):
+        problems = check_output(self.output(1300.0), self.expected(1400.0, 1400.0))
+        self.assertEqual(len(problems), 1)
+        self.assertIn("duration", problems[0])
+
+    def test_accepted_mismatch_allows_either_length(self):
+        # File 2 only contributes subtitles, so the output may end with the shorter file 1
+        expected = self.expected(1300.0, 1400.0)
+        self.assertEqual(check_output(self.output(1300.0), expected), [])
+        self.assertEqual(check_output(self.output(1400.0), expected), [])
+        self.assertNotEqual(check_output(self.output(1200.0), expected), [])
+
+    def test_track_differences(self):
+        tracks = [dict(OUTPUT_TRACKS[0]), dict(OUTPUT_TRACKS[1], forced=False, name="Full")]
+        problems = check_output(self.output(1400.0, tracks), self.expected(1400.0, 1400.0))
+        self.assertEqual(len(problems), 2)
+        problems = check_output(self.output(1400.0, OUTPUT_TRACKS[:1]), self.expected(1400.0, 1400.0))
+        self.assertIn("1 tracks, expected 2", problems)
+
+    def test_unreadable_output(self):
+        path = self.path("broken.mkv")
+        with open(path, "wb") as f:
+            f.write(b"not matroska")
+        self.assertEqual(len(check_output(path, self.expected(10.0, 10.0))), 1)